@@ -1,8 +1,15 @@
 from sqlalchemy.sql import func
 from sqlalchemy import CheckConstraint # Import CheckConstraint
+from sqlalchemy.dialects import sqlite
 from application.extensions import db
 from flask_login import UserMixin
 
+# SQLite's CURRENT_TIMESTAMP (what func.now() server defaults produce) has no fractional seconds.
+# Bind datetimes in the same text format so comparisons against stored values (e.g. keyset cursors) line up.
+SQLITE_TIMESTAMP = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
 # TODO: Review Admin and SuperAdmin models. They are very similar.
 # Consider merging them or implementing a more granular role-based access control (RBAC) system
 # where 'superadmin' could be a role with all permissions.
@@ -50,7 +57,7 @@ class User(UserMixin, db.Model):
     - city -> Not Required
     - state -> Not Required
     - country -> Not Required
-    - profile_image -> Not Required
+    - profile_image_key -> Not Required
     - is_admin -> default False
     - is_verified -> default False
     - is_active -> default True
@@ -59,6 +66,8 @@ class User(UserMixin, db.Model):
     - is_banned -> default False
     - is_store -> default False
     - is_deleted -> default False
+    - security_version -> default 0
+    - cart_version -> default 0
     '''
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
@@ -71,7 +80,7 @@ class User(UserMixin, db.Model):
     city = db.Column(db.String(100), nullable=True)
     state = db.Column(db.String(100), nullable=True)
     country = db.Column(db.String(100), nullable=True)
-    profile_image = db.Column(db.LargeBinary, nullable=True)
+    profile_image_key = db.Column(db.String(80), nullable=True)  # Blob store key (see utils.blob_store)
     can_create_store = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
     is_verified = db.Column(db.Boolean, default=False)
@@ -81,6 +90,10 @@ class User(UserMixin, db.Model):
     is_banned = db.Column(db.Boolean, default=False)
     is_store = db.Column(db.Boolean, default=False)
     is_deleted = db.Column(db.Boolean, default=False)
+    # Incremented to revoke every session of the user (ban, password change); sessions carry the value they were created with
+    security_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Incremented by every change to the user's cart, so clients can tell whether their copy is current
+    cart_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=func.now())
@@ -93,6 +106,9 @@ class User(UserMixin, db.Model):
     store_employees = db.relationship('StoreEmployee', backref='user', cascade="all, delete", lazy=True)
     logs = db.relationship('Logs', backref='user', cascade="all, delete", lazy=True)
     search_queries = db.relationship('SearchQuery', backref='user', cascade="all, delete", lazy=True)
+    profile_image_asset = db.relationship(
+        'ImageAsset', primaryjoin='foreign(User.profile_image_key) == ImageAsset.source_key', viewonly=True, lazy=True
+    )
 
     def __repr__(self):
         return f"<User {self.username}>"
@@ -150,6 +166,10 @@ class OrderItem(db.Model):
 # Cart Model
 class Cart(db.Model):
     __tablename__ = 'cart'
+    __table_args__ = (
+        # One line per product; also serves the lookups of a user's cart
+        db.UniqueConstraint('user_id', 'product_id', name='uq_cart_user_product'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete="CASCADE"), nullable=False)
@@ -192,8 +212,8 @@ class Store(db.Model):
     number_warned = db.Column(db.Integer, default=0)
 
     
-    store_banner = db.Column(db.LargeBinary, nullable=True)
-    store_logo = db.Column(db.LargeBinary, nullable=False)
+    store_banner_key = db.Column(db.String(80), nullable=True)  # Blob store key (see utils.blob_store)
+    store_logo_key = db.Column(db.String(80), nullable=True)  # Blob store key; required on creation
     store_rating = db.Column(db.Float, default=0.0)
     store_reviews = db.Column(db.Integer, default=0)
     store_followers = db.Column(db.Integer, default=0)
@@ -206,6 +226,12 @@ class Store(db.Model):
     products = db.relationship('Product', backref='store', cascade="all, delete", lazy=True)
     employees = db.relationship('StoreEmployee', backref='store', cascade="all, delete", lazy=True)
     blacklists = db.relationship('Blacklist', backref='store', cascade="all, delete", lazy=True)
+    store_logo_asset = db.relationship(
+        'ImageAsset', primaryjoin='foreign(Store.store_logo_key) == ImageAsset.source_key', viewonly=True, lazy=True
+    )
+    store_banner_asset = db.relationship(
+        'ImageAsset', primaryjoin='foreign(Store.store_banner_key) == ImageAsset.source_key', viewonly=True, lazy=True
+    )
 
     def __repr__(self):
         return f"<Store {self.name}>"
@@ -283,12 +309,24 @@ class ProductCondition:
 class Product(db.Model):
     """Represents a product listed for sale."""
     __tablename__ = 'product'
+    __table_args__ = (
+        CheckConstraint('stock_quantity >= 0', name='ck_product_stock_quantity_non_negative'),
+        # Composite indexes backing the keyset-paginated catalog (see product_service.get_all_products).
+        # Each one ends with `id` so the (sort_key, id) cursor comparison is a single index range scan.
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),
+        db.Index('ix_product_price_id', 'price', 'id'),
+        db.Index('ix_product_category_created_at_id', 'category_id', 'created_at', 'id'),
+        db.Index('ix_product_category_price_id', 'category_id', 'price', 'id'),
+        db.Index('ix_product_store_created_at_id', 'store_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(500), nullable=True)
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(200), nullable=True)
-    discount = db.Column(db.Float, default=0.0)
+    discount = db.Column(db.Float, default=0.0)  # Absolute amount off the price
+    discount_starts_at = db.Column(db.DateTime, nullable=True)  # Naive UTC; discount applies from then on when set
+    discount_ends_at = db.Column(db.DateTime, nullable=True)  # Naive UTC; discount no longer applies from then on when set
     available_colors = db.Column(db.String(200), nullable=True)
     available_sizes = db.Column(db.String(200), nullable=True)
     condition = db.Column(db.String(50), nullable=False)  # See ProductCondition class for possible values. Actual value set during product creation/update.
@@ -296,7 +334,7 @@ class Product(db.Model):
     rating = db.Column(db.Float, default=0.0)
     number_of_user_rating = db.Column(db.Integer, default=0)
     number_of_sales = db.Column(db.Integer, default=0)
-    stock_quantity = db.Column(db.Integer, nullable=False, CheckConstraint('stock_quantity >= 0', name='ck_product_stock_quantity_non_negative'))
+    stock_quantity = db.Column(db.Integer, nullable=False)
 
     is_verified = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
@@ -305,7 +343,7 @@ class Product(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete="SET NULL"), nullable=True)
     store_id = db.Column(db.Integer, db.ForeignKey('store.id', ondelete="CASCADE"), nullable=False)
 
-    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    created_at = db.Column(db.DateTime(timezone=True).with_variant(SQLITE_TIMESTAMP, 'sqlite'), server_default=func.now())
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=func.now())
 
     def __repr__(self):
@@ -335,6 +373,7 @@ class SearchQuery(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
     query = db.Column(db.String(255), nullable=False)
+    result_count = db.Column(db.Integer, nullable=True)  # Products the full-text search returned (at most its limit); None for searches recorded before it was kept
     search_date = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
     def __repr__(self):
@@ -359,4 +398,28 @@ class StoreCreationRequest(db.Model):
     reviewer = db.relationship('User', foreign_keys=[admin_reviewer_id], backref=db.backref('reviewed_store_requests', lazy=True))
 
     def __repr__(self):
-        return f"<StoreCreationRequest {self.id} by User {self.user_id} - {self.status}>"
\ No newline at end of file
+        return f"<StoreCreationRequest {self.id} by User {self.user_id} - {self.status}>"
+
+class ImageAsset(db.Model):
+    """
+    An uploaded image and the renditions generated from it (see utils.image_pipeline).
+    Rows referencing an image (User.profile_image_key, Store.store_logo_key, ...) hold
+    its source_key, so identical uploads share one asset.
+    """
+    __tablename__ = 'image_asset'
+    id = db.Column(db.Integer, primary_key=True)
+    source_key = db.Column(db.String(80), unique=True, nullable=False, index=True)  # Blob store key of the original upload
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    renditions = db.Column(db.JSON, nullable=False)  # {rendition name: {format: blob store key}}
+    # Perceptual hash (64-bit dHash, see utils.image_pipeline) split into four indexed 16-bit bands,
+    # so near-identical images are found by exact band lookups (see services.image_service)
+    dhash_0 = db.Column(db.Integer, nullable=True, index=True)
+    dhash_1 = db.Column(db.Integer, nullable=True, index=True)
+    dhash_2 = db.Column(db.Integer, nullable=True, index=True)
+    dhash_3 = db.Column(db.Integer, nullable=True, index=True)
+    average_color = db.Column(db.Integer, nullable=True)  # 0xRRGGBB
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ImageAsset {self.source_key}>"
@@ -14,8 +14,8 @@ from application.extensions import db, cors
 # Import blueprints from routes package
 from routes import blueprints
 
-# Import User model
-from DataBase.models import User
+# Import the principal loader used by Flask-Login
+from services.principal_service import load_principal, session_is_current
 
 # Create Flask app instance
 app = Flask(__name__)
@@ -32,7 +32,11 @@ login_manager.init_app(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # A narrow, cached projection of the user instead of the full row (see services.principal_service)
+    principal = load_principal(int(user_id))
+    if principal is None or not session_is_current(principal):
+        return None  # Deleted user, or session revoked by a ban or password change
+    return principal
 
 
 # Initialize SQLAlchemy
@@ -43,7 +47,7 @@ db.init_app(app)
 cors_resources = {
     r"/api/*": {
         "origins": ["http://localhost:5173", "http://127.0.0.1:5173"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "X-CSRF-Token", "Authorization"],
         "expose_headers": ["Content-Type", "Authorization"],
         "supports_credentials": True,
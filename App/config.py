@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
 class Config:
     """Application configuration class. Attributes are loaded from environment variables or defaults."""
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
@@ -17,3 +19,32 @@ class Config:
     SESSION_COOKIE_HTTPONLY = os.getenv('SESSION_COOKIE_HTTPONLY', 'True').lower() in ('true', '1', 't')
     PERMANENT_SESSION_LIFETIME = int(os.getenv('PERMANENT_SESSION_LIFETIME', 2592000))  # Default 30 days
     SESSION_REFRESH_EACH_REQUEST = os.getenv('SESSION_REFRESH_EACH_REQUEST', 'True').lower() in ('true', '1', 't')
+    SUGGEST_REBUILD_SECONDS = int(os.getenv('SUGGEST_REBUILD_SECONDS', 300))  # Default 5 minutes
+    SUGGEST_MAX_TERMS = int(os.getenv('SUGGEST_MAX_TERMS', 200000))
+    FACET_REBUILD_SECONDS = int(os.getenv('FACET_REBUILD_SECONDS', 60))  # Rebuild the facet index from the database every minute
+    PRODUCT_CACHE_BACKEND = os.getenv('PRODUCT_CACHE_BACKEND', 'memory')  # 'memory' (per worker) or 'sqlite' (shared by local workers)
+    PRODUCT_CACHE_PATH = os.getenv('PRODUCT_CACHE_PATH', os.path.join(BASE_DIR, 'instance', 'product_cache.db'))
+    PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', 50000))
+    PRODUCT_CACHE_TTL = int(os.getenv('PRODUCT_CACHE_TTL', 300))  # Default 5 minutes
+    BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', os.path.join(BASE_DIR, 'instance', 'blobs'))  # Content-addressed image storage
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))  # Processes rendering uploaded images
+    IMAGE_PROCESSING_TIMEOUT = int(os.getenv('IMAGE_PROCESSING_TIMEOUT', 30))  # Seconds
+    PRINCIPAL_CACHE_BACKEND = os.getenv('PRINCIPAL_CACHE_BACKEND', 'memory')  # 'memory' (per worker) or 'sqlite' (shared by local workers)
+    PRINCIPAL_CACHE_PATH = os.getenv('PRINCIPAL_CACHE_PATH', os.path.join(BASE_DIR, 'instance', 'principal_cache.db'))
+    PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv('PRINCIPAL_CACHE_MAX_ENTRIES', 10000))
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 30))  # Seconds
+    ACCOUNT_STATUS_PATH = os.getenv('ACCOUNT_STATUS_PATH', os.path.join(BASE_DIR, 'instance', 'account_status.db'))  # Revocations and bans, shared by local workers
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # 'memory' (per worker) or 'sqlite' (shared by local workers)
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', os.path.join(BASE_DIR, 'instance', 'rate_limit.db'))
+    GEOIP_DATABASE_PATH = os.getenv('GEOIP_DATABASE_PATH', os.path.join(BASE_DIR, 'instance', 'geoip.bin'))  # Built with `python -m utils.geoip`
+    GEOIP_CACHE_MAX_ENTRIES = int(os.getenv('GEOIP_CACHE_MAX_ENTRIES', 10000))
+    GEOIP_CACHE_TTL = int(os.getenv('GEOIP_CACHE_TTL', 86400))  # Seconds
+    PASSWORD_HASH_TARGET_MS = int(os.getenv('PASSWORD_HASH_TARGET_MS', 100))  # scrypt cost is calibrated to this hashing time
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))  # 0 = one per CPU core
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 32))  # Waiting hashes beyond this get a 503
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # Seconds
+    GUEST_CART_BACKEND = os.getenv('GUEST_CART_BACKEND', 'memory')  # 'memory' (per worker, evicted carts spill to GUEST_CART_PATH) or 'sqlite' (shared by local workers)
+    GUEST_CART_PATH = os.getenv('GUEST_CART_PATH', os.path.join(BASE_DIR, 'instance', 'guest_carts.db'))  # Empty to drop evicted carts
+    GUEST_CART_MAX_ENTRIES = int(os.getenv('GUEST_CART_MAX_ENTRIES', 10000))
+    GUEST_CART_SPILL_MAX_ENTRIES = int(os.getenv('GUEST_CART_SPILL_MAX_ENTRIES', 200000))
+    GUEST_CART_TTL = int(os.getenv('GUEST_CART_TTL', 7 * 24 * 60 * 60))  # Default 7 days
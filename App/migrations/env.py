@@ -51,6 +51,17 @@ def get_metadata():
     return target_db.metadata
 
 
+# Tables created by raw SQL in migrations rather than from the models (the FTS5 search
+# table and the shadow tables SQLite keeps for it); autogenerate must not drop them
+EXCLUDED_TABLE_PREFIXES = ('product_fts',)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and reflected and compare_to is None:
+        return not name.startswith(EXCLUDED_TABLE_PREFIXES)
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +76,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +105,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
@@ -0,0 +1,89 @@
+"""move images to blob store
+
+Copies User.profile_image, Store.store_logo and Store.store_banner into the
+content-addressed blob store (BLOB_STORE_PATH), keeps only the blob keys on the
+rows and drops the LargeBinary columns. Rows are copied one at a time so the
+images are never all in memory at once.
+
+Revision ID: 5d0c7a2e9b14
+Revises: e8b2d4f61a93
+Create Date: 2026-10-18 13:26:04.772190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+from utils.blob_store import BlobStore
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0c7a2e9b14'
+down_revision = 'e8b2d4f61a93'
+branch_labels = None
+depends_on = None
+
+# (table, blob column, key column)
+IMAGE_COLUMNS = (
+    ('user', 'profile_image', 'profile_image_key'),
+    ('store', 'store_logo', 'store_logo_key'),
+    ('store', 'store_banner', 'store_banner_key'),
+)
+
+
+def _blob_store():
+    return BlobStore(current_app.config['BLOB_STORE_PATH'])
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('profile_image_key', sa.String(length=80), nullable=True))
+    with op.batch_alter_table('store', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('store_logo_key', sa.String(length=80), nullable=True))
+        batch_op.add_column(sa.Column('store_banner_key', sa.String(length=80), nullable=True))
+
+    bind = op.get_bind()
+    store = _blob_store()
+    for table, blob_column, key_column in IMAGE_COLUMNS:
+        ids = bind.execute(sa.text(f'SELECT id FROM "{table}" WHERE {blob_column} IS NOT NULL')).scalars().all()
+        for row_id in ids:
+            data = bind.execute(
+                sa.text(f'SELECT {blob_column} FROM "{table}" WHERE id = :id'), {"id": row_id}
+            ).scalar()
+            if data:
+                bind.execute(
+                    sa.text(f'UPDATE "{table}" SET {key_column} = :key WHERE id = :id'),
+                    {"key": store.put(bytes(data)), "id": row_id}
+                )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('profile_image')
+    with op.batch_alter_table('store', schema=None) as batch_op:
+        batch_op.drop_column('store_logo')
+        batch_op.drop_column('store_banner')
+
+
+def downgrade():
+    # store_logo comes back nullable: stores whose blob is missing cannot be given a logo
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('profile_image', sa.LargeBinary(), nullable=True))
+    with op.batch_alter_table('store', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('store_logo', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('store_banner', sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    store = _blob_store()
+    for table, blob_column, key_column in IMAGE_COLUMNS:
+        rows = bind.execute(sa.text(f'SELECT id, {key_column} FROM "{table}" WHERE {key_column} IS NOT NULL')).all()
+        for row_id, key in rows:
+            data = store.read(key)
+            if data is not None:
+                bind.execute(
+                    sa.text(f'UPDATE "{table}" SET {blob_column} = :data WHERE id = :id'),
+                    {"data": data, "id": row_id}
+                )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('profile_image_key')
+    with op.batch_alter_table('store', schema=None) as batch_op:
+        batch_op.drop_column('store_banner_key')
+        batch_op.drop_column('store_logo_key')
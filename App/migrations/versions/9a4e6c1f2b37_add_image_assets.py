@@ -0,0 +1,37 @@
+"""add image assets
+
+Revision ID: 9a4e6c1f2b37
+Revises: 5d0c7a2e9b14
+Create Date: 2026-10-18 18:02:41.530174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e6c1f2b37'
+down_revision = '5d0c7a2e9b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_asset',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source_key', sa.String(length=80), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=False),
+    sa.Column('height', sa.Integer(), nullable=False),
+    sa.Column('renditions', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('image_asset', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_image_asset_source_key'), ['source_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('image_asset', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_image_asset_source_key'))
+
+    op.drop_table('image_asset')
@@ -0,0 +1,26 @@
+"""add user cart version
+
+Revision ID: a93e6c2d5b17
+Revises: f2c85b1d7a40
+Create Date: 2026-10-18 21:05:12.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93e6c2d5b17'
+down_revision = 'f2c85b1d7a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cart_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('cart_version')
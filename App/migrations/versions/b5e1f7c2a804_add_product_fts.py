@@ -0,0 +1,47 @@
+"""add product full-text search table
+
+Revision ID: b5e1f7c2a804
+Revises: a93e6c2d5b17
+Create Date: 2026-10-19 10:02:37.114820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1f7c2a804'
+down_revision = 'a93e6c2d5b17'
+branch_labels = None
+depends_on = None
+
+
+def _fts5_available(bind):
+    """The FTS5 table only exists on SQLite builds with FTS5; other databases search in memory."""
+    if bind.dialect.name != 'sqlite':
+        return False
+    options = bind.execute(sa.text("PRAGMA compile_options")).scalars().all()
+    return 'ENABLE_FTS5' in options
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not _fts5_available(bind):
+        return
+    # Columns and tokenizer must match services.search_service.FTS_COLUMNS
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+        "name, description, available_colors, category, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # Initial load of every searchable product; the product service keeps it in sync afterwards
+    op.execute(
+        "INSERT INTO product_fts (rowid, name, description, available_colors, category) "
+        "SELECT p.id, p.name, COALESCE(p.description, ''), COALESCE(p.available_colors, ''), "
+        "COALESCE(c.name, '') FROM product p LEFT JOIN category c ON c.id = p.category_id "
+        "WHERE p.is_active = 1 AND p.is_banned = 0"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS product_fts")
@@ -0,0 +1,57 @@
+"""add image asset perceptual hash
+
+Adds the dHash bands and average color of image assets and computes them for the
+existing assets from their thumbnail rendition.
+
+Revision ID: b7d3f08e5c61
+Revises: 9a4e6c1f2b37
+Create Date: 2026-10-18 19:12:08.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+from utils.blob_store import BlobStore
+from utils.image_pipeline import fingerprint
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f08e5c61'
+down_revision = '9a4e6c1f2b37'
+branch_labels = None
+depends_on = None
+
+HASH_BANDS = ('dhash_0', 'dhash_1', 'dhash_2', 'dhash_3')
+
+
+def upgrade():
+    with op.batch_alter_table('image_asset', schema=None) as batch_op:
+        for band in HASH_BANDS:
+            batch_op.add_column(sa.Column(band, sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('average_color', sa.Integer(), nullable=True))
+        for band in HASH_BANDS:
+            batch_op.create_index(batch_op.f(f'ix_image_asset_{band}'), [band], unique=False)
+
+    bind = op.get_bind()
+    store = BlobStore(current_app.config['BLOB_STORE_PATH'])
+    image_asset = sa.table('image_asset', sa.column('id'), sa.column('renditions', sa.JSON))
+    for asset_id, renditions in bind.execute(sa.select(image_asset.c.id, image_asset.c.renditions)).all():
+        thumbnail_key = renditions['thumb']['jpeg']
+        if not store.exists(thumbnail_key):
+            continue
+        result = fingerprint(store.path(thumbnail_key))
+        values = {band: (result['dhash'] >> (48 - 16 * index)) & 0xFFFF for index, band in enumerate(HASH_BANDS)}
+        bind.execute(
+            sa.text(f"UPDATE image_asset SET {', '.join(f'{column} = :{column}' for column in values)}, "
+                    "average_color = :average_color WHERE id = :id"),
+            {**values, "average_color": result['average_color'], "id": asset_id}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('image_asset', schema=None) as batch_op:
+        for band in HASH_BANDS:
+            batch_op.drop_index(batch_op.f(f'ix_image_asset_{band}'))
+        batch_op.drop_column('average_color')
+        for band in HASH_BANDS:
+            batch_op.drop_column(band)
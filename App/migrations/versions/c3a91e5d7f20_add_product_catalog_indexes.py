@@ -0,0 +1,34 @@
+"""add product catalog indexes
+
+Revision ID: c3a91e5d7f20
+Revises: 97bfb4f7faea
+Create Date: 2026-10-18 09:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a91e5d7f20'
+down_revision = '97bfb4f7faea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_product_price_id', ['price', 'id'], unique=False)
+        batch_op.create_index('ix_product_category_created_at_id', ['category_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_product_category_price_id', ['category_id', 'price', 'id'], unique=False)
+        batch_op.create_index('ix_product_store_created_at_id', ['store_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_store_created_at_id')
+        batch_op.drop_index('ix_product_category_price_id')
+        batch_op.drop_index('ix_product_category_created_at_id')
+        batch_op.drop_index('ix_product_price_id')
+        batch_op.drop_index('ix_product_created_at_id')
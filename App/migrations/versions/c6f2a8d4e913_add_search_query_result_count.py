@@ -0,0 +1,26 @@
+"""add search query result count
+
+Revision ID: c6f2a8d4e913
+Revises: b5e1f7c2a804
+Create Date: 2026-10-19 10:48:05.662391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f2a8d4e913'
+down_revision = 'b5e1f7c2a804'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('search_query', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('result_count', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('search_query', schema=None) as batch_op:
+        batch_op.drop_column('result_count')
@@ -0,0 +1,26 @@
+"""add user security version
+
+Revision ID: d41f7a9c3e82
+Revises: b7d3f08e5c61
+Create Date: 2026-10-18 18:20:41.502317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7a9c3e82'
+down_revision = 'b7d3f08e5c61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('security_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('security_version')
@@ -0,0 +1,28 @@
+"""add product discount schedule
+
+Revision ID: e8b2d4f61a93
+Revises: c3a91e5d7f20
+Create Date: 2026-10-18 11:03:27.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b2d4f61a93'
+down_revision = 'c3a91e5d7f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('discount_starts_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('discount_ends_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('discount_ends_at')
+        batch_op.drop_column('discount_starts_at')
@@ -0,0 +1,41 @@
+"""add cart user product unique
+
+Revision ID: f2c85b1d7a40
+Revises: d41f7a9c3e82
+Create Date: 2026-10-18 18:41:09.873215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c85b1d7a40'
+down_revision = 'd41f7a9c3e82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate lines into the oldest line of each (user_id, product_id)
+    cart = sa.table('cart', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                    sa.column('product_id', sa.Integer), sa.column('quantity', sa.Integer))
+    connection = op.get_bind()
+    duplicates = connection.execute(
+        sa.select(cart.c.user_id, cart.c.product_id, sa.func.min(cart.c.id), sa.func.sum(sa.func.coalesce(cart.c.quantity, 1)))
+        .group_by(cart.c.user_id, cart.c.product_id)
+        .having(sa.func.count() > 1)
+    ).all()
+    for user_id, product_id, keep_id, quantity in duplicates:
+        connection.execute(sa.update(cart).where(cart.c.id == keep_id).values(quantity=quantity))
+        connection.execute(sa.delete(cart).where(
+            cart.c.user_id == user_id, cart.c.product_id == product_id, cart.c.id != keep_id
+        ))
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_cart_user_product', ['user_id', 'product_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cart_user_product', type_='unique')
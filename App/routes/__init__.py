@@ -9,6 +9,7 @@ from .store import store_bp
 from .admin import admin_bp
 from .cart import cart_bp # Import the cart blueprint
 from .order import order_bp # Import the order blueprint
+from .media import media_bp # Import the media blueprint
 
 # List of all blueprints to register
 blueprints = [
@@ -17,5 +18,6 @@ blueprints = [
     (store_bp, "/api/store"),
     (admin_bp, "/api/admin"), 
     (cart_bp, "/api/cart"),
-    (order_bp, "/api/order") # Register the order blueprint
+    (order_bp, "/api/order"), # Register the order blueprint
+    (media_bp, "/api/media")
 ]
@@ -4,3 +4,7 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 from . import store_requests # Import to register routes
 from . import stores_management # Import to register store management routes
+from . import cache_stats # Import to register cache metrics routes
+from . import image_duplicates # Import to register the image duplicate report route
+from . import users_management # Import to register user ban routes
+from . import password_benchmark # Import to register the password hashing benchmark route
@@ -0,0 +1,20 @@
+from flask import jsonify
+from . import admin_bp
+from utils.decorators import admin_required
+from services.product_service import get_product_cache_stats
+from services.principal_service import get_principal_cache_stats
+from services.guest_cart_service import get_guest_cart_stats
+
+@admin_bp.route('/cache-stats', methods=['GET'])
+@admin_required
+def cache_stats():
+    """Returns hit/miss metrics of the application caches."""
+    try:
+        return jsonify({
+            "product_cache": get_product_cache_stats(),
+            "principal_cache": get_principal_cache_stats(),
+            "guest_cart_store": get_guest_cart_stats()
+        }), 200
+    except Exception as e:
+        print(f"Error reading cache stats: {str(e)}")
+        return jsonify({"error": "An internal error occurred while reading cache stats."}), 500
@@ -0,0 +1,21 @@
+from flask import jsonify, request
+from . import admin_bp
+from utils.decorators import admin_required
+from services.image_service import find_duplicate_clusters
+
+@admin_bp.route('/image-duplicates', methods=['GET'])
+@admin_required
+def list_image_duplicates():
+    """
+    Reports clusters of near-identical stored images, largest first, with how many users,
+    stores and products use each one. Query string: limit (number of clusters, default 100).
+    """
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        if limit <= 0:
+            return jsonify({"error": "limit must be a positive integer."}), 400
+        clusters = find_duplicate_clusters(limit)
+        return jsonify({"clusters": clusters, "count": len(clusters)}), 200
+    except Exception as e:
+        print(f"Error listing image duplicates: {str(e)}")
+        return jsonify({"error": "An internal error occurred while listing image duplicates."}), 500
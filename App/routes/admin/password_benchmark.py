@@ -0,0 +1,17 @@
+from flask import jsonify, request
+from . import admin_bp
+from utils.decorators import admin_required
+from services.password_service import benchmark, PasswordHashingBusy
+
+@admin_bp.route('/password-benchmark', methods=['GET'])
+@admin_required
+def password_benchmark():
+    """Measures password hashing throughput (per core and through the worker pool). Query string: samples (1-20)."""
+    try:
+        samples = min(max(request.args.get('samples', 5, type=int), 1), 20)
+        return jsonify(benchmark(samples)), 200
+    except PasswordHashingBusy:
+        return jsonify({"error": "Password hashing is busy; try the benchmark again later."}), 503
+    except Exception as e:
+        print(f"Error running password benchmark: {str(e)}")
+        return jsonify({"error": "An internal error occurred while running the password benchmark."}), 500
@@ -5,49 +5,50 @@ from DataBase.models import StoreCreationRequest, User, StoreCreationRequestStat
 from utils.decorators import admin_required
 from flask_login import current_user # Import current_user
 from datetime import datetime # Import datetime
+from sqlalchemy.orm import joinedload
+from utils.serializers import Serializer, Field, isoformat
+from services.principal_service import invalidate_principal
+
+STORE_REQUEST_SERIALIZER = Serializer(StoreCreationRequest, {
+    "id": None,
+    "user_id": None,
+    "requester": Field(getter=lambda req: {
+        "id": req.requester.id,
+        "username": req.requester.username,
+        "email": req.requester.email
+    } if req.requester else None, columns=("user_id",)),
+    "status": None,
+    "created_at": Field(convert=isoformat),
+    "reviewed_at": Field(convert=isoformat),
+    "admin_reviewer_id": None,
+    "reviewer": Field(getter=lambda req: {
+        "id": req.reviewer.id,
+        "username": req.reviewer.username
+    } if req.reviewer else None, columns=("admin_reviewer_id",)),
+})
 
 @admin_bp.route('/store-requests', methods=['GET'])
 @admin_required
 def list_store_requests():
-    """Lists store creation requests, optionally filtered by status."""
+    """Lists store creation requests, optionally filtered by status. Query string: status, fields (sparse fieldset)."""
     status_filter = request.args.get('status')
-    
+    try:
+        fields = STORE_REQUEST_SERIALIZER.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Base query, ordered by creation date descending
-    query = StoreCreationRequest.query.order_by(StoreCreationRequest.created_at.desc())
+    query = StoreCreationRequest.query.options(STORE_REQUEST_SERIALIZER.load_options(fields)).order_by(StoreCreationRequest.created_at.desc())
+    if fields is None or 'requester' in fields:
+        query = query.options(joinedload(StoreCreationRequest.requester).load_only(User.username, User.email))
+    if fields is None or 'reviewer' in fields:
+        query = query.options(joinedload(StoreCreationRequest.reviewer).load_only(User.username))
     
     if status_filter:
         # Ensure the status filter is a valid one if necessary, or let DB handle it
         query = query.filter_by(status=status_filter)
     
-    requests_list = query.all()
-    
-    output = []
-    for req in requests_list:
-        requester_info = None
-        if req.requester: # Check if the requester relationship is loaded
-            requester_info = {
-                "id": req.requester.id, 
-                "username": req.requester.username, 
-                "email": req.requester.email
-            }
-        
-        reviewer_info = None
-        if req.reviewer: # Check if the reviewer relationship is loaded
-            reviewer_info = {
-                "id": req.reviewer.id, 
-                "username": req.reviewer.username
-            }
-            
-        output.append({
-            "id": req.id,
-            "user_id": req.user_id,
-            "requester": requester_info,
-            "status": req.status,
-            "created_at": req.created_at.isoformat() if req.created_at else None,
-            "reviewed_at": req.reviewed_at.isoformat() if req.reviewed_at else None,
-            "admin_reviewer_id": req.admin_reviewer_id,
-            "reviewer": reviewer_info
-        })
+    output = STORE_REQUEST_SERIALIZER.serialize_many(query.all(), fields)
         
     return jsonify(output), 200
 
@@ -76,6 +77,7 @@ def approve_store_request(request_id):
         user.can_create_store = True
         
         db.session.commit()
+        invalidate_principal(user.id)
         
         return jsonify({"message": "Store creation request approved successfully."}), 200
 
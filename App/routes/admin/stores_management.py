@@ -1,33 +1,49 @@
-from flask import jsonify
+from flask import jsonify, request
+from sqlalchemy.orm import joinedload, selectinload
 from . import admin_bp # Corrected import for admin_bp
 from application.extensions import db
 from DataBase.models import Store, User
 from utils.decorators import admin_required
+from services.fuzzy_search_service import index_store
 from datetime import datetime # Though not strictly needed now, good for future audit fields
+from utils.serializers import Serializer, Field, isoformat
+from services.image_service import image_url
+
+ADMIN_STORE_SERIALIZER = Serializer(Store, {
+    "id": None,
+    "name": None,
+    "storeUsername": None,
+    "is_active": None,
+    "is_verified": None,
+    "created_at": Field(convert=isoformat),
+    "store_logo": Field(getter=lambda store: image_url(store.store_logo_key, store.store_logo_asset), columns=("store_logo_key",)),
+    "store_banner": Field(getter=lambda store: image_url(store.store_banner_key, store.store_banner_asset), columns=("store_banner_key",)),
+    "owner": Field(getter=lambda store: {
+        "owner_id": store.owner_id,
+        "owner_username": store.owner.username if store.owner else "N/A",
+        "owner_email": store.owner.email if store.owner else "N/A"
+    }, columns=("owner_id",)),
+})
 
 @admin_bp.route('/stores', methods=['GET'])
 @admin_required
 def list_all_stores():
-    """Lists all stores with their owner details."""
+    """Lists all stores with their owner details. Query string: fields (sparse fieldset)."""
     try:
-        stores = Store.query.all()
-        output = []
-        for store in stores:
-            owner_info = {
-                "owner_id": store.owner_id,
-                "owner_username": store.owner.username if store.owner else "N/A",
-                "owner_email": store.owner.email if store.owner else "N/A"
-            }
-            output.append({
-                "id": store.id,
-                "name": store.name,
-                "storeUsername": store.storeUsername,
-                "is_active": store.is_active,
-                "is_verified": store.is_verified,
-                "created_at": store.created_at.isoformat() if store.created_at else None,
-                "owner": owner_info
-            })
+        fields = ADMIN_STORE_SERIALIZER.parse_fields(request.args.get('fields'))
+        # Only the listed columns are selected
+        query = Store.query.options(ADMIN_STORE_SERIALIZER.load_options(fields))
+        if fields is None or 'owner' in fields:
+            query = query.options(joinedload(Store.owner).load_only(User.username, User.email))
+        # Renditions of all listed logos/banners are loaded with one extra query each
+        if fields is None or 'store_logo' in fields:
+            query = query.options(selectinload(Store.store_logo_asset))
+        if fields is None or 'store_banner' in fields:
+            query = query.options(selectinload(Store.store_banner_asset))
+        output = ADMIN_STORE_SERIALIZER.serialize_many(query.all(), fields)
         return jsonify(output), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error listing all stores: {str(e)}")
         return jsonify({"error": "An internal error occurred while listing stores."}), 500
@@ -60,6 +76,7 @@ def activate_store(store_id):
         
         store.is_active = True
         db.session.commit()
+        index_store(store)
         return jsonify({"message": f"Store '{store.name}' activated successfully."}), 200
     except Exception as e:
         db.session.rollback()
@@ -77,6 +94,7 @@ def deactivate_store(store_id):
         
         store.is_active = False
         db.session.commit()
+        index_store(store)
         return jsonify({"message": f"Store '{store.name}' deactivated successfully."}), 200
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,48 @@
+from flask import jsonify
+from flask_login import current_user
+from . import admin_bp
+from application.extensions import db
+from DataBase.models import User
+from utils.decorators import admin_required
+from services.principal_service import invalidate_principal, record_account_status, revoke_sessions
+
+@admin_bp.route('/users/<int:user_id>/ban', methods=['POST'])
+@admin_required
+def ban_user(user_id):
+    """Bans a user and signs out all of their sessions."""
+    try:
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "User not found."}), 404
+        if user.id == current_user.id:
+            return jsonify({"error": "You cannot ban yourself."}), 400
+
+        user.is_banned = True
+        revoke_sessions(user)
+        db.session.commit()
+        invalidate_principal(user.id)
+        record_account_status(user)
+        return jsonify({"message": f"User '{user.username}' banned successfully."}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error banning user {user_id}: {str(e)}")
+        return jsonify({"error": "An internal error occurred while banning the user."}), 500
+
+@admin_bp.route('/users/<int:user_id>/unban', methods=['POST'])
+@admin_required
+def unban_user(user_id):
+    """Lifts a user's ban. Sessions revoked by the ban stay revoked; the user logs in again."""
+    try:
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"error": "User not found."}), 404
+
+        user.is_banned = False
+        db.session.commit()
+        invalidate_principal(user.id)
+        record_account_status(user)
+        return jsonify({"message": f"User '{user.username}' unbanned successfully."}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error unbanning user {user_id}: {str(e)}")
+        return jsonify({"error": "An internal error occurred while unbanning the user."}), 500
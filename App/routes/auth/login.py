@@ -1,22 +1,29 @@
 """Handles user authentication, including login functionality with rate limiting and security checks."""
 from flask import request, jsonify, session
-from werkzeug.security import check_password_hash
 from sqlalchemy import func, or_
-import base64
 from application.extensions import db
 from DataBase.models import User
+from services.image_service import image_url, rendition_urls
+from services.password_service import verify_and_update, PasswordHashingBusy
+from services.guest_cart_service import get_guest_cart_id, merge_guest_cart, clear_guest_cart_cookie
+from utils.rate_limit import RateLimit, rate_limit, client_ip, json_field
 from . import auth_bp
-from functools import wraps
 import time
 from datetime import datetime, timedelta
 import re
 from flask_login import login_user, current_user
 
-# Simple in-memory rate limiting with IP and username tracking
-login_attempts = {}
-username_attempts = {}
+# Login attempts allowed per client IP and per username/email within the window
 MAX_ATTEMPTS = 50
 WINDOW_SECONDS = 300  # 5 minutes
+LOGIN_IP_LIMIT = RateLimit(
+    "login-ip", MAX_ATTEMPTS, WINDOW_SECONDS, client_ip,
+    message="Too many login attempts. Please try again later."
+)
+LOGIN_IDENTIFIER_LIMIT = RateLimit(
+    "login-identifier", MAX_ATTEMPTS, WINDOW_SECONDS, json_field('identifier'),
+    message="Account temporarily locked. Please try again later."
+)
 SUSPICIOUS_PATTERNS = [
     r'(?i)(union\s+select|select\s+.*\s+from|drop\s+table)',  # SQL injection
     r'<[^>]*script.*?>',  # XSS
@@ -29,52 +36,8 @@ def is_suspicious_input(text):
         return False
     return any(re.search(pattern, text) for pattern in SUSPICIOUS_PATTERNS)
 
-def rate_limit(f):
-    """Decorator to enforce rate limiting on login attempts based on IP and username."""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        ip = request.remote_addr
-        current_time = time.time()
-        
-        # Clean up old entries
-        login_attempts.update((k, v) for k, v in login_attempts.items() 
-                            if v['timestamp'] > current_time - WINDOW_SECONDS)
-        username_attempts.update((k, v) for k, v in username_attempts.items() 
-                               if v['timestamp'] > current_time - WINDOW_SECONDS)
-        
-        # Check IP-based rate limit
-        if ip in login_attempts:
-            if login_attempts[ip]['attempts'] >= MAX_ATTEMPTS:
-                return jsonify({
-                    "message": "Too many login attempts. Please try again later.",
-                    "retry_after": int(login_attempts[ip]['timestamp'] + WINDOW_SECONDS - current_time)
-                }), 429
-            login_attempts[ip]['attempts'] += 1
-        else:
-            login_attempts[ip] = {'attempts': 1, 'timestamp': current_time}
-            
-        # Get identifier from request for username-based rate limiting
-        try:
-            data = request.get_json()
-            if data and 'identifier' in data:
-                identifier = data['identifier'].strip().lower()
-                if identifier in username_attempts:
-                    if username_attempts[identifier]['attempts'] >= MAX_ATTEMPTS:
-                        return jsonify({
-                            "message": "Account temporarily locked. Please try again later.",
-                            "retry_after": int(username_attempts[identifier]['timestamp'] + WINDOW_SECONDS - current_time)
-                        }), 429
-                    username_attempts[identifier]['attempts'] += 1
-                else:
-                    username_attempts[identifier] = {'attempts': 1, 'timestamp': current_time}
-        except:
-            pass  # Don't block the request if we can't parse the identifier
-        
-        return f(*args, **kwargs)
-    return decorated_function
-
 @auth_bp.route('/login', methods=['POST'])
-@rate_limit
+@rate_limit(LOGIN_IP_LIMIT, LOGIN_IDENTIFIER_LIMIT)
 def login():
     # Clear previous session data
     session.clear()  # Clear any existing session
@@ -110,8 +73,8 @@ def login():
             func.lower(User.email) == identifier
         )).first()
 
-        # Password check and account status validation
-        if user and check_password_hash(user.password, password):
+        # Password check (legacy hashes are upgraded, committed below) and account status validation
+        if user and verify_and_update(user, password):
             if not user.is_active:
                 print(f"Login attempt for inactive account: {identifier} at {attempt_time}")
                 return jsonify({"message": "Account is inactive"}), 401
@@ -125,10 +88,8 @@ def login():
                 return jsonify({"message":"Account is deleted"}), 401
 
             # Clear rate limiting on successful login
-            if request.remote_addr in login_attempts:
-                del login_attempts[request.remote_addr]
-            if identifier in username_attempts:
-                del username_attempts[identifier]
+            LOGIN_IP_LIMIT.reset(request.remote_addr)
+            LOGIN_IDENTIFIER_LIMIT.reset(identifier)
 
             # Log user in and manage session
             login_user(user)
@@ -140,17 +101,23 @@ def login():
             session['created_at'] = int(time.time())
             session['expires_at'] = int(time.time()) + 24 * 60 * 60  # 24 hour expiry
             session['ip_address'] = request.remote_addr  # For IP binding
+            session['security_version'] = user.security_version  # Revoked once the user's version is bumped
             
             # Update user's last login time
             user.last_login = datetime.utcnow()
             db.session.commit()
             
-            profile_image_base64 = None
-            if user.profile_image:
-                profile_image_base64 = base64.b64encode(user.profile_image).decode('utf-8')
+            # Move the cart built before logging in into the user's cart
+            guest_cart_id = get_guest_cart_id()
+            if guest_cart_id:
+                try:
+                    merge_guest_cart(user.id, guest_cart_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error merging guest cart for user {user.username}: {str(e)}")
 
             print(f"Successful login for user: {user.username} at {attempt_time}")
-            return jsonify({
+            response = jsonify({
                 "message": "Login successful",
                 "user": {
                     "id": user.id,
@@ -159,14 +126,21 @@ def login():
                     "email": user.email,
                     "is_admin": user.is_admin,
                     "is_seller": user.is_seller,
-                    "profile_image": profile_image_base64,
+                    "profile_image": image_url(user.profile_image_key, user.profile_image_asset),
+                    "profile_image_renditions": rendition_urls(user.profile_image_asset),
                     "last_login": user.last_login.isoformat() if user.last_login else None
                 }
-            }), 200
+            })
+            if guest_cart_id:
+                clear_guest_cart_cookie(response)
+            return response, 200
         else:
             print(f"Failed login attempt for: {identifier} at {attempt_time}")
             return jsonify({"message": "Invalid username/email or password"}), 401
 
+    except PasswordHashingBusy as e:
+        print(f"Login rejected, password hashing busy: {str(e)} at {attempt_time}")
+        return jsonify({"message": "Server is busy. Please try again shortly."}), 503, {"Retry-After": "1"}
     except Exception as e:
         print(f"Login error: {str(e)} at {attempt_time}")
         return jsonify({"message": "An error occurred during login"}), 500
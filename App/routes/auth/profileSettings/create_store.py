@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, session
 from flask_login import login_required, current_user
 from DataBase.models import db, Store
-from utils.image_utils import save_image
+from utils.image_utils import decode_image_data
+from services.image_service import store_image, image_url
+from services.principal_service import invalidate_principal
 
 create_store_bp = Blueprint('create_store', __name__, url_prefix='/create-store')
 
@@ -44,20 +46,23 @@ def create_store():
         )
 
         # Handle store image if provided
+        logo_asset = None
         if 'store_image' in data and data['store_image']:
             try:
-                image_data = save_image(data['store_image'])
-                store.image = image_data
-            except Exception as e:
+                logo_asset = store_image(decode_image_data(data['store_image']))
+                store.store_logo_key = logo_asset.source_key
+            except ValueError as e:
                 print(f"Error saving store image: {str(e)}")
                 return jsonify({'error': f'Failed to save store image: {str(e)}'}), 400
 
         # Update user's seller status
-        current_user.is_seller = True
+        user = current_user.user
+        user.is_seller = True
         
         # Save to database
         db.session.add(store)
         db.session.commit()
+        invalidate_principal(user.id) # is_seller and store_id changed
         print("Store created successfully")
 
         # Return success response with store and updated user data
@@ -68,14 +73,15 @@ def create_store():
                 'name': store.name,
                 'description': store.description,
                 'location': store.location,
-                'category': store.category
+                'category': store.category,
+                'store_logo': image_url(store.store_logo_key, logo_asset)
             },
             'user': {
-                'id': current_user.id,
-                'is_seller': current_user.is_seller,
-                'username': current_user.username,
-                'email': current_user.email,
-                'full_name': current_user.full_name
+                'id': user.id,
+                'is_seller': user.is_seller,
+                'username': user.username,
+                'email': user.email,
+                'full_name': user.full_name
             }
         }), 201
 
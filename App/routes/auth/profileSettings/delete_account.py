@@ -1,7 +1,8 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user, logout_user
 from DataBase.models import User, Store, db
-from werkzeug.security import check_password_hash
+from services.password_service import verify_password, PasswordHashingBusy
+from services.principal_service import invalidate_principal, record_account_status
 
 delete_account_bp = Blueprint('delete_account', __name__)
 
@@ -13,7 +14,8 @@ def delete_account():
         password = data.get('password')
         
         # Validate password
-        if not check_password_hash(current_user.password, password):
+        user = current_user.user
+        if not verify_password(user.password, password):
             return jsonify({'error': 'Password is incorrect'}), 400
         
         # Delete user's store if they have one
@@ -22,14 +24,19 @@ def delete_account():
             db.session.delete(store)
         
         # Delete the user
-        db.session.delete(current_user)
+        db.session.delete(user)
         db.session.commit()
+        invalidate_principal(user.id)
+        record_account_status(user, deleted=True)
         
         # Log the user out
         logout_user()
         
         return jsonify({'message': 'Account deleted successfully'}), 200
         
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please try again shortly.'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500 
\ No newline at end of file
@@ -1,7 +1,8 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, session
 from flask_login import login_required, current_user
 from DataBase.models import User, db
-from werkzeug.security import check_password_hash, generate_password_hash
+from services.password_service import verify_password, hash_password, PasswordHashingBusy
+from services.principal_service import invalidate_principal, record_account_status, revoke_sessions
 
 update_password_bp = Blueprint('update_password', __name__)
 
@@ -14,15 +15,24 @@ def update_password():
         new_password = data.get('new_password')
         
         # Validate current password
-        if not check_password_hash(current_user.password, current_password):
+        user = current_user.user
+        if not verify_password(user.password, current_password):
             return jsonify({'error': 'Current password is incorrect'}), 400
         
         # Update password
-        current_user.password = generate_password_hash(new_password)
+        user.password = hash_password(new_password)
+        # Sign out every other session; this one stays valid with the new version
+        revoke_sessions(user)
         db.session.commit()
+        invalidate_principal(user.id)
+        record_account_status(user)
+        session['security_version'] = user.security_version
         
         return jsonify({'message': 'Password updated successfully'}), 200
         
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please try again shortly.'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500 
\ No newline at end of file
@@ -1,33 +1,20 @@
-from flask import Blueprint, jsonify, request, session
-# Make sure you don't import current_user if you're not using Flask-Login
-# from flask_login import current_user # <-- Remove this if not using Flask-Login
+from flask import Blueprint, jsonify, request
+from flask_login import login_required, current_user
 from DataBase.models import User, db
-import base64
+from utils.image_utils import decode_image_data
+from services.image_service import store_image, store_image_file, image_url, rendition_urls
+from services.principal_service import invalidate_principal
 
 update_profile_bp = Blueprint('update_profile', __name__)
 
 @update_profile_bp.route('/update-profile', methods=['POST','PUT'])
+@login_required
 def update_profile():
     try:
-        # --- CORRECTED AUTHENTICATION CHECK ---
-        # Check if user_id is in the session
-        if 'user_id' not in session:
-            # If not in session, return Unauthorized
-            return jsonify({'error': 'Unauthorized'}), 401
-
-        # Get user from the database using the ID stored in the session
-        user_id = session['user_id']
-        user = User.query.get(user_id)
-
-        # If user_id was in session but the user doesn't exist in the DB
-        if not user:
-            # Optionally clear the session if user not found
-            session.pop('user_id', None)
-            return jsonify({'error': 'User not found'}), 404
-        # --- END CORRECTED AUTHENTICATION CHECK ---
+        # Through Flask-Login, so revoked sessions (ban, password change) are rejected
+        user = current_user.user
 
         # Add debug logging
-        # No need to check user.is_authenticated if not using Flask-Login
         print("User ID from session:", user.id)
 
         data = request.get_json()
@@ -59,32 +46,17 @@ def update_profile():
         if email:
             user.email = email
         if profile_image_data_url:
-            # Remove the data URL prefix if present
-            if profile_image_data_url.startswith('data:image'):
-                profile_image_base64 = profile_image_data_url.split(',')[1]
-            else:
-                profile_image_base64 = profile_image_data_url # Assume it's just base64 if no prefix
+            # Renditions are generated in the image worker pool
             try:
-                user.profile_image = base64.b64decode(profile_image_base64)
-            except Exception as e:
-                 print(f"Error decoding profile image base64: {str(e)}")
+                user.profile_image_key = store_image(decode_image_data(profile_image_data_url)).source_key
+            except ValueError as e:
+                 print(f"Error processing profile image: {str(e)}")
                  return jsonify({'error': 'Invalid profile image format'}), 400
 
 
         # Save changes to database
         db.session.commit()
-
-        # Prepare profile image for response
-        profile_image_base64 = None
-        if user.profile_image:
-            try:
-                profile_image_base64 = base64.b64encode(user.profile_image).decode('utf-8')
-            except Exception as e:
-                # This shouldn't happen if decoding worked earlier, but good to be safe
-                print(f"Error encoding profile image for response: {str(e)}")
-                # Decide if you want to fail or just return without the image
-                # For now, let's just print and continue without the image
-                profile_image_base64 = None # Ensure it's None on error
+        invalidate_principal(user.id) # The principal carries the profile summary
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -93,8 +65,9 @@ def update_profile():
                 'full_name': user.full_name,
                 'username': user.username,
                 'email': user.email,
-                # Prepend data URL prefix for client if needed
-                'profile_image': f"data:image/png;base64,{profile_image_base64}" if profile_image_base64 else None,
+                # URL of the stored image (cacheable), instead of the image inline
+                'profile_image': image_url(user.profile_image_key, user.profile_image_asset),
+                'profile_image_renditions': rendition_urls(user.profile_image_asset),
                 'is_admin': user.is_admin, # Make sure your User model has these attributes
                 'is_seller': user.is_seller # Make sure your User model has these attributes
             }
@@ -103,4 +76,33 @@ def update_profile():
     except Exception as e:
         print("Error in update_profile:", str(e))  # Add error logging
         db.session.rollback()
-        return jsonify({'error': 'An internal error occurred: ' + str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'An internal error occurred: ' + str(e)}), 500
+
+@update_profile_bp.route('/profile-image', methods=['PUT'])
+@login_required
+def upload_profile_image():
+    """Replaces the user's profile image with an image uploaded as multipart/form-data (file field "image")."""
+    user = current_user.user
+
+    # The file part is streamed to a temporary file by the form parser, not read into memory
+    image_file = request.files.get('image')
+    if image_file is None:
+        return jsonify({'error': "No image provided. Send it as multipart/form-data in the 'image' field."}), 400
+
+    try:
+        asset = store_image_file(image_file.stream)
+        user.profile_image_key = asset.source_key
+        db.session.commit()
+        invalidate_principal(user.id)
+        return jsonify({
+            'message': 'Profile image updated successfully',
+            'profile_image': image_url(asset.source_key, asset),
+            'profile_image_renditions': rendition_urls(asset)
+        }), 200
+    except ValueError as e:
+        print(f"Error processing profile image: {str(e)}")
+        return jsonify({'error': 'Invalid profile image format'}), 400
+    except Exception as e:
+        print("Error in upload_profile_image:", str(e))
+        db.session.rollback()
+        return jsonify({'error': 'An internal error occurred'}), 500
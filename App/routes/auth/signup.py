@@ -1,12 +1,13 @@
 """Handles new user registration process."""
 from flask import request, jsonify
-from werkzeug.security import generate_password_hash
 from sqlalchemy import or_
 import re
-import base64 # Import the base64 module
 from application.extensions import db
 from DataBase.models import User
 from flask_login import login_user
+from utils.image_utils import decode_image_data
+from services.image_service import store_image, image_url, rendition_urls
+from services.password_service import hash_password, PasswordHashingBusy
 from . import auth_bp  # Import the existing blueprint
 
 @auth_bp.route('/signup', methods=['POST'])
@@ -39,20 +40,20 @@ def signup():
             full_name=full_name,
             username=username,
             email=email,
-            password=generate_password_hash(password), # generate_password_hash returns string
+            password=hash_password(password), # Hashed in the password worker pool
             is_admin=False,
             is_seller=False
         )
 
-        # Process profile image if provided
+        # Process profile image if provided (renditions are generated in the image worker pool)
+        profile_image_asset = None
         if profile_image_b64:
             # Safe to proceed only if it's a string
             if isinstance(profile_image_b64, str):
-                if profile_image_b64.startswith('data:image'):
-                    profile_image_b64 = profile_image_b64.split(',')[1]
                 try:
-                    user.profile_image = base64.b64decode(profile_image_b64)
-                except Exception as e:
+                    profile_image_asset = store_image(decode_image_data(profile_image_b64))
+                    user.profile_image_key = profile_image_asset.source_key
+                except ValueError as e:
                     return jsonify({'error': f'Invalid profile image data: {e}'}), 400
             else:
                 return jsonify({'error': 'Profile image must be a base64-encoded string'}), 400
@@ -66,10 +67,7 @@ def signup():
         # Log the user in (optional, depending on your flow)
         login_user(user)
 
-        # Note: When returning the user object, you might need to re-encode
-        # the profile_image bytes back to base64 if the frontend expects it that way.
-        # For simplicity here, I'm not including the image bytes in the response JSON.
-        # If you need it, add: 'profile_image': base64.b64encode(user.profile_image).decode('utf-8') if user.profile_image else None
+        # The profile image is returned as the URL it is served from, not inline
         return jsonify({
             'message': 'User registered successfully',
             'user': {
@@ -77,12 +75,16 @@ def signup():
                 'full_name': user.full_name,
                 'username': user.username,
                 'email': user.email,
-                'profile_image': base64.b64encode(user.profile_image).decode('utf-8') if user.profile_image else None,
+                'profile_image': image_url(user.profile_image_key, profile_image_asset),
+                'profile_image_renditions': rendition_urls(profile_image_asset),
                 'is_admin': user.is_admin,
                 'is_seller': user.is_seller
             }
         }), 200
 
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy. Please try again shortly.'}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         # Log the full exception for debugging on the server side
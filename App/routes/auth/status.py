@@ -1,9 +1,10 @@
 from flask import jsonify, session, request
 from flask_login import login_required, current_user
-import requests
-import base64
-from DataBase.models import User, StoreCreationRequest, StoreCreationRequestStatus # Import new models
+from DataBase.models import StoreCreationRequest, StoreCreationRequestStatus # Import new models
 from application.extensions import db # Import db
+from services.image_service import image_url, rendition_urls
+from services.principal_service import load_principal, session_is_current
+from utils.geoip import lookup_ip
 from . import auth_bp
 import time
 
@@ -12,21 +13,10 @@ def check_session():
     ip=request.remote_addr
     print(f"ip address: {ip}")
 
-
-
-
-    # Check if the IP is lnott ocalhost or IPv6 loopback address
-    if ip != '127.0.0.1' or ip != '::1':
-        # Get ip information such country, city using http://ip-api.com/json/{ip}
-        response = requests.get(f'http://ip-api.com/json/{ip}')
-        response_json = response.json()
-        country = response_json.get('country')
-        city = response_json.get('city')
-
-
-    print("Localhost IP detected, using default IP for testing.")
-    country = "Local"
-    city= "host"
+    # Resolved from the local GeoIP database; private addresses and unknown ranges fall back to "Local host"
+    location = lookup_ip(ip) or {}
+    country = location.get('country') or "Local"
+    city = location.get('city') or "host"
 
     try:
         # Check if session exists and hasn't expired
@@ -43,20 +33,17 @@ def check_session():
             session.clear()
             return jsonify({'isLoggedIn': False, 'message': 'Session invalid'}), 401
 
-        user = User.query.get(session['user_id'])
+        # Served from the principal cache; session_is_current reads the shared account status file, not the database
+        user = load_principal(session['user_id'])
         if user:
+            if not session_is_current(user):
+                session.clear()
+                return jsonify({'isLoggedIn': False, 'message': 'Session revoked'}), 401
+
             if not user.is_active or user.is_banned:
                 session.clear()
                 return jsonify({'isLoggedIn': False, 'message': 'Account status changed'}), 401
 
-            profile_image_base64 = None
-            if user.profile_image:
-                try:
-                    profile_image_base64 = base64.b64encode(user.profile_image).decode('utf-8')
-                except Exception as e:
-                    print(f"Error encoding profile image: {str(e)}")
-                    # Continue without profile image if encoding fails
-
             return jsonify({
                 'isLoggedIn': True,
                 'user': {
@@ -70,7 +57,8 @@ def check_session():
                     "city": city,
                     "is_admin": user.is_admin,
                     "is_seller": user.is_seller,
-                    "profile_image": profile_image_base64
+                    "profile_image": image_url(user.profile_image_key, user.profile_image_asset),
+                    "profile_image_renditions": rendition_urls(user.profile_image_asset)
                 }
             }), 200
         else:
@@ -1,21 +1,52 @@
 # App/routes/cart/cart.py
-"""API endpoints for managing the user's shopping cart."""
+"""API endpoints for managing the user's shopping cart.
+
+Anonymous shoppers get a guest cart (see services.guest_cart_service), identified by a
+signed cookie and merged into their cart when they log in. Guest cart items are
+addressed by product ID in the /items/<id> routes.
+
+For logged-in users, `?delta=true` on a mutation returns only the affected line, the new
+total and the cart version instead of the whole cart, and `GET /api/cart?since_version=<n>`
+returns {"unchanged": true, "cart_version": n} when neither the cart's lines nor the products
+in it have changed since version n. Guest carts ignore both.
+"""
 from flask import jsonify, request
-from flask_login import current_user, login_required
+from flask_login import current_user
 from . import cart_bp # From App/routes/cart/__init__.py
 from services.cart_service import (
     add_to_cart,
     get_cart,
     update_cart_item_quantity,
     remove_from_cart,
-    clear_cart # Though not explicitly requested in this step, it's a standard cart function
+    clear_cart, # Though not explicitly requested in this step, it's a standard cart function
+    apply_cart_operations
+)
+from services.guest_cart_service import (
+    get_guest_cart_id,
+    new_guest_cart_id,
+    set_guest_cart_cookie,
+    add_to_guest_cart,
+    get_guest_cart,
+    update_guest_cart_quantity,
+    remove_from_guest_cart,
+    clear_guest_cart,
+    apply_guest_cart_operations
 )
 from application.extensions import db # For potential rollback in generic exception handlers
 
+def _delta_requested():
+    """Whether the client asked for a delta response (?delta=true / 1)."""
+    return request.args.get('delta', '').lower() in ('true', '1', 't', 'yes')
+
+def _guest_cart_response(payload, status, cart_id):
+    """JSON response for an anonymous shopper, (re)setting the signed cookie of their cart."""
+    response = jsonify(payload)
+    set_guest_cart_cookie(response, cart_id)
+    return response, status
+
 @cart_bp.route('/', methods=['POST'])
-@login_required
 def add_item_to_cart():
-    """Adds an item to the current user's shopping cart."""
+    """Adds an item to the current user's shopping cart, or to the guest cart of an anonymous shopper."""
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
@@ -27,7 +58,10 @@ def add_item_to_cart():
         return jsonify({"error": "product_id and positive quantity are required."}), 400
 
     try:
-        cart_item_data = add_to_cart(user_id=current_user.id, product_id=product_id, quantity=quantity)
+        if not current_user.is_authenticated:
+            cart_id = get_guest_cart_id() or new_guest_cart_id()
+            return _guest_cart_response(add_to_guest_cart(cart_id, product_id, quantity), 201, cart_id)
+        cart_item_data = add_to_cart(user_id=current_user.id, product_id=product_id, quantity=quantity, delta=_delta_requested())
         return jsonify(cart_item_data), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400 # Service raises ValueError for stock issues or bad input
@@ -37,18 +71,19 @@ def add_item_to_cart():
         return jsonify({"error": "An internal error occurred."}), 500
 
 @cart_bp.route('/', methods=['GET'])
-@login_required
 def view_cart():
-    """Retrieves the current user's shopping cart."""
+    """Retrieves the current user's shopping cart; ?since_version=<n> skips it if unchanged since version n."""
     try:
-        cart_data = get_cart(user_id=current_user.id)
+        if not current_user.is_authenticated:
+            cart_id = get_guest_cart_id()
+            return jsonify(get_guest_cart(cart_id) if cart_id else {"items": [], "total_cart_price": 0.0}), 200
+        cart_data = get_cart(user_id=current_user.id, since_version=request.args.get('since_version', type=int))
         return jsonify(cart_data), 200
     except Exception as e:
         print(f"Error viewing cart: {str(e)}") # Log for server
         return jsonify({"error": "An internal error occurred."}), 500
 
 @cart_bp.route('/items/<int:cart_item_id>', methods=['PUT'])
-@login_required
 def update_cart_item(cart_item_id):
     """Updates the quantity of an item in the current user's cart."""
     data = request.get_json()
@@ -61,7 +96,14 @@ def update_cart_item(cart_item_id):
         return jsonify({"error": "Valid quantity is required (integer, >= 0)."}), 400
 
     try:
-        updated_cart_data = update_cart_item_quantity(user_id=current_user.id, cart_item_id=cart_item_id, new_quantity=quantity)
+        if not current_user.is_authenticated:
+            cart_id = get_guest_cart_id()
+            if not cart_id:
+                return jsonify({"error": "Cart item not found."}), 404
+            return _guest_cart_response(update_guest_cart_quantity(cart_id, cart_item_id, quantity), 200, cart_id)
+        updated_cart_data = update_cart_item_quantity(
+            user_id=current_user.id, cart_item_id=cart_item_id, new_quantity=quantity, delta=_delta_requested()
+        )
         return jsonify(updated_cart_data), 200
     except ValueError as e:
         # Distinguish between item not found (404) and other ValueErrors (400) if possible from message
@@ -73,11 +115,15 @@ def update_cart_item(cart_item_id):
         return jsonify({"error": "An internal error occurred."}), 500
 
 @cart_bp.route('/items/<int:cart_item_id>', methods=['DELETE'])
-@login_required
 def remove_item_from_cart_route(cart_item_id):
     """Removes an item from the current user's cart."""
     try:
-        updated_cart_data = remove_from_cart(user_id=current_user.id, cart_item_id=cart_item_id)
+        if not current_user.is_authenticated:
+            cart_id = get_guest_cart_id()
+            if not cart_id:
+                return jsonify({"error": "Cart item not found."}), 404
+            return _guest_cart_response(remove_from_guest_cart(cart_id, cart_item_id), 200, cart_id)
+        updated_cart_data = remove_from_cart(user_id=current_user.id, cart_item_id=cart_item_id, delta=_delta_requested())
         return jsonify(updated_cart_data), 200
     except ValueError as e:
         # Specific check for "Cart item not found" to return 404
@@ -90,12 +136,39 @@ def remove_item_from_cart_route(cart_item_id):
 
 # Optional: Clear cart endpoint (not specified in subtask but good to have)
 @cart_bp.route('/', methods=['DELETE'])
-@login_required
 def clear_my_cart():
     """Clears all items from the current user's cart."""
     try:
+        if not current_user.is_authenticated:
+            cart_id = get_guest_cart_id()
+            return jsonify(clear_guest_cart(cart_id) if cart_id else {"items": [], "total_cart_price": 0.0}), 200
         cleared_cart_data = clear_cart(user_id=current_user.id)
         return jsonify(cleared_cart_data), 200 # Or 204 No Content with empty body
     except Exception as e:
         print(f"Error clearing cart: {str(e)}") # Log for server
         return jsonify({"error": "An internal error occurred."}), 500
+
+@cart_bp.route('/batch', methods=['PATCH'])
+def batch_update_cart():
+    """
+    Applies a list of add/set/remove operations to the current user's cart in one transaction.
+    Body: {"operations": [{"op": "add" | "set" | "remove", "product_id": int, "quantity": int}]}.
+    Returns only the changed lines, the removed product IDs, the new total and the cart version.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No input data provided"}), 400
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object."}), 400
+
+    try:
+        if not current_user.is_authenticated:
+            cart_id = get_guest_cart_id() or new_guest_cart_id()
+            return _guest_cart_response(apply_guest_cart_operations(cart_id, data.get('operations')), 200, cart_id)
+        result = apply_cart_operations(user_id=current_user.id, operations=data.get('operations'))
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400 # Nothing was applied
+    except Exception as e:
+        print(f"Error applying cart batch: {str(e)}") # Log for server
+        return jsonify({"error": "An internal error occurred."}), 500
@@ -0,0 +1,33 @@
+# App/routes/media/media.py
+from flask import jsonify, send_file
+from . import media_bp # From App/routes/media/__init__.py
+from utils.blob_store import get_blob_store, is_valid_key, content_type
+
+# A blob key is the hash of its content, so the bytes behind a URL never change
+CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@media_bp.route('/<key>', methods=['GET'])
+def get_media(key):
+    """
+    Serves a stored image by its blob key, straight from disk (sendfile where the server supports it).
+
+    The content hash is used as a strong ETag and the response may be cached forever, so
+    browsers and proxies only ask again with If-None-Match (answered with 304 Not Modified).
+    Range requests are answered with 206 Partial Content.
+    """
+    if not is_valid_key(key):
+        return jsonify({"error": "Media not found"}), 404
+    store = get_blob_store()
+    if not store.exists(key):
+        return jsonify({"error": "Media not found"}), 404
+    response = send_file(
+        store.path(key),
+        mimetype=content_type(key),
+        etag=key.split('.', 1)[0],
+        conditional=True,
+        max_age=CACHE_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
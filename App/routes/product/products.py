@@ -1,15 +1,131 @@
 from flask import Blueprint, jsonify, request
+from flask_login import current_user
 from application.extensions import db
 from . import product_bp
-from services.product_service import get_all_products # Import the service function
+from services.product_service import get_all_products, get_catalog_product, parse_product_fields, DEFAULT_PAGE_SIZE # Import the service functions
+from services.search_service import search_products, DEFAULT_SEARCH_LIMIT
+from services.fuzzy_search_service import fuzzy_search, DEFAULT_FUZZY_LIMIT
+from services.suggest_service import get_suggestions, DEFAULT_SUGGEST_LIMIT
+from services.facet_service import get_facet_counts
+
+
+def _parse_bool_arg(value):
+    """Parses a boolean query string value ('true'/'false', '1'/'0'); None if absent."""
+    if value is None:
+        return None
+    lowered = value.lower()
+    if lowered in ('true', '1', 't', 'yes'):
+        return True
+    if lowered in ('false', '0', 'f', 'no'):
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
 
 @product_bp.route('/products', methods=['GET', 'POST'])
 def products():
     if request.method == 'GET':
-        # The detailed logic for fetching products is now in product_service.get_all_products
-        products_data = get_all_products()
-        return jsonify(products_data), 200
+        # Query string: category_id, store_id, condition, min_price, max_price, in_stock,
+        # sort (newest|oldest|price_asc|price_desc), cursor, limit, facets (include facet counts),
+        # fields (comma-separated sparse fieldset, e.g. id,name,price)
+        try:
+            filters = {
+                'category_id': request.args.get('category_id', type=int),
+                'store_id': request.args.get('store_id', type=int),
+                'condition': request.args.get('condition'),
+                'min_price': request.args.get('min_price', type=float),
+                'max_price': request.args.get('max_price', type=float),
+                'in_stock': _parse_bool_arg(request.args.get('in_stock')),
+            }
+            products_data = get_all_products(
+                filters=filters,
+                sort=request.args.get('sort', 'newest'),
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                fields=parse_product_fields(request.args.get('fields'))
+            )
+            if _parse_bool_arg(request.args.get('facets')):
+                products_data['facets'] = get_facet_counts(filters)
+            return jsonify(products_data), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            print(f"Error listing products: {str(e)}") # Log for server
+            return jsonify({"error": "An internal error occurred while listing products."}), 500
     elif request.method == 'POST':
         # TODO: Implement logic to create a new product. This will involve validating request data, interacting with the database, and potentially handling image uploads.
         # Consider creating a create_product service function in product_service.py
         return jsonify({"message": "Product creation not yet implemented"}), 501
+
+
+@product_bp.route('/products/<int:product_id>', methods=['GET'])
+def product_detail(product_id):
+    """Returns a single catalog product. Query string: fields."""
+    try:
+        product = get_catalog_product(product_id, parse_product_fields(request.args.get('fields')))
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
+        return jsonify(product), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error fetching product {product_id}: {str(e)}") # Log for server
+        return jsonify({"error": "An internal error occurred while fetching the product."}), 500
+
+
+@product_bp.route('/search', methods=['GET'])
+def search():
+    """Full-text product search ranked by relevance. Query string: q, limit, fields."""
+    try:
+        user_id = current_user.id if current_user.is_authenticated else None
+        fields = parse_product_fields(request.args.get('fields'))
+        results = search_products(
+            request.args.get('q', ''),
+            limit=request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int),
+            user_id=user_id,
+            fields=fields
+        )
+        results["fuzzy"] = False
+        if not results["items"]:
+            # No exact word matches: fall back to typo-tolerant matching on product names
+            results["items"] = fuzzy_search(results["query"], limit=request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), fields=fields)["products"]
+            results["fuzzy"] = True
+        return jsonify(results), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error searching products: {str(e)}") # Log for server
+        return jsonify({"error": "An internal error occurred while searching."}), 500
+
+
+@product_bp.route('/search/fuzzy', methods=['GET'])
+def search_fuzzy():
+    """Typo-tolerant search over product and store names. Query string: q, limit, fields."""
+    try:
+        results = fuzzy_search(
+            request.args.get('q', ''),
+            limit=request.args.get('limit', DEFAULT_FUZZY_LIMIT, type=int),
+            fields=parse_product_fields(request.args.get('fields'))
+        )
+        return jsonify(results), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in fuzzy search: {str(e)}") # Log for server
+        return jsonify({"error": "An internal error occurred while searching."}), 500
+
+
+@product_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Search-as-you-type completions. Query string: q, limit."""
+    try:
+        results = get_suggestions(
+            request.args.get('q', ''),
+            limit=request.args.get('limit', DEFAULT_SUGGEST_LIMIT, type=int)
+        )
+        return jsonify(results), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error getting suggestions: {str(e)}") # Log for server
+        return jsonify({"error": "An internal error occurred while getting suggestions."}), 500
@@ -1,17 +1,25 @@
 from flask import request, jsonify
 from flask_login import login_required, current_user
-import base64
 from . import store_bp
 from application.extensions import db
-from DataBase.models import Store, User, ProductCondition # Import ProductCondition
-from services.product_service import get_products_by_store_id, add_product_to_store, update_product_in_store, delete_product_from_store # Import product service functions
+from DataBase.models import Store, User, Product, ProductCondition # Import ProductCondition
+from services.product_service import get_products_by_store_id, add_product_to_store, update_product_in_store, delete_product_from_store, bulk_update_products, parse_product_fields # Import product service functions
 from services.order_service import get_orders_by_store_id # Import order service function
+from services.product_import_service import import_products, iter_csv_rows, iter_ndjson_rows
+from services.pricing_service import apply_pricing_operation
+from services.fuzzy_search_service import index_store
+from services.principal_service import invalidate_principal
+from services.image_service import store_image, store_image_file, image_url
+from utils.image_utils import decode_image_data
 
 
 @store_bp.route('/', methods=['POST'])
 @login_required
 def create_new_store():
-    """Creates a new store for the currently authenticated user."""
+    """
+    Creates a new store for the currently authenticated user. Accepts a JSON body with
+    base64 images, or multipart/form-data with the images as file parts (store_logo, store_banner).
+    """
     try:
         # Authorization Checks
         if not current_user.can_create_store:
@@ -19,7 +27,14 @@ def create_new_store():
         if current_user.is_seller:
             return jsonify({"error": "You are already a seller."}), 400
 
-        data = request.get_json()
+        if request.mimetype == 'multipart/form-data':
+            # File parts are streamed to temporary files by the form parser, not read into memory
+            data = request.form
+            store_logo_file = request.files.get('store_logo')
+            store_banner_file = request.files.get('store_banner')
+        else:
+            data = request.get_json()
+            store_logo_file = store_banner_file = None
         if not data:
             return jsonify({"error": "No input data provided"}), 400
 
@@ -30,37 +45,33 @@ def create_new_store():
         store_logo_b64 = data.get('store_logo')
         description_val = data.get('description') # Optional
 
-        if not all([name_val, store_username_val, location_val, store_logo_b64]):
+        if not all([name_val, store_username_val, location_val, store_logo_b64 or store_logo_file]):
             return jsonify({"error": "Missing required fields (name, storeUsername, location, store_logo are required)"}), 400
 
         if Store.query.filter_by(storeUsername=store_username_val).first():
             return jsonify({"error": "Store username already exists."}), 400
 
-        # Image Handling
-        decoded_logo = None
-        if store_logo_b64:
-            try:
-                # Handle potential prefix like data:image/...;base64,
-                if ',' in store_logo_b64:
-                    store_logo_b64 = store_logo_b64.split(',')[-1]
-                decoded_logo = base64.b64decode(store_logo_b64)
-            except Exception as e:
-                return jsonify({"error": f"Invalid store_logo image data: {str(e)}"}), 400
-        else: # Should have been caught by 'not all' check, but for explicit clarity
-            return jsonify({"error": "store_logo is required"}), 400
-
+        # Image Handling (renditions are generated in the image worker pool)
+        try:
+            if store_logo_file:
+                logo_asset = store_image_file(store_logo_file.stream)
+            else:
+                logo_asset = store_image(decode_image_data(store_logo_b64))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid store_logo image data: {str(e)}"}), 400
 
-        decoded_banner = None
+        banner_asset = None
         store_banner_b64 = data.get('store_banner')
-        if store_banner_b64:
+        if store_banner_file or store_banner_b64:
             try:
-                if ',' in store_banner_b64:
-                    store_banner_b64 = store_banner_b64.split(',')[-1]
-                decoded_banner = base64.b64decode(store_banner_b64)
-            except Exception as e:
+                if store_banner_file:
+                    banner_asset = store_image_file(store_banner_file.stream)
+                else:
+                    banner_asset = store_image(decode_image_data(store_banner_b64))
+            except ValueError as e:
                 # Banner is optional, so we can log the error and continue without it
-                print(f"Error decoding store_banner: {str(e)}. Proceeding without banner.")
-                decoded_banner = None
+                print(f"Error processing store_banner: {str(e)}. Proceeding without banner.")
+                banner_asset = None
 
 
         # Database Operations
@@ -69,20 +80,21 @@ def create_new_store():
             storeUsername=store_username_val,
             location=location_val,
             description=description_val,
-            store_logo=decoded_logo,
-            store_banner=decoded_banner,
+            store_logo_key=logo_asset.source_key,
+            store_banner_key=banner_asset.source_key if banner_asset else None,
             owner_id=current_user.id,
             is_active=True,
             is_verified=False # Default to False
         )
 
-        current_user.is_seller = True
+        current_user.user.is_seller = True
         # No need to set can_create_store to False, user might want to create another store if allowed by business logic
-        # current_user.can_create_store = False 
+        # current_user.user.can_create_store = False 
 
         db.session.add(new_store)
-        db.session.add(current_user) # Or db.session.merge(current_user)
         db.session.commit()
+        invalidate_principal(current_user.id) # is_seller and store_id changed
+        index_store(new_store)
 
         # Response
         return jsonify({
@@ -92,7 +104,9 @@ def create_new_store():
                 "name": new_store.name,
                 "storeUsername": new_store.storeUsername,
                 "is_active": new_store.is_active,
-                "is_verified": new_store.is_verified
+                "is_verified": new_store.is_verified,
+                "store_logo": image_url(new_store.store_logo_key, logo_asset),
+                "store_banner": image_url(new_store.store_banner_key, banner_asset)
             }
         }), 201
 
@@ -102,6 +116,40 @@ def create_new_store():
         return jsonify({"error": "Internal server error during store creation."}), 500
 
 
+@store_bp.route('/mystore/<any(logo, banner):image_kind>', methods=['PUT'])
+@login_required
+def upload_my_store_image(image_kind):
+    """
+    Replaces the authenticated seller's store logo or banner with an image uploaded as
+    multipart/form-data (file field "image").
+    """
+    if not current_user.is_seller:
+        return jsonify({"error": "You are not a seller."}), 403
+
+    if current_user.store_id is None:
+        return jsonify({"error": "No store found for this seller."}), 404
+
+    image_file = request.files.get('image')
+    if image_file is None:
+        return jsonify({"error": "No image provided. Send it as multipart/form-data in the 'image' field."}), 400
+
+    store = db.session.get(Store, current_user.store_id)
+    try:
+        asset = store_image_file(image_file.stream)
+        setattr(store, f"store_{image_kind}_key", asset.source_key)
+        db.session.commit()
+        return jsonify({
+            "message": f"Store {image_kind} updated successfully",
+            f"store_{image_kind}": image_url(asset.source_key, asset)
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": f"Invalid image: {str(e)}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error uploading store {image_kind}: {str(e)}")
+        return jsonify({"error": f"An internal error occurred while uploading the store {image_kind}."}), 500
+
+
 @store_bp.route('/myproducts', methods=['GET', 'POST']) # Added POST method
 @login_required
 def manage_my_store_products(): # Renamed function for clarity
@@ -110,21 +158,25 @@ def manage_my_store_products(): # Renamed function for clarity
         if not current_user.is_seller:
             return jsonify({"error": "You are not a seller."}), 403
 
-        if not current_user.stores:
+        if current_user.store_id is None:
             return jsonify({"error": "No store found for this seller."}), 404
         
-        store_id = current_user.stores[0].id
-        products_data = get_products_by_store_id(store_id)
+        store_id = current_user.store_id
+        try:
+            fields = parse_product_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        products_data = get_products_by_store_id(store_id, fields)
         return jsonify(products_data), 200
 
     elif request.method == 'POST':
         if not current_user.is_seller:
             return jsonify({"error": "You are not authorized to add products."}), 403
         
-        if not current_user.stores:
+        if current_user.store_id is None:
             return jsonify({"error": "No store found for this seller to add products to."}), 404
 
-        store_id = current_user.stores[0].id
+        store_id = current_user.store_id
         request_data = request.get_json()
 
         if not request_data:
@@ -142,6 +194,111 @@ def manage_my_store_products(): # Renamed function for clarity
             return jsonify({"error": "An internal error occurred while adding the product."}), 500
 
 
+@store_bp.route('/myproducts/import', methods=['POST'])
+@login_required
+def import_my_store_products():
+    """
+    Bulk-imports products into the authenticated seller's store.
+
+    The request body is streamed: either CSV with a header row (Content-Type: text/csv)
+    or one JSON object per line (Content-Type: application/x-ndjson). Each row uses the
+    same fields and validation as adding a single product.
+    """
+    if not current_user.is_seller:
+        return jsonify({"error": "You are not authorized to add products."}), 403
+
+    if current_user.store_id is None:
+        return jsonify({"error": "No store found for this seller to add products to."}), 404
+
+    if request.mimetype == 'text/csv':
+        rows = iter_csv_rows(request.stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = iter_ndjson_rows(request.stream)
+    else:
+        return jsonify({"error": "Unsupported content type. Use text/csv or application/x-ndjson."}), 415
+
+    store_id = current_user.store_id
+    try:
+        report = import_products(store_id, rows)
+        return jsonify(report), 200
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"error": "The uploaded file must be UTF-8 encoded."}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing products: {str(e)}")
+        return jsonify({"error": "An internal error occurred while importing products."}), 500
+
+
+@store_bp.route('/myproducts/bulk', methods=['PATCH'])
+@login_required
+def bulk_update_my_store_products():
+    """Updates price, stock quantity, discount and stock status of many products in the authenticated seller's store."""
+    if not current_user.is_seller:
+        return jsonify({"error": "You are not authorized to update products."}), 403
+
+    if current_user.store_id is None:
+        return jsonify({"error": "No store found for this seller."}), 404
+
+    user_store_id = current_user.store_id
+    request_data = request.get_json(silent=True)
+
+    if not request_data or 'changes' not in request_data:
+        return jsonify({"error": "No changes provided"}), 400
+
+    try:
+        result = bulk_update_products(user_store_id, request_data['changes'])
+        if result["errors"]:
+            return jsonify({"error": "No products were updated because some changes are invalid.", **result}), 400
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error bulk updating products: {str(e)}")
+        return jsonify({"error": "An internal error occurred while updating the products."}), 500
+
+
+@store_bp.route('/myproducts/pricing', methods=['POST'])
+@login_required
+def apply_my_store_pricing():
+    """
+    Applies a pricing operation (discount or price change, with optional rounding and
+    schedule) to the authenticated seller's products matching the given filters.
+    With "dry_run": true only the affected counts are returned.
+    """
+    if not current_user.is_seller:
+        return jsonify({"error": "You are not authorized to update products."}), 403
+
+    if current_user.store_id is None:
+        return jsonify({"error": "No store found for this seller."}), 404
+
+    user_store_id = current_user.store_id
+    request_data = request.get_json(silent=True)
+
+    if not isinstance(request_data, dict) or 'operation' not in request_data:
+        return jsonify({"error": "No operation provided"}), 400
+
+    try:
+        result = apply_pricing_operation(
+            user_store_id,
+            request_data['operation'],
+            value=request_data.get('value'),
+            filters=request_data.get('filters'), # Validated by the service; a non-object is rejected
+            rounding=request_data.get('rounding', 'cents'),
+            starts_at=request_data.get('starts_at'),
+            ends_at=request_data.get('ends_at'),
+            dry_run=request_data.get('dry_run', False) # Must be a JSON boolean; "false" is rejected, not truthy
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error applying pricing operation: {str(e)}")
+        return jsonify({"error": "An internal error occurred while updating prices."}), 500
+
+
 @store_bp.route('/myproducts/<int:product_id>', methods=['PUT'])
 @login_required
 def update_my_store_product(product_id):
@@ -149,10 +306,10 @@ def update_my_store_product(product_id):
     if not current_user.is_seller:
         return jsonify({"error": "You are not authorized to update products."}), 403
     
-    if not current_user.stores:
+    if current_user.store_id is None:
         return jsonify({"error": "No store found for this seller."}), 404
 
-    user_store_id = current_user.stores[0].id
+    user_store_id = current_user.store_id
     request_data = request.get_json()
 
     if not request_data:
@@ -174,6 +331,48 @@ def update_my_store_product(product_id):
         return jsonify({"error": "An internal error occurred while updating the product."}), 500
 
 
+@store_bp.route('/myproducts/<int:product_id>/image', methods=['PUT'])
+@login_required
+def upload_my_store_product_image(product_id):
+    """
+    Sets the image of a product in the authenticated seller's store from an image
+    uploaded as multipart/form-data (file field "image"). The product's image_url
+    becomes the URL of the full-size rendition.
+    """
+    if not current_user.is_seller:
+        return jsonify({"error": "You are not authorized to update products."}), 403
+
+    if current_user.store_id is None:
+        return jsonify({"error": "No store found for this seller."}), 404
+
+    user_store_id = current_user.store_id
+    image_file = request.files.get('image')
+    if image_file is None:
+        return jsonify({"error": "No image provided. Send it as multipart/form-data in the 'image' field."}), 400
+
+    # Checked before the image is processed, so uploads for other stores' products cost nothing
+    product = Product.query.get(product_id)
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+    if product.store_id != user_store_id:
+        return jsonify({"error": "You are not authorized to update this product"}), 403
+
+    try:
+        asset = store_image_file(image_file.stream, product_store_id=user_store_id)
+        updated_product_dict = update_product_in_store(
+            product_id, user_store_id, {'image_url': image_url(asset.source_key, asset)}
+        )
+        return jsonify(updated_product_dict), 200
+    except ValueError as e:
+        return jsonify({"error": f"Invalid image: {str(e)}"}), 400
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error uploading image for product {product_id}: {str(e)}")
+        return jsonify({"error": "An internal error occurred while uploading the product image."}), 500
+
+
 @store_bp.route('/myproducts/<int:product_id>', methods=['DELETE'])
 @login_required
 def delete_my_store_product(product_id):
@@ -181,10 +380,10 @@ def delete_my_store_product(product_id):
     if not current_user.is_seller:
         return jsonify({"error": "You are not authorized to delete products."}), 403
     
-    if not current_user.stores:
+    if current_user.store_id is None:
         return jsonify({"error": "No store found for this seller."}), 404
 
-    user_store_id = current_user.stores[0].id
+    user_store_id = current_user.store_id
 
     try:
         delete_product_from_store(product_id, user_store_id)
@@ -206,10 +405,10 @@ def list_my_store_orders():
     if not current_user.is_seller:
         return jsonify({"error": "You are not a seller."}), 403
 
-    if not current_user.stores:
+    if current_user.store_id is None:
         return jsonify({"error": "No store found for this seller."}), 404
 
-    store_id = current_user.stores[0].id
+    store_id = current_user.store_id
     orders_data = get_orders_by_store_id(store_id)
     
     return jsonify(orders_data), 200
@@ -25,7 +25,6 @@ with app.app_context():
         phone="+252613781536",
         address="Kaxda, mogadishu, somalia",
 
-        profile_image="https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcTTAUPUG0r--EDZzf-f9Afj_Jp7N96yIGsWPgCYIkrAS1rCJHIcdm_RCq_me44bJc0dvvY&usqp=CAU",
 
     )
     db.session.add(newUser)
@@ -1,99 +1,242 @@
 # App/services/cart_service.py
-"""Handles business logic related to shopping carts."""
+"""Handles business logic related to shopping carts.
+
+A user has at most one cart line per product (unique (user_id, product_id)), so adding
+to the cart is a single upsert whose stock check is part of the statement, and
+concurrent adds of the same product add up instead of creating duplicate lines.
+
+Every change to a cart increments the user's cart_version in the same transaction.
+Clients pass the version they hold to `get_cart` (since_version) to skip downloading an
+unchanged cart, and mutations called with `delta=True` return only the affected line,
+the new total and the version (`_cart_delta`) instead of the whole cart. Changes to a
+product (price, stock, availability, deletion) move the version of every cart holding it
+(`bump_cart_versions_for_products`), so an unchanged version never hides a stale price.
+"""
+from sqlalchemy import Integer, case, func, literal, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from application.extensions import db
-from DataBase.models import Cart, Product, User # User might not be directly used but good for context
+from DataBase.models import Cart, Product, User
+
+# Dialects supporting INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+_UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+# Product ids per statement when bumping the carts holding changed products (SQLite's IN limit)
+PRODUCT_CHUNK_SIZE = 500
+
+
+def _upsert_cart_item(user_id, product_id, quantity, increment=True):
+    """
+    Adds `quantity` of a product to the user's cart (or sets the line's quantity to it, if
+    not `increment`) with one INSERT ... ON CONFLICT DO UPDATE statement. The row is only
+    inserted or updated if the product is active and its stock covers the resulting quantity.
 
-def _serialize_cart_item(cart_item):
+    Returns:
+        int: The ID of the cart line, or None if the product is unavailable or out of stock.
+    """
+    insert = _UPSERT_INSERTS[db.engine.dialect.name]
+    statement = insert(Cart).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(literal(user_id), Product.id, literal(quantity)).where(
+            Product.id == product_id,
+            Product.is_active.is_(True),
+            Product.stock_quantity >= quantity
+        )
+    )
+    stock = select(Product.stock_quantity).where(Product.id == product_id).scalar_subquery()
+    new_quantity = Cart.quantity + statement.excluded.quantity if increment else statement.excluded.quantity
+    statement = statement.on_conflict_do_update(
+        index_elements=[Cart.user_id, Cart.product_id],
+        set_={"quantity": new_quantity, "updated_at": func.now()},
+        where=stock >= new_quantity
+    ).returning(Cart.id)
+    return db.session.execute(statement).scalar()
+
+
+def _upsert_cart_item_locked(user_id, product_id, quantity, increment=True):
+    """`_upsert_cart_item` for databases without ON CONFLICT: locks the product row, then inserts or updates."""
+    product = db.session.execute(
+        select(Product).where(Product.id == product_id, Product.is_active.is_(True)).with_for_update()
+    ).scalar()
+    if product is None:
+        return None
+    cart_item = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
+    new_quantity = (cart_item.quantity if cart_item and increment else 0) + quantity
+    if product.stock_quantity < new_quantity:
+        return None
+    if cart_item:
+        cart_item.quantity = new_quantity
+    else:
+        cart_item = Cart(user_id=user_id, product_id=product_id, quantity=quantity)
+        db.session.add(cart_item)
+    db.session.flush()
+    return cart_item.id
+
+
+def _write_cart_item(user_id, product_id, quantity, increment=True):
+    """Guarded insert or update of a cart line (see `_upsert_cart_item`); returns its ID, or None if nothing was written."""
+    if db.engine.dialect.name in _UPSERT_INSERTS:
+        return _upsert_cart_item(user_id, product_id, quantity, increment)
+    return _upsert_cart_item_locked(user_id, product_id, quantity, increment)
+
+
+def _bump_cart_version(user_id):
+    """Increments the user's cart version in the current transaction; returns the new version."""
+    statement = update(User).where(User.id == user_id).values(cart_version=User.cart_version + 1)
+    if db.engine.dialect.name in _UPSERT_INSERTS:
+        return db.session.execute(statement.returning(User.cart_version)).scalar()
+    db.session.execute(statement)
+    return _cart_version(user_id)
+
+
+def bump_cart_versions_for_products(product_ids):
+    """
+    Increments, in the current transaction, the cart version of every user whose cart holds
+    one of the products. Call it before committing a change to the products' price, stock,
+    availability or existence, so clients holding a cart version refetch the cart.
     """
-    Serializes a Cart object into a dictionary, including product details.
-    Helper function.
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), PRODUCT_CHUNK_SIZE):
+        holders = select(Cart.user_id).where(Cart.product_id.in_(product_ids[start:start + PRODUCT_CHUNK_SIZE]))
+        db.session.execute(
+            update(User).where(User.id.in_(holders)).values(cart_version=User.cart_version + 1),
+            execution_options={"synchronize_session": False}
+        )
+
+
+def _cart_version(user_id):
+    return db.session.execute(select(User.cart_version).where(User.id == user_id)).scalar()
+
+
+def _cart_delta(user_id, cart_version, product_id=None, removed_item_id=None):
     """
-    if not cart_item or not cart_item.product:
-        return None # Or raise an error, or return a default structure
+    Result of a cart mutation in delta mode.
 
+    Returns:
+        dict: {"item": the line of `product_id` or None, "removed_item_id": int or None,
+               "total_cart_price": float, "cart_version": int}
+    """
+    lines = _cart_lines(user_id, [product_id]) if product_id is not None else []
     return {
-        "id": cart_item.id,
-        "user_id": cart_item.user_id,
-        "product_id": cart_item.product_id,
-        "quantity": cart_item.quantity,
-        "product": {
-            "id": cart_item.product.id,
-            "name": cart_item.product.name,
-            "price": cart_item.product.price,
-            "image_url": cart_item.product.image_url, # Assuming image_url is a direct attribute
-            "current_stock": cart_item.product.stock_quantity,
-            "store_id": cart_item.product.store_id # Added store_id
-        },
-        "item_subtotal": cart_item.quantity * cart_item.product.price
+        "item": _serialize_cart_line(lines[0]) if lines else None,
+        "removed_item_id": removed_item_id,
+        "total_cart_price": lines[0].total_cart_price if lines else _cart_total(user_id),
+        "cart_version": cart_version
     }
 
-def add_to_cart(user_id, product_id, quantity):
+
+def add_to_cart(user_id, product_id, quantity, delta=False):
     """
     Adds a product to the user's cart or updates its quantity if it already exists.
+
+    Returns:
+        dict: The serialized cart line, or the `_cart_delta` result if `delta`.
+
+    Raises:
+        ValueError: If the quantity is invalid, or the product is unavailable or out of stock.
     """
     if not isinstance(quantity, int) or quantity <= 0:
         raise ValueError("Quantity must be a positive integer.")
 
-    product = Product.query.get(product_id)
-    if not product or not product.is_active: # Assuming is_active implies availability
-        raise ValueError("Product not found or not available.")
-
-    # Check initial quantity against stock before fetching cart item
-    if product.stock_quantity < quantity and not Cart.query.filter_by(user_id=user_id, product_id=product_id).first():
-         # Only raise if it's a new item and quantity is too high
+    if _write_cart_item(user_id, product_id, quantity) is None:
+        db.session.rollback()
+        # Nothing was written: find out why (only on this path)
+        product = db.session.get(Product, product_id)
+        if not product or not product.is_active: # Assuming is_active implies availability
+            raise ValueError("Product not found or not available.")
+        if Cart.query.filter_by(user_id=user_id, product_id=product_id).first():
+            raise ValueError("Insufficient stock for updated quantity.")
         raise ValueError("Insufficient stock.")
 
-
-    cart_item = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
-
-    if cart_item:
-        new_quantity = cart_item.quantity + quantity
-        if product.stock_quantity < new_quantity:
-            raise ValueError("Insufficient stock for updated quantity.")
-        cart_item.quantity = new_quantity
-    else:
-        # Re-check stock for the specific quantity if it's a new item
-        # This check is slightly redundant if the initial check above is comprehensive,
-        # but it's safer.
-        if product.stock_quantity < quantity:
-            raise ValueError("Insufficient stock.")
-        cart_item = Cart(user_id=user_id, product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
-    
+    cart_version = _bump_cart_version(user_id)
     db.session.commit()
-    # Re-fetch to ensure product relationship is loaded for serialization, or ensure it's loaded before.
-    # For simplicity, we assume cart_item.product is accessible after commit or was loaded.
-    # If Product was already queried, cart_item.product might already be populated if relationship is eager/available.
-    # If not, a db.session.refresh(cart_item) or re-query might be needed, or ensure Product is loaded via relationship.
-    # Let's assume the relationship is available for serialization.
-    return _serialize_cart_item(cart_item)
+    if delta:
+        return _cart_delta(user_id, cart_version, product_id)
+    return _serialize_cart_line(_cart_lines(user_id, [product_id])[0])
 
 
-def get_cart(user_id):
+def _cart_lines(user_id, product_ids=None):
     """
-    Retrieves the user's shopping cart with all items and total price.
+    The user's cart lines with the product columns the cart shows, each line's subtotal
+    and the cart total (a window sum over all the lines), in one joined query.
+    Only the lines of `product_ids` are returned if given.
     """
-    cart_items_db = Cart.query.filter_by(user_id=user_id).all()
-    
-    if not cart_items_db:
-        return {"items": [], "total_cart_price": 0.0}
+    subtotal = Cart.quantity * Product.price
+    query = (
+        select(
+            Cart.id, Cart.user_id, Cart.product_id, Cart.quantity,
+            Product.name.label("product_name"),
+            Product.price.label("product_price"),
+            Product.image_url.label("product_image_url"),
+            Product.stock_quantity.label("product_stock"),
+            Product.store_id.label("product_store_id"),
+            subtotal.label("item_subtotal"),
+            func.sum(subtotal).over().label("total_cart_price"),
+        )
+        .join(Product, Product.id == Cart.product_id)
+        .where(Cart.user_id == user_id)
+    )
+    if product_ids is None:
+        return db.session.execute(query.order_by(Cart.id)).all()
+    # Filtered outside the window, so the total still covers the whole cart
+    lines = query.subquery()
+    return db.session.execute(
+        select(lines).where(lines.c.product_id.in_(list(product_ids))).order_by(lines.c.id)
+    ).all()
 
-    serialized_items = []
-    total_cart_price = 0.0
 
-    for item_db in cart_items_db:
-        serialized_item = _serialize_cart_item(item_db)
-        if serialized_item: # Check if serialization was successful
-            serialized_items.append(serialized_item)
-            total_cart_price += serialized_item["item_subtotal"]
-            
-    return {"items": serialized_items, "total_cart_price": total_cart_price}
+def _cart_total(user_id):
+    return db.session.execute(
+        select(func.coalesce(func.sum(Cart.quantity * Product.price), 0.0))
+        .join(Product, Product.id == Cart.product_id)
+        .where(Cart.user_id == user_id)
+    ).scalar()
 
 
-def update_cart_item_quantity(user_id, cart_item_id, new_quantity):
+def _serialize_cart_line(line):
+    """Serializes a row of `_cart_lines`, including product details."""
+    return {
+        "id": line.id,
+        "user_id": line.user_id,
+        "product_id": line.product_id,
+        "quantity": line.quantity,
+        "product": {
+            "id": line.product_id,
+            "name": line.product_name,
+            "price": line.product_price,
+            "image_url": line.product_image_url,
+            "current_stock": line.product_stock,
+            "store_id": line.product_store_id,
+        },
+        "item_subtotal": line.item_subtotal,
+    }
+
+
+def get_cart(user_id, since_version=None):
+    """
+    Retrieves the user's shopping cart with all items, total price and cart version.
+
+    Args:
+        user_id (int): The ID of the user.
+        since_version (int, optional): The cart version the client holds; if the cart has
+                                       not changed since, only {"unchanged": True, "cart_version"}
+                                       is returned, after reading the version alone.
+    """
+    cart_version = _cart_version(user_id)
+    if since_version is not None and since_version == cart_version:
+        return {"unchanged": True, "cart_version": cart_version}
+    lines = _cart_lines(user_id)
+    return {
+        "items": [_serialize_cart_line(line) for line in lines],
+        "total_cart_price": lines[0].total_cart_price if lines else 0.0,
+        "cart_version": cart_version
+    }
+
+
+def update_cart_item_quantity(user_id, cart_item_id, new_quantity, delta=False):
     """
     Updates the quantity of a specific item in the user's cart.
     If quantity is 0, the item is removed.
+    Returns the updated cart, or the `_cart_delta` result if `delta`.
     """
     cart_item = Cart.query.filter_by(id=cart_item_id, user_id=user_id).first()
     if not cart_item:
@@ -104,7 +247,10 @@ def update_cart_item_quantity(user_id, cart_item_id, new_quantity):
 
     if new_quantity == 0:
         db.session.delete(cart_item)
+        cart_version = _bump_cart_version(user_id)
         db.session.commit()
+        if delta:
+            return _cart_delta(user_id, cart_version, removed_item_id=cart_item_id)
         return get_cart(user_id) # Return updated cart
 
     product = Product.query.get(cart_item.product_id)
@@ -112,6 +258,7 @@ def update_cart_item_quantity(user_id, cart_item_id, new_quantity):
     if not product:
         # This indicates a data integrity issue if a cart item exists for a non-existent product
         db.session.delete(cart_item) # Clean up orphan cart item
+        _bump_cart_version(user_id)
         db.session.commit()
         raise ValueError("Associated product not found. The cart item has been removed.")
 
@@ -119,20 +266,27 @@ def update_cart_item_quantity(user_id, cart_item_id, new_quantity):
         raise ValueError("Insufficient stock.")
     
     cart_item.quantity = new_quantity
+    cart_version = _bump_cart_version(user_id)
     db.session.commit()
+    if delta:
+        return _cart_delta(user_id, cart_version, cart_item.product_id)
     return get_cart(user_id) # Return updated cart
 
 
-def remove_from_cart(user_id, cart_item_id):
+def remove_from_cart(user_id, cart_item_id, delta=False):
     """
     Removes a specific item from the user's cart.
+    Returns the updated cart, or the `_cart_delta` result if `delta`.
     """
     cart_item = Cart.query.filter_by(id=cart_item_id, user_id=user_id).first()
     if not cart_item:
         raise ValueError("Cart item not found.") # As per instruction to raise error
         
     db.session.delete(cart_item)
+    cart_version = _bump_cart_version(user_id)
     db.session.commit()
+    if delta:
+        return _cart_delta(user_id, cart_version, removed_item_id=cart_item_id)
     return get_cart(user_id) # Return updated cart
 
 
@@ -141,6 +295,167 @@ def clear_cart(user_id):
     Removes all items from the user's cart.
     """
     Cart.query.filter_by(user_id=user_id).delete()
+    cart_version = _bump_cart_version(user_id)
     db.session.commit()
     # Return the empty cart state, consistent with other functions
-    return get_cart(user_id)
+    return {"items": [], "total_cart_price": 0.0, "cart_version": cart_version}
+
+
+BATCH_OPERATIONS = ('add', 'set', 'remove')
+MAX_BATCH_OPERATIONS = 100
+
+
+def parse_cart_operations(operations):
+    """
+    Validates the shape of batch operations (see `apply_cart_operations`).
+
+    Returns:
+        list: (op, product_id, quantity) tuples, quantity being 0 for "remove".
+
+    Raises:
+        ValueError: If the list or an operation is malformed.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list.")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValueError(f"At most {MAX_BATCH_OPERATIONS} operations are allowed per batch.")
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+            raise ValueError(f"Operation {index}: op must be one of {', '.join(BATCH_OPERATIONS)}.")
+        product_id, quantity = operation.get('product_id'), operation.get('quantity')
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            raise ValueError(f"Operation {index}: product_id must be an integer.")
+        if operation['op'] == 'remove':
+            quantity = 0
+        elif not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < (1 if operation['op'] == 'add' else 0):
+            raise ValueError(f"Operation {index}: quantity must be an integer (>= 1 for add, >= 0 for set).")
+        parsed.append((operation['op'], product_id, quantity))
+    return parsed
+
+
+def apply_cart_operations(user_id, operations):
+    """
+    Applies several cart changes in one transaction: all of them, or none if any is invalid.
+
+    Every product is validated (and its current cart quantity read) with one query, the
+    operations on each product are folded into a single write, and only the changed lines
+    are returned.
+
+    Args:
+        user_id (int): The ID of the user.
+        operations (list): [{"op": "add" | "set" | "remove", "product_id": int, "quantity": int}],
+                           applied in order. "set" to 0 removes the line; "remove" takes no quantity.
+
+    Returns:
+        dict: {"items": [changed lines still in the cart], "removed_product_ids": [int],
+               "total_cart_price": float, "cart_version": int}
+
+    Raises:
+        ValueError: If an operation is malformed, or a product is unavailable or out of stock.
+    """
+    parsed = parse_cart_operations(operations)
+    product_ids = list(dict.fromkeys(product_id for _, product_id, _ in parsed))
+    rows = db.session.execute(
+        select(Product.id, Product.is_active, Product.stock_quantity, Cart.quantity)
+        .outerjoin(Cart, (Cart.product_id == Product.id) & (Cart.user_id == user_id))
+        .where(Product.id.in_(product_ids))
+    ).all()
+    products = {row[0]: row for row in rows}
+
+    # Fold the operations on each product into (resulting quantity, whether it is relative to the stored one)
+    changes = {}
+    for op, product_id, quantity in parsed:
+        total, relative = changes.get(product_id, (0, True))
+        if op == 'add':
+            changes[product_id] = (total + quantity, relative)
+        else:
+            changes[product_id] = (quantity, False)
+
+    for product_id, (quantity, relative) in changes.items():
+        product = products.get(product_id)
+        final_quantity = quantity + ((product[3] or 0) if product and relative else 0)
+        if final_quantity == 0:
+            continue
+        if product is None or not product[1]:
+            raise ValueError(f"Product {product_id} not found or not available.")
+        if product[2] < final_quantity:
+            raise ValueError(f"Insufficient stock for product {product_id}.")
+
+    removed = []
+    try:
+        for product_id, (quantity, relative) in changes.items():
+            if quantity == 0 and not relative:
+                if product_id in products and products[product_id][3] is not None:
+                    Cart.query.filter_by(user_id=user_id, product_id=product_id).delete()
+                    removed.append(product_id)
+            elif quantity and _write_cart_item(user_id, product_id, quantity, increment=relative) is None:
+                # Stock changed since it was validated
+                raise ValueError(f"Insufficient stock for product {product_id}.")
+        cart_version = _bump_cart_version(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    lines = _cart_lines(user_id, [product_id for product_id in changes if product_id not in removed])
+    return {
+        "items": [_serialize_cart_line(line) for line in lines],
+        "removed_product_ids": removed,
+        "total_cart_price": lines[0].total_cart_price if lines else _cart_total(user_id),
+        "cart_version": cart_version
+    }
+
+
+def merge_cart_items(user_id, quantities):
+    """
+    Adds items (e.g. a guest cart, at login) to the user's cart with one bulk upsert.
+    Each line ends with its stored quantity plus the added one, capped at the product's
+    stock as read by the statement itself; unavailable products are skipped.
+
+    Args:
+        user_id (int): The ID of the user.
+        quantities (dict): {product_id: quantity to add}
+
+    Returns:
+        int: The number of cart lines added or increased.
+    """
+    if not quantities:
+        return 0
+
+    if db.engine.dialect.name in _UPSERT_INSERTS:
+        added = case(quantities, value=Product.id)
+        statement = _UPSERT_INSERTS[db.engine.dialect.name](Cart).from_select(
+            ["user_id", "product_id", "quantity"],
+            select(
+                literal(user_id), Product.id,
+                case((added > Product.stock_quantity, Product.stock_quantity), else_=added)
+            ).where(Product.id.in_(list(quantities)), Product.is_active.is_(True), Product.stock_quantity > 0)
+        )
+        # Stock of the conflicting line's product, read by the statement itself; SQLAlchemy does
+        # not correlate subqueries in DO UPDATE with the target table, so it is named explicitly
+        conflicting_product_id = literal_column(f"{Cart.__tablename__}.product_id", Integer)
+        stock = select(Product.stock_quantity).where(Product.id == conflicting_product_id).scalar_subquery()
+        merged = Cart.quantity + statement.excluded.quantity
+        written = db.session.execute(statement.on_conflict_do_update(
+            index_elements=[Cart.user_id, Cart.product_id],
+            set_={"quantity": case((merged > stock, stock), else_=merged), "updated_at": func.now()},
+            where=stock > Cart.quantity
+        ).returning(Cart.id)).scalars().all()
+    else:
+        written = []
+        for product_id, quantity in quantities.items():
+            product = db.session.execute(
+                select(Product).where(Product.id == product_id, Product.is_active.is_(True)).with_for_update()
+            ).scalar()
+            stored = db.session.execute(
+                select(Cart.quantity).where(Cart.user_id == user_id, Cart.product_id == product_id)
+            ).scalar() or 0
+            if product is not None and product.stock_quantity > stored:
+                merged = min(stored + quantity, product.stock_quantity)
+                written.append(_upsert_cart_item_locked(user_id, product_id, merged, increment=False))
+    if not written:
+        return 0
+    _bump_cart_version(user_id)
+    db.session.commit()
+    return len(written)
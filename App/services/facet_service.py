@@ -0,0 +1,352 @@
+# App/services/facet_service.py
+"""Handles facet counts for the product catalog filters.
+
+Every facet value (a category, a condition, a price bucket, a store, in/out of stock)
+owns a bitmap with one bit per product id, stored as a Python int. Counting the
+products of a filtered result set that have a given value is then an AND followed by
+a popcount, instead of a GROUP BY over the product table. The index is built from
+the database, maintained incrementally by the product service in the process making a
+change, and rebuilt in the background every FACET_REBUILD_SECONDS so every worker
+catches up with the others' changes.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from flask import current_app
+from application.extensions import db
+from DataBase.models import Product
+
+FACETS = ('category_id', 'condition', 'price_bucket', 'store_id', 'in_stock')
+# Facets with many values, indexed with a set of product ids per value instead of a bitmap
+SPARSE_FACETS = ('store_id',)
+# Lower bounds of the price buckets; the last bucket is open-ended
+PRICE_BUCKET_BOUNDS = (0, 10, 25, 50, 100, 250, 500, 1000)
+# Rough cost of one AND + popcount per facet value, in "tallied ids" per KiB of bitmap.
+# A facet is tallied id by id instead when the matching set is cheaper to walk than that.
+BITMAP_COST_PER_KIB = 0.5
+# At most this many values are returned per facet, most frequent first
+MAX_FACET_VALUES = 50
+
+_index = None
+_init_lock = threading.Lock()
+_rebuilding = False
+_pending = None  # Changes made during a background rebuild, replayed onto the new index
+
+
+def price_bucket(price):
+    """Returns the label of the price bucket containing `price`, e.g. '25-50' or '1000+'."""
+    position = max(bisect_right(PRICE_BUCKET_BOUNDS, price or 0) - 1, 0)
+    lower = PRICE_BUCKET_BOUNDS[position]
+    if position + 1 == len(PRICE_BUCKET_BOUNDS):
+        return f"{lower}+"
+    return f"{lower}-{PRICE_BUCKET_BOUNDS[position + 1]}"
+
+
+def _facet_values(product_id, category_id, condition, price, store_id, in_stock):
+    return {
+        'category_id': category_id,
+        'condition': condition,
+        'price_bucket': price_bucket(price),
+        'store_id': store_id,
+        'in_stock': bool(in_stock),
+    }
+
+
+def _ids_in(bitmap):
+    """Yields the product ids whose bit is set in `bitmap`."""
+    # Reversed binary string: the character at index i is bit i; str.find skips zero runs in C
+    bits = bin(bitmap)[:1:-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+def _bitmap_of(ids, size):
+    """Builds a bitmap int of `size` bytes from an iterable of ids."""
+    bits = bytearray(size)
+    for product_id in ids:
+        bits[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class FacetIndex:
+    """
+    Bitmap index over the facet values of every catalog-visible product.
+
+    `_bitmaps[facet][value]` is an int whose bit `product_id` is set when that product
+    has the value; `_all` has the bit of every indexed product. High-cardinality facets
+    (SPARSE_FACETS) keep a set of product ids per value instead, since a dense bitmap per
+    value would cost max_id / 8 bytes each; they are always counted id by id.
+    `_counts` keeps the unfiltered count of every value so the common no-filter case
+    needs no bitmap work. All public methods are thread-safe.
+    """
+
+    def __init__(self):
+        self._bitmaps = {facet: defaultdict(int) for facet in FACETS if facet not in SPARSE_FACETS}
+        self._sets = {facet: defaultdict(set) for facet in SPARSE_FACETS}
+        self._counts = {facet: defaultdict(int) for facet in FACETS}
+        self._all = 0
+        self._values = {}
+        self._prices = {}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._values)
+
+    def load(self, rows):
+        """
+        Bulk-loads (id, category_id, condition, price, store_id, in_stock) rows.
+        Bits are set in bytearrays and converted to ints once per value, since
+        OR-ing bits one at a time into large ints copies the whole int each time.
+        """
+        ids_by_value = {facet: defaultdict(list) for facet in FACETS}
+        for row in rows:
+            product_id = row[0]
+            values = _facet_values(*row)
+            self._values[product_id] = values
+            self._prices[product_id] = row[3] or 0
+            for facet, value in values.items():
+                ids_by_value[facet][value].append(product_id)
+        if not self._values:
+            return
+        size = max(self._values) // 8 + 1
+        with self._lock:
+            for facet, by_value in ids_by_value.items():
+                for value, ids in by_value.items():
+                    if facet in SPARSE_FACETS:
+                        self._sets[facet][value].update(ids)
+                    else:
+                        self._bitmaps[facet][value] |= _bitmap_of(ids, size)
+                    self._counts[facet][value] += len(ids)
+            self._all |= _bitmap_of(self._values, size)
+
+    def add(self, product_id, category_id, condition, price, store_id, in_stock):
+        """Indexes (or re-indexes) a single product."""
+        values = _facet_values(product_id, category_id, condition, price, store_id, in_stock)
+        bit = 1 << product_id
+        with self._lock:
+            self._remove_locked(product_id)
+            for facet, value in values.items():
+                if facet in SPARSE_FACETS:
+                    self._sets[facet][value].add(product_id)
+                else:
+                    self._bitmaps[facet][value] |= bit
+                self._counts[facet][value] += 1
+            self._all |= bit
+            self._values[product_id] = values
+            self._prices[product_id] = price or 0
+
+    def remove(self, product_id):
+        """Removes a product from every bitmap; a no-op if it is not indexed."""
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def _remove_locked(self, product_id):
+        values = self._values.pop(product_id, None)
+        if values is None:
+            return
+        del self._prices[product_id]
+        bit = 1 << product_id
+        for facet, value in values.items():
+            if facet in SPARSE_FACETS:
+                ids = self._sets[facet][value]
+                ids.discard(product_id)
+                remaining = bool(ids)
+                if not remaining:
+                    del self._sets[facet][value]
+            else:
+                bitmap = self._bitmaps[facet][value] & ~bit
+                remaining = bool(bitmap)
+                if remaining:
+                    self._bitmaps[facet][value] = bitmap
+                else:
+                    del self._bitmaps[facet][value]
+            if remaining:
+                self._counts[facet][value] -= 1
+            else:
+                del self._counts[facet][value]
+        self._all &= ~bit
+
+    def _price_mask(self, min_price, max_price):
+        """Bitmap of products priced within [min_price, max_price]."""
+        mask = 0
+        straddling = []
+        for label, bitmap in self._bitmaps['price_bucket'].items():
+            lower, _, upper = label.rstrip('+').partition('-')
+            lower = float(lower)
+            upper = float(upper) if upper else float('inf')
+            if (min_price is None or lower >= min_price) and (max_price is None or upper <= max_price):
+                mask |= bitmap # Bucket entirely inside the range
+            elif (min_price is None or upper > min_price) and (max_price is None or lower <= max_price):
+                # Bucket straddles a range boundary: check the prices of its products one by one
+                straddling.extend(
+                    product_id for product_id in _ids_in(bitmap)
+                    if (min_price is None or self._prices[product_id] >= min_price)
+                    and (max_price is None or self._prices[product_id] <= max_price)
+                )
+        if straddling:
+            mask |= _bitmap_of(straddling, (self._all.bit_length() + 7) // 8)
+        return mask
+
+    def _filter_masks(self, filters):
+        """Returns {facet: bitmap} for every active filter."""
+        masks = {}
+        for facet in ('category_id', 'condition', 'store_id', 'in_stock'):
+            if filters.get(facet) is None:
+                continue
+            if facet in SPARSE_FACETS:
+                ids = self._sets[facet].get(filters[facet], ())
+                masks[facet] = _bitmap_of(ids, (self._all.bit_length() + 7) // 8) if ids else 0
+            else:
+                masks[facet] = self._bitmaps[facet].get(filters[facet], 0)
+        if filters.get('min_price') is not None or filters.get('max_price') is not None:
+            masks['price_bucket'] = self._price_mask(filters.get('min_price'), filters.get('max_price'))
+        return masks
+
+    def counts(self, filters):
+        """
+        Returns {"total": int, facet: {value: count}} for the products matching `filters`.
+
+        Counts are disjunctive: each facet is counted with every filter applied except
+        its own, so the client can show how many results picking another value would give.
+        """
+        with self._lock:
+            masks = self._filter_masks(filters)
+            matching = self._all
+            for mask in masks.values():
+                matching &= mask
+            result = {"total": matching.bit_count()}
+            bitmap_kib = self._all.bit_length() / 8192
+            for facet in FACETS:
+                others = [mask for other, mask in masks.items() if other != facet]
+                if not others:
+                    result[facet] = dict(self._counts[facet])
+                    continue
+                base = self._all
+                for mask in others:
+                    base &= mask
+                if facet in SPARSE_FACETS or base.bit_count() < len(self._bitmaps[facet]) * bitmap_kib * BITMAP_COST_PER_KIB:
+                    tally = defaultdict(int)
+                    for product_id in _ids_in(base):
+                        tally[self._values[product_id][facet]] += 1
+                else:
+                    tally = {value: (base & bitmap).bit_count() for value, bitmap in self._bitmaps[facet].items()}
+                result[facet] = {value: count for value, count in tally.items() if count}
+        return result
+
+
+def _build_index():
+    """Builds a FacetIndex of the catalog-visible products from the database."""
+    index = FacetIndex()
+    index.load(
+        db.session.query(Product.id, Product.category_id, Product.condition, Product.price,
+                         Product.store_id, Product.in_stock)
+        .filter(Product.is_active.is_(True), Product.is_banned.is_(False))
+        .execution_options(yield_per=5000)
+    )
+    return index
+
+
+def _apply(index, product_id, values):
+    """Indexes a product with its (category_id, condition, price, store_id, in_stock), or removes it if `values` is None."""
+    if values is None:
+        index.remove(product_id)
+    else:
+        index.add(product_id, *values)
+
+
+def _rebuild_in_background(app):
+    """
+    Rebuilds the facet index in a worker thread and swaps it in when done. Changes made
+    in this process during the rebuild are recorded and replayed onto the new index, since
+    its query may have read the rows before them.
+    """
+    global _rebuilding, _pending
+
+    def run():
+        global _index, _rebuilding, _pending
+        try:
+            with app.app_context():
+                index = _build_index()
+            with _init_lock:
+                for product_id, values in _pending:
+                    _apply(index, product_id, values)
+                _index = index
+        except Exception as e:
+            print(f"Error rebuilding facet index: {str(e)}") # Log for server
+        finally:
+            with _init_lock:
+                _rebuilding = False
+                _pending = None
+
+    with _init_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+        _pending = []
+    threading.Thread(target=run, name='facet-index-rebuild', daemon=True).start()
+
+
+def _get_index():
+    """
+    Returns the facet index, building it from the database on first use. Once it is older
+    than FACET_REBUILD_SECONDS a rebuild starts in the background, so changes made by other
+    workers (and stock changes from orders) are picked up; requests keep using the current
+    index meanwhile.
+    """
+    global _index
+    if _index is None:
+        with _init_lock:
+            if _index is None:
+                _index = _build_index()
+    elif time.monotonic() - _index.built_at > current_app.config['FACET_REBUILD_SECONDS']:
+        _rebuild_in_background(current_app._get_current_object())
+    return _index
+
+
+def _update(changes):
+    """Applies (product_id, values or None) changes to the index, recording them for a running rebuild."""
+    _get_index()
+    with _init_lock:
+        index = _index
+        if _pending is not None:
+            _pending.extend(changes)
+    for product_id, values in changes:
+        _apply(index, product_id, values)
+
+
+def index_products(products):
+    """Adds or refreshes products' facet values; inactive or banned products are removed instead."""
+    _update([
+        (product.id, (product.category_id, product.condition, product.price, product.store_id, product.in_stock)
+         if product.is_active and not product.is_banned else None)
+        for product in products
+    ])
+
+
+def remove_product(product_id):
+    """Removes a product from the facet index."""
+    _update([(product_id, None)])
+
+
+def get_facet_counts(filters=None):
+    """
+    Counts the catalog products matching `filters` per category, condition, price
+    bucket, store and stock status.
+
+    Args:
+        filters (dict, optional): The same filters accepted by product_service.get_all_products.
+
+    Returns:
+        dict: {"total": int, "<facet>": [{"value": ..., "count": int}, ...], ...}
+              with at most MAX_FACET_VALUES values per facet, most frequent first.
+    """
+    counts = _get_index().counts(filters or {})
+    result = {"total": counts.pop("total")}
+    for facet, tally in counts.items():
+        ranked = sorted(tally.items(), key=lambda item: (-item[1], str(item[0])))[:MAX_FACET_VALUES]
+        result[facet] = [{"value": value, "count": count} for value, count in ranked]
+    return result
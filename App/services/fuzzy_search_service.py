@@ -0,0 +1,343 @@
+# App/services/fuzzy_search_service.py
+"""Handles typo-tolerant (fuzzy) search over product and store names.
+
+The words of names are broken into character trigrams and kept in in-process trigram
+indexes, so each word of a misspelled query such as "iphnoe 13 pro" is matched to
+similar indexed words without scanning the product table. A bounded set of candidate
+names is gathered, rarest query words first, and ranked by word-level similarity and
+edit distance to the query. The product service and store routes keep
+the indexes up to date as rows change.
+"""
+import threading
+from collections import defaultdict
+from heapq import nlargest
+from itertools import islice
+from application.extensions import db
+from DataBase.models import Product, Store
+from services.search_service import tokenize
+
+DEFAULT_FUZZY_LIMIT = 20
+MAX_FUZZY_LIMIT = 100
+# Minimum similarity for a word, and a name (mean over the query words), to count as a match
+MIN_SIMILARITY = 0.3
+# Words whose lengths differ by more are not compared by edit distance
+MAX_LENGTH_DIFFERENCE = 2
+# How many of the best trigram candidates are re-ranked by edit distance
+RERANK_POOL = 200
+# Names gathered per query word (and from the names matching every query word) before scoring
+MAX_KEYS_PER_WORD = 1000
+
+_product_index = None
+_store_index = None
+_init_lock = threading.Lock()
+
+
+def trigrams(value):
+    """Returns the set of padded character trigrams of every word in `value`."""
+    grams = set()
+    for word in tokenize(value):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def word_edit_distance(query, name, distances=None):
+    """
+    Sums, over the words of `query`, the edit distance to the closest word of `name`.
+    Extra words in the name are free, so "iphon 13 pro" is distance 1 from "iPhone 13 Pro Max".
+    `distances` optionally memoizes word pair distances across calls for the same query.
+    """
+    name_words = tokenize(name)
+    if not name_words:
+        return sum(len(word) for word in tokenize(query))
+    if distances is None:
+        distances = {}
+    total = 0
+    for word in tokenize(query):
+        best = None
+        for candidate in name_words:
+            distance = distances.get((word, candidate))
+            if distance is None:
+                distance = distances[(word, candidate)] = edit_distance(word, candidate)
+            if best is None or distance < best:
+                best = distance
+        total += best
+    return total
+
+
+class TrigramIndex:
+    """
+    In-memory word-level trigram index over names.
+
+    Names are split into words; each distinct word is indexed by its trigrams and maps
+    to the keys of the names containing it. A query is scored word by word: each query
+    word is matched against the indexed words sharing trigrams with it (`similar_words`),
+    and a name's similarity is the mean, over the query words, of its best-matching
+    word's similarity. Comparing words rather than whole names keeps a short typo in a
+    long name ("iphnoe" in "iPhone 13 Pro") from being diluted by the other words.
+    A search scores at most a few thousand names however common its words are (see
+    `_candidates`). All public methods are thread-safe.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._word_keys = defaultdict(set)
+        self._gram_words = defaultdict(set)
+        self._word_gram_counts = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, key, name):
+        """Indexes (or re-indexes) `name` under `key`."""
+        words = set(tokenize(name))
+        with self._lock:
+            self._remove_locked(key)
+            if not words:
+                return
+            for word in words:
+                if word not in self._word_keys:
+                    grams = trigrams(word)
+                    for gram in grams:
+                        self._gram_words[gram].add(word)
+                    self._word_gram_counts[word] = len(grams)
+                self._word_keys[word].add(key)
+            self._names[key] = name
+
+    def remove(self, key):
+        """Removes `key` from the index; a no-op if it is not indexed."""
+        with self._lock:
+            self._remove_locked(key)
+
+    def _remove_locked(self, key):
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        for word in set(tokenize(name)):
+            keys = self._word_keys[word]
+            keys.discard(key)
+            if keys:
+                continue
+            del self._word_keys[word]
+            del self._word_gram_counts[word]
+            for gram in trigrams(word):
+                words = self._gram_words[gram]
+                words.discard(word)
+                if not words:
+                    del self._gram_words[gram]
+
+    def similar_words(self, word, min_similarity=MIN_SIMILARITY):
+        """
+        Returns {indexed word: similarity} for the words similar to `word`. The similarity
+        is the trigram Jaccard or, for words of about the same length sharing at least two
+        trigrams, 1 - edit distance / length if that is higher: a transposition ("iphnoe")
+        breaks most trigrams of a short word but is only two edits.
+        """
+        grams = trigrams(word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._gram_words.get(gram, ()):
+                shared[candidate] += 1
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + self._word_gram_counts[candidate] - count)
+            if count >= 2 and abs(len(candidate) - len(word)) <= MAX_LENGTH_DIFFERENCE:
+                similarity = max(similarity, 1 - edit_distance(word, candidate) / max(len(word), len(candidate)))
+            if similarity >= min_similarity:
+                similar[candidate] = similarity
+        return similar
+
+    def _candidates(self, matches):
+        """
+        Gathers candidate names for the similar words of each query word ({query word:
+        {indexed word: similarity}}); called with the lock held. First come the names
+        containing the best match of every query word (a set intersection, which only walks
+        the smallest posting list), then up to MAX_KEYS_PER_WORD names per query word,
+        rarest query words and most similar indexed words first.
+
+        Returns:
+            dict: {key: name}
+        """
+        ranked = {
+            query_word: sorted(similar, key=similar.get, reverse=True)
+            for query_word, similar in matches.items()
+        }
+        postings = {
+            query_word: sum(len(self._word_keys[word]) for word in words) for query_word, words in ranked.items()
+        }
+        candidates = set()
+        if len(ranked) > 1:
+            best = sorted((self._word_keys[words[0]] for words in ranked.values()), key=len)
+            candidates.update(islice(best[0].intersection(*best[1:]), MAX_KEYS_PER_WORD))
+        for query_word in sorted(ranked, key=postings.get):
+            remaining = MAX_KEYS_PER_WORD
+            for word in ranked[query_word]:
+                keys = list(islice(self._word_keys[word], remaining))
+                candidates.update(keys)
+                remaining -= len(keys)
+                if not remaining:
+                    break
+        return {key: self._names[key] for key in candidates}
+
+    def search(self, query, limit, min_similarity=MIN_SIMILARITY):
+        """
+        Returns up to `limit` (key, similarity, distance) tuples for names similar to `query`,
+        ordered by lowest edit distance and then highest similarity. Only the candidate
+        gathering holds the lock; scoring works on a copy of the candidates' names.
+        """
+        query_words = list(dict.fromkeys(tokenize(query)))
+        if not query_words:
+            return []
+        with self._lock:
+            matches = {word: self.similar_words(word, min_similarity) for word in query_words}
+            matches = {word: similar for word, similar in matches.items() if similar}
+            if not matches:
+                return []
+            names = self._candidates(matches)
+
+        similarities = []
+        for key, name in names.items():
+            words = set(tokenize(name))
+            total = sum(max((similar.get(word, 0.0) for word in words), default=0.0) for similar in matches.values())
+            if total / len(query_words) >= min_similarity:
+                similarities.append((key, total / len(query_words)))
+        pool = nlargest(RERANK_POOL, similarities, key=lambda item: item[1])
+
+        distances = {} # Names share most of their words
+        results = [(key, similarity, word_edit_distance(query, names[key], distances)) for key, similarity in pool]
+        results.sort(key=lambda item: (item[2], -item[1]))
+        return results[:limit]
+
+def _load_indexes():
+    """Builds the product and store indexes from the database on first use."""
+    global _product_index, _store_index
+    if _product_index is not None:
+        return
+    with _init_lock:
+        if _product_index is not None:
+            return
+        products = TrigramIndex()
+        query = (
+            db.session.query(Product.id, Product.name)
+            .filter(Product.is_active.is_(True), Product.is_banned.is_(False))
+            .execution_options(yield_per=5000)
+        )
+        for product_id, name in query:
+            products.add(product_id, name)
+
+        stores = TrigramIndex()
+        for store_id, name in db.session.query(Store.id, Store.name).filter(Store.is_active.is_(True), Store.is_banned.is_(False)):
+            stores.add(store_id, name)
+
+        _store_index = stores
+        _product_index = products
+
+
+def index_products(products):
+    """Adds or refreshes product names; inactive or banned products are removed instead."""
+    _load_indexes()
+    for product in products:
+        if product.is_active and not product.is_banned:
+            _product_index.add(product.id, product.name)
+        else:
+            _product_index.remove(product.id)
+
+
+def remove_product(product_id):
+    """Removes a product from the fuzzy index."""
+    _load_indexes()
+    _product_index.remove(product_id)
+
+
+def index_store(store):
+    """Adds or refreshes a store name; inactive or banned stores are removed instead."""
+    _load_indexes()
+    if store.is_active and not store.is_banned:
+        _store_index.add(store.id, store.name)
+    else:
+        _store_index.remove(store.id)
+
+
+def remove_store(store_id):
+    """Removes a store from the fuzzy index."""
+    _load_indexes()
+    _store_index.remove(store_id)
+
+
+def fuzzy_search_product_ids(query, limit=DEFAULT_FUZZY_LIMIT):
+    """Returns up to `limit` (product_id, similarity, distance) tuples, best match first."""
+    _load_indexes()
+    return _product_index.search(query, limit)
+
+
+def fuzzy_search(query, limit=DEFAULT_FUZZY_LIMIT, fields=None):
+    """
+    Finds products and stores whose names approximately match `query`.
+
+    Args:
+        query (str): The (possibly misspelled) search text.
+        limit (int): Maximum number of products and of stores returned, capped at MAX_FUZZY_LIMIT.
+        fields (tuple, optional): Sparse fieldset for the product dictionaries; None for every field.
+
+    Returns:
+        dict: {"query": str, "products": [...], "stores": [...]}. Every entry carries a
+              "similarity" (0-1, word-level, see TrigramIndex) and an "edit_distance" to the query.
+
+    Raises:
+        ValueError: If the query is empty or the limit is invalid.
+    """
+    from services.product_service import get_products_by_ids # Imported here to avoid a circular import
+
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("Search query must be a non-empty string.")
+    if not isinstance(limit, int) or limit <= 0:
+        raise ValueError("Limit must be a positive integer.")
+    query = query.strip()
+    limit = min(limit, MAX_FUZZY_LIMIT)
+
+    _load_indexes()
+    product_matches = _product_index.search(query, limit)
+    store_matches = _store_index.search(query, limit)
+
+    match_scores = {key: (similarity, distance) for key, similarity, distance in product_matches}
+    products = [
+        {**product, "similarity": round(match_scores[product["id"]][0], 4), "edit_distance": match_scores[product["id"]][1]}
+        for product in get_products_by_ids([key for key, _, _ in product_matches], fields)
+    ]
+
+    stores = []
+    if store_matches:
+        stores_by_id = {
+            row.id: row for row in db.session.query(Store.id, Store.name, Store.storeUsername)
+            .filter(Store.id.in_([key for key, _, _ in store_matches]))
+        }
+        for key, similarity, distance in store_matches:
+            if key in stores_by_id:
+                store = stores_by_id[key]
+                stores.append({
+                    "id": store.id,
+                    "name": store.name,
+                    "storeUsername": store.storeUsername,
+                    "similarity": round(similarity, 4),
+                    "edit_distance": distance
+                })
+
+    return {"query": query, "products": products, "stores": stores}
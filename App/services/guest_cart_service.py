@@ -0,0 +1,309 @@
+# App/services/guest_cart_service.py
+"""Handles the carts of shoppers who are not logged in.
+
+A guest cart is identified by a random ID kept in a signed cookie (GUEST_CART_COOKIE)
+and stored as {product_id: quantity} in a bounded cache, never in the Cart table: with
+the 'memory' backend an in-process LRU, whose evicted carts are spilled to a local
+SQLite file (GUEST_CART_PATH) and promoted back on their next use; with the 'sqlite'
+backend that file only, shared by all the workers of the machine (use it when running
+several workers, as a guest's requests may reach any of them). Product details are read
+from the database, carts are only written to the cache. At login the guest cart is
+merged into the user's cart with one bulk upsert (`merge_guest_cart`).
+
+Guest cart lines have the product ID as their ID, so the /api/cart/items/<id> routes
+address them by product.
+"""
+import secrets
+import threading
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import select
+from application.extensions import db
+from DataBase.models import Product
+from utils.cache import LRUCache, create_cache
+from services.cart_service import parse_cart_operations, merge_cart_items
+
+GUEST_CART_COOKIE = 'guest_cart'
+MAX_GUEST_CART_LINES = 100
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class GuestCartStore:
+    """
+    Guest carts in a cache, optionally backed by a spill cache receiving the carts the
+    first one evicts. Updates of a cart are serialized by a lock (per process).
+    """
+
+    def __init__(self, cache, spill=None):
+        self.cache = cache
+        self.spill = spill
+        self._lock = threading.Lock()
+
+    def get(self, cart_id):
+        """Returns {product_id (str): quantity} of a cart; empty if it does not exist."""
+        items = self.cache.get(cart_id)
+        if items is None and self.spill is not None:
+            items = self.spill.get(cart_id)
+            if items is not None:
+                # Promoted back to memory, where it is updated from now on
+                self.spill.delete(cart_id)
+                self.cache.set(cart_id, items)
+        return dict(items or {})
+
+    def update(self, cart_id, function):
+        """Replaces a cart by `function(items)` (which may raise to leave it unchanged); returns the new items."""
+        with self._lock:
+            items = function(self.get(cart_id))
+            if items:
+                self.cache.set(cart_id, items)
+            else:
+                self.delete(cart_id)
+            return items
+
+    def delete(self, cart_id):
+        self.cache.delete(cart_id)
+        if self.spill is not None:
+            self.spill.delete(cart_id)
+
+    def stats(self):
+        return {"cache": self.cache.stats(), "spill": self.spill.stats() if self.spill is not None else None}
+
+
+def _get_store():
+    """Returns the guest cart store, creating it from the app config on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = current_app.config
+                if config['GUEST_CART_BACKEND'] == 'memory' and config['GUEST_CART_PATH']:
+                    spill = create_cache('sqlite', config['GUEST_CART_SPILL_MAX_ENTRIES'], config['GUEST_CART_TTL'],
+                                         path=config['GUEST_CART_PATH'])
+                    cache = LRUCache(config['GUEST_CART_MAX_ENTRIES'], config['GUEST_CART_TTL'], on_evict=spill.set_many)
+                    _store = GuestCartStore(cache, spill)
+                else:
+                    _store = GuestCartStore(create_cache(
+                        config['GUEST_CART_BACKEND'],
+                        max_entries=config['GUEST_CART_MAX_ENTRIES'],
+                        ttl_seconds=config['GUEST_CART_TTL'],
+                        path=config['GUEST_CART_PATH']
+                    ))
+    return _store
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='guest-cart')
+
+
+def get_guest_cart_id():
+    """Returns the guest cart ID of the current request's cookie, or None if it is missing or its signature is invalid."""
+    cookie = request.cookies.get(GUEST_CART_COOKIE)
+    if not cookie:
+        return None
+    try:
+        return _serializer().loads(cookie)
+    except BadSignature:
+        return None
+
+
+def new_guest_cart_id():
+    return secrets.token_urlsafe(16)
+
+
+def set_guest_cart_cookie(response, cart_id):
+    """Stores the signed guest cart ID in a cookie of `response`."""
+    config = current_app.config
+    response.set_cookie(
+        GUEST_CART_COOKIE, _serializer().dumps(cart_id),
+        max_age=config['GUEST_CART_TTL'],
+        secure=config['SESSION_COOKIE_SECURE'],
+        httponly=True,
+        samesite=config['SESSION_COOKIE_SAMESITE']
+    )
+
+
+def clear_guest_cart_cookie(response):
+    response.delete_cookie(GUEST_CART_COOKIE)
+
+
+def _products(product_ids):
+    """{product_id: row} of the product columns a cart shows, for the given IDs."""
+    if not product_ids:
+        return {}
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.price, Product.image_url, Product.stock_quantity,
+               Product.store_id, Product.is_active)
+        .where(Product.id.in_(list(product_ids)))
+    ).all()
+    return {row.id: row for row in rows}
+
+
+def _serialize_line(product, quantity):
+    """Serializes a guest cart line like services.cart_service serializes a stored one."""
+    return {
+        "id": product.id,
+        "user_id": None,
+        "product_id": product.id,
+        "quantity": quantity,
+        "product": {
+            "id": product.id,
+            "name": product.name,
+            "price": product.price,
+            "image_url": product.image_url,
+            "current_stock": product.stock_quantity,
+            "store_id": product.store_id,
+        },
+        "item_subtotal": quantity * product.price,
+    }
+
+
+def _serialize_cart(items, products=None):
+    """Serializes a guest cart ({product_id (str): quantity}); lines of deleted products are left out."""
+    if products is None:
+        products = _products([int(product_id) for product_id in items])
+    lines = [
+        _serialize_line(products[int(product_id)], quantity)
+        for product_id, quantity in items.items() if int(product_id) in products
+    ]
+    return {"items": lines, "total_cart_price": sum((line["item_subtotal"] for line in lines), 0.0)}
+
+
+def _check_available(product, quantity):
+    if product is None or not product.is_active:
+        raise ValueError("Product not found or not available.")
+    if product.stock_quantity < quantity:
+        raise ValueError("Insufficient stock.")
+
+
+def get_guest_cart(cart_id):
+    """Retrieves a guest cart, in the format of services.cart_service.get_cart."""
+    return _serialize_cart(_get_store().get(cart_id))
+
+
+def add_to_guest_cart(cart_id, product_id, quantity):
+    """
+    Adds a product to a guest cart, or increases its quantity.
+
+    Returns:
+        dict: The serialized cart line.
+
+    Raises:
+        ValueError: If the quantity is invalid, the product is unavailable or out of stock, or the cart is full.
+    """
+    if not isinstance(quantity, int) or quantity <= 0:
+        raise ValueError("Quantity must be a positive integer.")
+    product = _products([product_id]).get(product_id)
+
+    def add(items):
+        key = str(product_id)
+        if key not in items and len(items) >= MAX_GUEST_CART_LINES:
+            raise ValueError(f"A cart holds at most {MAX_GUEST_CART_LINES} products.")
+        items[key] = items.get(key, 0) + quantity
+        _check_available(product, items[key])
+        return items
+
+    items = _get_store().update(cart_id, add)
+    return _serialize_line(product, items[str(product_id)])
+
+
+def update_guest_cart_quantity(cart_id, product_id, new_quantity):
+    """
+    Sets the quantity of a product in a guest cart; 0 removes it.
+
+    Returns:
+        dict: The updated cart.
+
+    Raises:
+        ValueError: If the product is not in the cart, the quantity is negative or the stock is insufficient.
+    """
+    if not isinstance(new_quantity, int) or new_quantity < 0:
+        raise ValueError("Quantity cannot be negative.")
+    product = _products([product_id]).get(product_id) if new_quantity else None
+
+    def update(items):
+        key = str(product_id)
+        if key not in items:
+            raise ValueError("Cart item not found.")
+        if new_quantity == 0:
+            del items[key]
+        else:
+            _check_available(product, new_quantity)
+            items[key] = new_quantity
+        return items
+
+    return _serialize_cart(_get_store().update(cart_id, update))
+
+
+def remove_from_guest_cart(cart_id, product_id):
+    """Removes a product from a guest cart; returns the updated cart. Raises ValueError if it is not in the cart."""
+    return update_guest_cart_quantity(cart_id, product_id, 0)
+
+
+def clear_guest_cart(cart_id):
+    """Empties a guest cart."""
+    _get_store().delete(cart_id)
+    return {"items": [], "total_cart_price": 0.0}
+
+
+def apply_guest_cart_operations(cart_id, operations):
+    """
+    Applies add/set/remove operations to a guest cart, all or none
+    (see services.cart_service.apply_cart_operations for the format and the result).
+    """
+    parsed = parse_cart_operations(operations)
+    products = _products({product_id for _, product_id, _ in parsed})
+    changed = {}
+    removed = []
+
+    def apply(items):
+        stored = set(items)
+        for op, product_id, quantity in parsed:
+            key = str(product_id)
+            items[key] = items.get(key, 0) + quantity if op == 'add' else quantity
+            changed[product_id] = items[key]
+            if not items[key]:
+                del items[key]
+        for product_id, quantity in changed.items():
+            if quantity:
+                product = products.get(product_id)
+                if product is None or not product.is_active:
+                    raise ValueError(f"Product {product_id} not found or not available.")
+                if product.stock_quantity < quantity:
+                    raise ValueError(f"Insufficient stock for product {product_id}.")
+        if len(items) > MAX_GUEST_CART_LINES:
+            raise ValueError(f"A cart holds at most {MAX_GUEST_CART_LINES} products.")
+        removed.extend(product_id for product_id, quantity in changed.items() if not quantity and str(product_id) in stored)
+        return items
+
+    items = _get_store().update(cart_id, apply)
+    # The total also covers the lines the operations did not touch
+    products.update(_products({int(product_id) for product_id in items} - set(products)))
+    return {
+        "items": [_serialize_line(products[product_id], quantity) for product_id, quantity in changed.items() if quantity],
+        "removed_product_ids": removed,
+        "total_cart_price": _serialize_cart(items, products)["total_cart_price"]
+    }
+
+
+def merge_guest_cart(user_id, cart_id):
+    """
+    Moves a guest cart into a user's cart (one bulk upsert, see
+    services.cart_service.merge_cart_items) and deletes it.
+
+    Returns:
+        int: The number of cart lines added or increased.
+    """
+    store = _get_store()
+    items = store.get(cart_id)
+    if not items:
+        return 0
+    merged = merge_cart_items(user_id, {int(product_id): quantity for product_id, quantity in items.items()})
+    store.delete(cart_id)
+    return merged
+
+
+def get_guest_cart_stats():
+    """Returns hit/miss metrics of the guest cart store."""
+    return _get_store().stats()
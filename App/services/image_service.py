@@ -0,0 +1,312 @@
+# App/services/image_service.py
+"""Handles uploaded images (profile images, store logos and banners, product images).
+
+Every upload goes through utils.image_pipeline once, in a worker process: the original
+and each of its renditions are written to the blob store and recorded as an ImageAsset.
+Uploads arrive either as base64 in a JSON body (`store_image`) or as a multipart/form-data
+file part (`store_image_file`).
+
+An upload is matched to an existing asset before it is processed by the hash of its
+bytes. Product image uploads are also matched by perceptual hash against the images of
+the same store's products, so re-encoded or resized copies of a photo the seller already
+uploaded reuse that asset instead of being rendered and stored again. Near-identical
+matching is never done across owners, nor for profile images, logos or banners: a
+different picture must never be swapped for someone else's.
+"""
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
+from application.extensions import db
+from DataBase.models import ImageAsset, User, Store, Product
+from utils.blob_store import get_blob_store, blob_key, media_url
+from utils.image_pipeline import RENDITIONS, fingerprint_image, fit_size, process_image
+
+# Near-identical images have dHashes at most this many bits (out of 64) apart. With the hash
+# split into four bands, two such hashes always have a band in common, so candidates are
+# found with exact lookups on the indexed band columns.
+DHASH_MAX_DISTANCE = 3
+# dHash only sees brightness and ignores the aspect ratio, so near-identical images must also
+# have average colors within this much per channel (color variants of a product photo stay
+# separate) and aspect ratios within this fraction of each other (crops stay separate).
+COLOR_TOLERANCE = 12
+ASPECT_TOLERANCE = 0.02
+_HASH_BANDS = (ImageAsset.dhash_0, ImageAsset.dhash_1, ImageAsset.dhash_2, ImageAsset.dhash_3)
+# Band values of flat areas (e.g. the white background of product photos) are shared by
+# many unrelated images, so they are not used to look up candidates
+_FLAT_BANDS = (0x0000, 0xFFFF)
+_SIMILARITY_COLUMNS = (ImageAsset.id, ImageAsset.width, ImageAsset.height, ImageAsset.average_color) + _HASH_BANDS
+
+
+def _split_hash(hash_value):
+    """Splits a 64-bit hash into its four 16-bit bands, most significant first."""
+    return [(hash_value >> shift) & 0xFFFF for shift in (48, 32, 16, 0)]
+
+
+def _join_hash(bands):
+    value = 0
+    for band in bands:
+        value = (value << 16) | band
+    return value
+
+
+def _colors_close(color, other_color):
+    return all(
+        abs(((color >> shift) & 0xFF) - ((other_color >> shift) & 0xFF)) <= COLOR_TOLERANCE
+        for shift in (16, 8, 0)
+    )
+
+
+def _looks_alike(fingerprint, width, height, average_color, hash_value):
+    """Whether an asset with these properties is near-identical to a fingerprinted upload; returns the hash distance or None."""
+    if average_color is None or hash_value is None:
+        return None
+    distance = bin(fingerprint["dhash"] ^ hash_value).count("1")
+    if distance > DHASH_MAX_DISTANCE:
+        return None
+    if not _colors_close(fingerprint["average_color"], average_color):
+        return None
+    aspect, other_aspect = fingerprint["width"] / fingerprint["height"], width / height
+    if abs(aspect - other_aspect) > ASPECT_TOLERANCE * max(aspect, other_aspect):
+        return None
+    return distance
+
+
+def find_similar_asset(fingerprint, store_id):
+    """
+    Finds an asset used by a product of the store that is near-identical to a
+    fingerprinted upload (see utils.image_pipeline.fingerprint) and at least as large
+    once rendered, so reusing it loses no quality.
+
+    Returns:
+        ImageAsset: The closest such asset, or None.
+    """
+    bands = _split_hash(fingerprint["dhash"])
+    lookups = [column == band for column, band in zip(_HASH_BANDS, bands) if band not in _FLAT_BANDS]
+    if not lookups:
+        return None
+    full_box = RENDITIONS[0][1]
+    upload_width = fit_size((fingerprint["width"], fingerprint["height"]), full_box)[0]
+
+    candidates = []
+    for row in db.session.execute(select(*_SIMILARITY_COLUMNS).where(or_(*lookups))):
+        distance = _looks_alike(fingerprint, row.width, row.height, row.average_color,
+                                _join_hash([row.dhash_0, row.dhash_1, row.dhash_2, row.dhash_3]))
+        if distance is None or fit_size((row.width, row.height), full_box)[0] < upload_width:
+            continue
+        candidates.append((distance, row.id))
+    if not candidates:
+        return None
+
+    # Only assets already used by this store's products (referenced by their full-size URL)
+    assets = {asset.id: asset for asset in ImageAsset.query.filter(ImageAsset.id.in_([asset_id for _, asset_id in candidates]))}
+    urls = {image_url(asset.source_key, asset): asset_id for asset_id, asset in assets.items()}
+    used = {urls[url] for url in db.session.scalars(
+        select(Product.image_url).where(Product.store_id == store_id, Product.image_url.in_(list(urls))).distinct()
+    )}
+    best = min((candidate for candidate in candidates if candidate[1] in used), default=None)
+    return assets[best[1]] if best else None
+
+
+def _find_asset(source_key):
+    return ImageAsset.query.filter_by(source_key=source_key).first()
+
+
+def _add_asset(source_key, result, fingerprint):
+    """Writes the renditions produced by the pipeline to the blob store and records them as an ImageAsset."""
+    store = get_blob_store()
+    renditions = {
+        name: {format_name: store.put(encoded) for format_name, encoded in encodings.items()}
+        for name, encodings in result["renditions"].items()
+    }
+    dhash_0, dhash_1, dhash_2, dhash_3 = _split_hash(fingerprint["dhash"])
+    asset = ImageAsset(
+        source_key=source_key,
+        width=result["width"],
+        height=result["height"],
+        renditions=renditions,
+        dhash_0=dhash_0,
+        dhash_1=dhash_1,
+        dhash_2=dhash_2,
+        dhash_3=dhash_3,
+        average_color=fingerprint["average_color"]
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.add(asset)
+    except IntegrityError:
+        # Another request stored the same image in the meantime
+        asset = ImageAsset.query.filter_by(source_key=source_key).one()
+    return asset
+
+
+def store_image(data, product_store_id=None):
+    """
+    Processes an uploaded image and returns its ImageAsset.
+
+    The asset is added to the session but not committed; it is committed together with
+    the row referencing it (which stores `asset.source_key`).
+
+    Args:
+        data (bytes): The uploaded image file.
+        product_store_id (int, optional): For a product image, the product's store; a
+                                          near-identical image of that store's products is then reused.
+
+    Returns:
+        ImageAsset: The new asset, or an existing one if the same image (or, for a product
+                    image, a near-identical one of the same store) was uploaded before.
+
+    Raises:
+        ValueError: If `data` is not a supported image or is too large.
+        TimeoutError: If processing the image takes too long.
+    """
+    source_key = blob_key(data)
+    asset = _find_asset(source_key)
+    if asset is not None:
+        return asset
+
+    image_fingerprint = fingerprint_image(data)
+    if product_store_id is not None:
+        asset = find_similar_asset(image_fingerprint, product_store_id)
+        if asset is not None:
+            return asset
+
+    result = process_image(data)
+    get_blob_store().put(data)
+    return _add_asset(source_key, result, image_fingerprint)
+
+
+def store_image_file(file, product_store_id=None):
+    """
+    Like `store_image`, for an upload given as a readable binary file object (e.g. a
+    multipart file part spooled to a temporary file). The file is copied into the blob
+    store's staging area in chunks and the worker reads it from there, so it is never
+    held in memory whole; it is only kept if a new asset is created from it.
+
+    Raises:
+        ValueError: If the file is not a supported image or is too large.
+        TimeoutError: If processing the image takes too long.
+    """
+    store = get_blob_store()
+    source_key, tmp_path = store.stage_file(file)
+    try:
+        asset = _find_asset(source_key)
+        if asset is not None:
+            return asset
+
+        image_fingerprint = fingerprint_image(tmp_path)
+        if product_store_id is not None:
+            asset = find_similar_asset(image_fingerprint, product_store_id)
+            if asset is not None:
+                return asset
+
+        result = process_image(tmp_path)
+        store.commit_staged(source_key, tmp_path)
+        return _add_asset(source_key, result, image_fingerprint)
+    finally:
+        store.discard_staged(tmp_path) # No-op once committed
+
+
+def _count_references(assets):
+    """{asset id: number of users, stores and products using the asset}."""
+    by_source_key = {asset.source_key: asset.id for asset in assets}
+    by_url = {image_url(asset.source_key, asset): asset.id for asset in assets}
+    counts = dict.fromkeys(by_source_key.values(), 0)
+    lookups = [(column, by_source_key) for column in (User.profile_image_key, Store.store_logo_key, Store.store_banner_key)]
+    lookups.append((Product.image_url, by_url))
+    for column, asset_ids in lookups:
+        rows = db.session.execute(select(column, func.count()).where(column.in_(list(asset_ids))).group_by(column))
+        for value, count in rows:
+            counts[asset_ids[value]] += count
+    return counts
+
+
+def find_duplicate_clusters(limit=100):
+    """
+    Groups the stored assets that are near-identical to each other (e.g. stored before
+    perceptual hashing was added, or uploaded concurrently).
+
+    Args:
+        limit (int): Maximum number of clusters returned, largest first.
+
+    Returns:
+        list: [{"size": int, "assets": [{"id", "width", "height", "thumbnail", "references"}]}]
+    """
+    # Only assets sharing a (non-flat) band value with another asset can be in a cluster
+    candidate_ids = set()
+    for column in _HASH_BANDS:
+        shared_bands = select(column).where(column.is_not(None), column.not_in(_FLAT_BANDS)) \
+            .group_by(column).having(func.count() > 1)
+        candidate_ids.update(db.session.scalars(select(ImageAsset.id).where(column.in_(shared_bands))))
+    if not candidate_ids:
+        return []
+
+    rows = {}
+    buckets = {}
+    candidate_ids = sorted(candidate_ids)
+    for start in range(0, len(candidate_ids), 1000):
+        chunk = candidate_ids[start:start + 1000]
+        for row in db.session.execute(select(*_SIMILARITY_COLUMNS).where(ImageAsset.id.in_(chunk))):
+            bands = (row.dhash_0, row.dhash_1, row.dhash_2, row.dhash_3)
+            rows[row.id] = {"width": row.width, "height": row.height, "average_color": row.average_color,
+                            "dhash": _join_hash(bands)}
+            for index, band in enumerate(bands):
+                if band not in _FLAT_BANDS:
+                    buckets.setdefault((index, band), []).append(row.id)
+
+    # Union-find over the near-identical pairs found within each bucket
+    parent = {asset_id: asset_id for asset_id in rows}
+
+    def root(asset_id):
+        while parent[asset_id] != asset_id:
+            parent[asset_id] = parent[parent[asset_id]]
+            asset_id = parent[asset_id]
+        return asset_id
+
+    for members in buckets.values():
+        for position, asset_id in enumerate(members):
+            asset = rows[asset_id]
+            for other_id in members[position + 1:]:
+                other = rows[other_id]
+                if root(asset_id) != root(other_id) and \
+                        _looks_alike(asset, other["width"], other["height"], other["average_color"], other["dhash"]) is not None:
+                    parent[root(other_id)] = root(asset_id)
+
+    clusters = {}
+    for asset_id in rows:
+        clusters.setdefault(root(asset_id), []).append(asset_id)
+    clusters = sorted((members for members in clusters.values() if len(members) > 1), key=lambda members: (-len(members), members[0]))
+    clusters = clusters[:limit]
+
+    assets = {asset.id: asset for asset in ImageAsset.query.filter(
+        ImageAsset.id.in_([asset_id for members in clusters for asset_id in members])
+    )}
+    references = _count_references(list(assets.values()))
+    return [{
+        "size": len(members),
+        "assets": [{
+            "id": asset_id,
+            "width": assets[asset_id].width,
+            "height": assets[asset_id].height,
+            "thumbnail": image_url(assets[asset_id].source_key, assets[asset_id], "thumb"),
+            "references": references[asset_id],
+        } for asset_id in members]
+    } for members in clusters]
+
+
+def image_url(key, asset=None, rendition="full", format_name="jpeg"):
+    """
+    URL of one rendition of an image, or None when there is no image.
+    Images stored before renditions were generated have no asset and are served as uploaded.
+    """
+    if asset is not None:
+        return media_url(asset.renditions[rendition][format_name])
+    return media_url(key)
+
+
+def rendition_urls(asset):
+    """{rendition name: {format: URL}} for every rendition of an asset, or None without one."""
+    if asset is None:
+        return None
+    return {
+        name: {format_name: media_url(key) for format_name, key in encodings.items()}
+        for name, encodings in asset.renditions.items()
+    }
@@ -3,7 +3,31 @@
 from DataBase.models import Order, OrderItem, Product, OrderStatus # OrderStatus imported
 from application.extensions import db
 from sqlalchemy.sql import func # For func.now() - although not explicitly used in this function, good for consistency
-from services.cart_service import get_cart, clear_cart # Import cart service functions
+from services.cart_service import get_cart, clear_cart, bump_cart_versions_for_products # Import cart service functions
+from services.product_service import invalidate_products # Stock changes must drop cached product payloads
+from sqlalchemy.orm import joinedload, selectinload
+from utils.serializers import Serializer, Field, isoformat
+
+ORDER_ITEM_SERIALIZER = Serializer(OrderItem, {
+    "id": None,
+    "product_id": None,
+    "quantity": None,
+    "price": None, # Price at the time of purchase
+    "product_name": Field(getter=lambda item: item.product.name if item.product else "Product name not available",
+                          columns=("product_id",)),
+})
+_serialize_order_item = ORDER_ITEM_SERIALIZER.compile()
+
+ORDER_SERIALIZER = Serializer(Order, {
+    "id": None,
+    "user_id": None, # Buyer's ID
+    "total_price": None,
+    "status": None,
+    "created_at": Field(convert=isoformat),
+    "updated_at": Field(convert=isoformat),
+    "order_items": Field(getter=lambda order: [_serialize_order_item(item) for item in order.order_items], columns=()),
+})
+_serialize_order = ORDER_SERIALIZER.compile()
 
 def get_orders_by_store_id(store_id):
     """
@@ -16,34 +40,20 @@ def get_orders_by_store_id(store_id):
         list: A list of dictionaries, where each dictionary represents an order
               and its items. Returns an empty list if no orders are found.
     """
-    orders = Order.query.filter_by(store_id=store_id).order_by(Order.created_at.desc()).all()
-
-    if not orders:
-        return []
-
-    orders_data = []
-    for order in orders:
-        order_items_data = []
-        for item in order.order_items:
-            order_items_data.append({
-                "id": item.id,
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "price": item.price, # Price at the time of purchase
-                "product_name": item.product.name if item.product else "Product name not available" # Accessing product name
-            })
-        
-        orders_data.append({
-            "id": order.id,
-            "user_id": order.user_id, # Buyer's ID
-            "total_price": order.total_price,
-            "status": order.status,
-            "created_at": order.created_at.isoformat() if order.created_at else None,
-            "updated_at": order.updated_at.isoformat() if order.updated_at else None,
-            "order_items": order_items_data
-        })
-    
-    return orders_data
+    # Items and their product names are loaded with one extra query each, not one per order
+    orders = (
+        Order.query.options(
+            selectinload(Order.order_items).options(
+                ORDER_ITEM_SERIALIZER.load_options(),
+                joinedload(OrderItem.product).load_only(Product.name)
+            )
+        )
+        .filter_by(store_id=store_id)
+        .order_by(Order.created_at.desc())
+        .all()
+    )
+
+    return [_serialize_order(order) for order in orders]
 
 def place_order_from_cart(user_id):
     """
@@ -146,7 +156,10 @@ def place_order_from_cart(user_id):
                 "status": new_order.status
             })
 
+        # Stock changed: other carts holding these products must not look unchanged
+        bump_cart_versions_for_products([item['product']['id'] for item in cart_items])
         db.session.commit() # Commit the transaction for all orders
+        invalidate_products([item['product']['id'] for item in cart_items])
         clear_cart(user_id) # Clear cart after successful order placement
 
         return created_orders_summary
@@ -0,0 +1,207 @@
+# App/services/password_service.py
+"""Hashes and verifies passwords off the request thread, with a calibrated work factor.
+
+Password hashes are computed by a bounded thread pool: hashlib's scrypt and PBKDF2
+release the GIL, so the pool uses every core, while limiting concurrent hashes bounds
+their CPU and memory use (each scrypt hash needs 128 * n * r bytes). At most
+PASSWORD_HASH_WORKERS hashes run at once and PASSWORD_HASH_QUEUE_SIZE more may wait;
+beyond that requests fail fast with PasswordHashingBusy, which routes answer with 503.
+
+The scrypt cost `n` is calibrated once per process, on first use: the largest power of
+two (between werkzeug's default and MAX_SCRYPT_N) whose hash takes at most
+PASSWORD_HASH_TARGET_MS. Hashes created with a weaker method or a smaller cost are
+replaced on the user's next successful login (`verify_and_update`).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+MIN_SCRYPT_N = 2 ** 15  # werkzeug's default; calibration never goes below it
+MAX_SCRYPT_N = 2 ** 17  # 128 MiB per hash with r=8
+SCRYPT_R = 8
+SCRYPT_P = 1
+_CALIBRATION_PASSWORD = "calibration-password"
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing queue is full or a hash does not finish in time."""
+
+
+def _scrypt_method(n):
+    return f"scrypt:{n}:{SCRYPT_R}:{SCRYPT_P}"
+
+
+def calibrate(target_ms):
+    """
+    Finds the scrypt cost for a target hashing time on this machine.
+
+    Args:
+        target_ms (int): Target duration of one hash, in milliseconds.
+
+    Returns:
+        tuple: (n, measured milliseconds per hash at that n)
+    """
+    n = MIN_SCRYPT_N
+    elapsed_ms = _time_hash(n)
+    # Doubling n doubles the hashing time
+    while n < MAX_SCRYPT_N and elapsed_ms * 2 <= target_ms:
+        n *= 2
+        elapsed_ms = _time_hash(n)
+    return n, elapsed_ms
+
+
+def _time_hash(n):
+    started = time.perf_counter()
+    generate_password_hash(_CALIBRATION_PASSWORD, method=_scrypt_method(n))
+    return (time.perf_counter() - started) * 1000
+
+
+class PasswordHasher:
+    """
+    Runs password hashing in a bounded thread pool.
+
+    Args:
+        scrypt_n (int): The scrypt cost of new hashes (see `calibrate`).
+        workers (int): Hashes computed concurrently.
+        queue_size (int): Hashes allowed to wait for a worker.
+        timeout (int): Seconds a request waits for its hash.
+    """
+
+    def __init__(self, scrypt_n, workers, queue_size, timeout):
+        self.scrypt_n = scrypt_n
+        self.method = _scrypt_method(scrypt_n)
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy("Too many password hashes in progress.")
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHashingBusy("Password hashing timed out.")
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash uses another method than scrypt, or a smaller scrypt cost than the calibrated one."""
+        method = password_hash.split("$", 1)[0].split(":")
+        if method[0] != "scrypt":
+            return True
+        try:
+            n, r, p = (int(value) for value in method[1:4])
+        except ValueError:
+            return True
+        # A larger cost (e.g. calibrated on a faster machine) is kept rather than weakened
+        return n < self.scrypt_n or (r, p) != (SCRYPT_R, SCRYPT_P)
+
+
+def _get_hasher():
+    """Returns the password hasher, calibrating it from the app config on first use."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                config = current_app.config
+                scrypt_n, elapsed_ms = calibrate(config['PASSWORD_HASH_TARGET_MS'])
+                print(f"Password hashing calibrated: {_scrypt_method(scrypt_n)} ({elapsed_ms:.0f} ms per hash)")
+                _hasher = PasswordHasher(
+                    scrypt_n,
+                    workers=config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1,
+                    queue_size=config['PASSWORD_HASH_QUEUE_SIZE'],
+                    timeout=config['PASSWORD_HASH_TIMEOUT']
+                )
+    return _hasher
+
+
+def hash_password(password):
+    """
+    Hashes a password with the calibrated scrypt cost.
+
+    Raises:
+        PasswordHashingBusy: If the hashing queue is full or the hash takes too long.
+    """
+    return _get_hasher().hash(password)
+
+
+def verify_password(password_hash, password):
+    """
+    Checks a password against a stored hash (any method werkzeug supports).
+
+    Raises:
+        PasswordHashingBusy: If the hashing queue is full or the hash takes too long.
+    """
+    return _get_hasher().verify(password_hash, password)
+
+
+def verify_and_update(user, password):
+    """
+    Checks a user's password and, if it is correct but hashed with a legacy method or cost,
+    replaces `user.password` with a new hash. The caller commits the change.
+
+    Returns:
+        bool: Whether the password is correct.
+
+    Raises:
+        PasswordHashingBusy: If the hashing queue is full or a hash takes too long.
+    """
+    hasher = _get_hasher()
+    if not hasher.verify(user.password, password):
+        return False
+    if hasher.needs_rehash(user.password):
+        user.password = hasher.hash(password)
+    return True
+
+
+def benchmark(samples=5):
+    """
+    Measures hashing throughput with the calibrated cost.
+
+    Args:
+        samples (int): Hashes timed on a single thread; the pool is then timed with `samples` hashes per worker.
+
+    Returns:
+        dict: {"method", "workers", "ms_per_hash", "hashes_per_second_per_core", "hashes_per_second"}
+
+    Raises:
+        PasswordHashingBusy: If the hashing queue is too busy to run the benchmark.
+    """
+    hasher = _get_hasher()
+    started = time.perf_counter()
+    for _ in range(samples):
+        generate_password_hash(_CALIBRATION_PASSWORD, method=hasher.method)
+    single_elapsed = time.perf_counter() - started
+
+    # Through the pool, submitted like concurrent requests would (and limited by the queue like them)
+    count = samples * hasher.workers
+    with ThreadPoolExecutor(max_workers=hasher.workers) as clients:
+        started = time.perf_counter()
+        for _ in clients.map(lambda _: hasher.hash(_CALIBRATION_PASSWORD), range(count)):
+            pass
+        pool_elapsed = time.perf_counter() - started
+
+    return {
+        "method": hasher.method,
+        "workers": hasher.workers,
+        "ms_per_hash": round(single_elapsed / samples * 1000, 1),
+        "hashes_per_second_per_core": round(samples / single_elapsed, 2),
+        "hashes_per_second": round(count / pool_elapsed, 2),
+    }
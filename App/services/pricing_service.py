@@ -0,0 +1,208 @@
+# App/services/pricing_service.py
+"""Handles store-wide pricing operations.
+
+A pricing operation (a percentage or fixed discount, or a percentage or fixed price
+change, optionally rounded and scheduled) is applied to every product of a store
+matching a filter with one UPDATE statement, instead of one request per product.
+Products whose resulting price would not be positive are left unchanged.
+"""
+import math
+from datetime import datetime, timezone
+from sqlalchemy import case, cast, func, select, update, Integer
+from application.extensions import db
+from DataBase.models import Product, ProductCondition
+from services.cart_service import bump_cart_versions_for_products
+from services.product_service import invalidate_products, refresh_product_indexes_by_ids
+
+DISCOUNT_OPERATIONS = ('discount_percent', 'discount_amount')
+PRICE_OPERATIONS = ('price_percent', 'price_amount')
+OPERATIONS = DISCOUNT_OPERATIONS + PRICE_OPERATIONS + ('clear_discount',)
+# How a resulting (sale) price is rounded: to the cent, to a whole unit, or down to the nearest .99
+ROUNDING_MODES = ('cents', 'whole', 'ninety_nine')
+
+
+def _floor(expression):
+    """SQL floor() of a non-negative expression; SQLite builds may lack floor(), but CAST truncates there."""
+    if db.engine.dialect.name == 'sqlite':
+        return cast(expression, Integer)
+    return func.floor(expression)
+
+
+def _rounded(expression, rounding):
+    """Applies a rounding mode to a SQL price expression."""
+    if rounding == 'whole':
+        return _floor(expression + 0.5)
+    if rounding == 'ninety_nine':
+        return _floor(expression + 0.01) - 0.01
+    return _floor(expression * 100 + 0.5) / 100.0
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_datetime(value, field):
+    """Parses an ISO 8601 datetime into naive UTC; None passes through."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an ISO 8601 datetime.")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.replace(tzinfo=None)
+
+
+def _target_conditions(store_id, filters):
+    """Returns the WHERE clauses selecting the store's products that match `filters`."""
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object.")
+    conditions = [Product.store_id == store_id]
+    if filters.get('category_id') is not None:
+        if not _is_integer(filters['category_id']):
+            raise ValueError("category_id must be an integer.")
+        conditions.append(Product.category_id == filters['category_id'])
+    if filters.get('condition') is not None:
+        valid_conditions = [ProductCondition.NEW, ProductCondition.USED, ProductCondition.REFURBISHED]
+        if filters['condition'] not in valid_conditions:
+            raise ValueError(f"Invalid product condition. Must be one of: {', '.join(valid_conditions)}")
+        conditions.append(Product.condition == filters['condition'])
+    if filters.get('in_stock') is not None:
+        if not isinstance(filters['in_stock'], bool):
+            raise ValueError("in_stock must be true or false.")
+        conditions.append(Product.in_stock.is_(filters['in_stock']))
+    for field in ('min_price', 'max_price'):
+        if filters.get(field) is not None and not _is_number(filters[field]):
+            raise ValueError(f"{field} must be a number.")
+    if filters.get('min_price') is not None:
+        conditions.append(Product.price >= filters['min_price'])
+    if filters.get('max_price') is not None:
+        conditions.append(Product.price <= filters['max_price'])
+    if filters.get('product_ids') is not None:
+        product_ids = filters['product_ids']
+        if not isinstance(product_ids, list) or not all(_is_integer(product_id) for product_id in product_ids):
+            raise ValueError("product_ids must be a list of integers.")
+        conditions.append(Product.id.in_(product_ids))
+    return conditions
+
+
+def _validate_operation(operation, value):
+    if operation not in OPERATIONS:
+        raise ValueError(f"Invalid operation. Must be one of: {', '.join(OPERATIONS)}")
+    if operation == 'clear_discount':
+        return
+    if not _is_number(value):
+        raise ValueError("Operation value must be a number.")
+    if operation == 'discount_percent' and not 0 < value < 100:
+        raise ValueError("Discount percentage must be greater than 0 and less than 100.")
+    if operation == 'discount_amount' and value <= 0:
+        raise ValueError("Discount amount must be greater than 0.")
+    if operation == 'price_percent' and (value <= -100 or value == 0):
+        raise ValueError("Price percentage must be non-zero and greater than -100.")
+    if operation == 'price_amount' and value == 0:
+        raise ValueError("Price amount must be non-zero.")
+
+
+def apply_pricing_operation(store_id, operation, value=None, filters=None, rounding='cents',
+                            starts_at=None, ends_at=None, dry_run=False):
+    """
+    Applies a pricing operation to every product of a store matching `filters`, in one UPDATE.
+
+    Operations:
+        discount_percent: sets the discount so the sale price is `value`% below the price.
+        discount_amount: sets the discount so the sale price is `value` below the price.
+        price_percent: changes the price by `value`% (negative values lower it).
+        price_amount: changes the price by `value` (negative values lower it).
+        clear_discount: removes the discount and its schedule.
+    Discounts are stored as an absolute amount off the price. For discount operations the
+    sale price is rounded, for price operations the new price is. A discount that would
+    no longer be below a changed price is removed.
+
+    Args:
+        store_id (int): The ID of the store whose products are re-priced.
+        operation (str): One of OPERATIONS.
+        value (float): The percentage or amount of the operation; unused for clear_discount.
+        filters (dict, optional): Restricts the products: 'category_id', 'condition', 'in_stock',
+                                  'min_price', 'max_price' and/or 'product_ids'.
+        rounding (str): One of ROUNDING_MODES.
+        starts_at (str, optional): ISO 8601 datetime from which a discount applies.
+        ends_at (str, optional): ISO 8601 datetime from which a discount no longer applies.
+        dry_run (bool): When True, nothing is changed and only the counts are returned.
+
+    Returns:
+        dict: {"matched": int, "affected": int, "skipped": int, "dry_run": bool}, where
+              "skipped" counts matched products left unchanged because the resulting
+              price would not be positive.
+
+    Raises:
+        ValueError: If the operation, value, rounding, schedule, filters or dry_run are invalid.
+    """
+    if not isinstance(dry_run, bool):
+        raise ValueError("dry_run must be true or false.")
+    _validate_operation(operation, value)
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Invalid rounding. Must be one of: {', '.join(ROUNDING_MODES)}")
+    starts_at = _parse_datetime(starts_at, 'starts_at')
+    ends_at = _parse_datetime(ends_at, 'ends_at')
+    if (starts_at or ends_at) and operation not in DISCOUNT_OPERATIONS:
+        raise ValueError("A schedule can only be set for discount operations.")
+    if starts_at and ends_at and ends_at <= starts_at:
+        raise ValueError("ends_at must be later than starts_at.")
+
+    conditions = _target_conditions(store_id, {} if filters is None else filters)
+
+    # Guards keep products whose resulting price would not be positive out of the update
+    guards = []
+    if operation == 'clear_discount':
+        values = {"discount": 0.0, "discount_starts_at": None, "discount_ends_at": None}
+    elif operation in DISCOUNT_OPERATIONS:
+        if operation == 'discount_percent':
+            sale_price = _rounded(Product.price * (1 - value / 100.0), rounding)
+        else:
+            sale_price = _rounded(Product.price - value, rounding)
+        guards = [sale_price > 0, sale_price <= Product.price]
+        values = {
+            "discount": _rounded(Product.price - sale_price, 'cents'),
+            "discount_starts_at": starts_at,
+            "discount_ends_at": ends_at,
+        }
+    else:
+        if operation == 'price_percent':
+            new_price = _rounded(Product.price * (1 + value / 100.0), rounding)
+        else:
+            new_price = _rounded(Product.price + value, rounding)
+        guards = [new_price > 0]
+        # Evaluated against the old row, so both expressions see the current price
+        values = {
+            "price": new_price,
+            "discount": case((Product.discount >= new_price, 0.0), else_=Product.discount),
+        }
+
+    matched = db.session.scalar(select(func.count(Product.id)).where(*conditions))
+    if dry_run:
+        affected = db.session.scalar(select(func.count(Product.id)).where(*conditions, *guards)) if guards else matched
+        return {"matched": matched, "affected": affected, "skipped": matched - affected, "dry_run": True}
+
+    # The ids are only needed to invalidate the cache and indexes; the update itself is set-based
+    product_ids = db.session.scalars(select(Product.id).where(*conditions, *guards)).all()
+    result = {"matched": matched, "affected": len(product_ids), "skipped": matched - len(product_ids), "dry_run": False}
+    if not product_ids:
+        return result
+
+    db.session.execute(
+        update(Product).where(*conditions, *guards).values(**values),
+        execution_options={"synchronize_session": False}
+    )
+    bump_cart_versions_for_products(product_ids)
+    db.session.commit()
+
+    if operation in PRICE_OPERATIONS:
+        refresh_product_indexes_by_ids(product_ids) # Prices feed the facet index
+    else:
+        invalidate_products(product_ids)
+    return result
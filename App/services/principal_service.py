@@ -0,0 +1,200 @@
+# App/services/principal_service.py
+"""Loads the authenticated principal for Flask-Login.
+
+Flask-Login's user loader runs on every authenticated request. Instead of a full User
+row it gets a Principal: the few fields authorization checks and the session status
+endpoint read (role flags, account status, security version, profile summary and the
+seller's store id), selected with one narrow query and cached for PRINCIPAL_CACHE_TTL
+seconds. Code changing one of those fields calls `invalidate_principal` once it has
+committed. Handlers that need the full row (password checks, updates) use
+`current_user.user`, which loads it once per request.
+
+Sessions are revoked without a session store: login records the user's security_version
+in the signed session cookie, and `revoke_sessions` increments it (on ban or password
+change), so `session_is_current` rejects every session created before. Since a cached
+principal may predate the change, revocations, bans and deletions are also recorded with
+`record_account_status` in an AccountStatusStore shared by the workers of the machine,
+which `session_is_current` consults first: they apply to the next request in every
+worker, whatever the cache backend, and without a database query.
+"""
+import threading
+from flask import current_app, session
+from sqlalchemy import select
+from application.extensions import db
+from DataBase.models import User, Store, ImageAsset
+from utils.account_status import AccountStatusStore
+from utils.cache import create_cache
+
+_principal_cache = None
+_principal_cache_lock = threading.Lock()
+_account_status = None
+_account_status_lock = threading.Lock()
+
+
+class Principal:
+    """
+    The authenticated user as seen by Flask-Login (`current_user`).
+
+    Attributes:
+        id, username, full_name, email, phone, profile_image_key, is_admin, is_seller,
+        is_banned, is_deleted, can_create_store, security_version: As on User.
+        profile_image_renditions (dict): The renditions of the profile image's ImageAsset, or None.
+        store_id (int): The ID of the seller's store, or None if the user has no store.
+    """
+
+    def __init__(self, id, username, full_name, email, phone, profile_image_key, profile_image_renditions,
+                 is_admin, is_seller, is_active, is_banned, is_deleted, can_create_store, security_version, store_id):
+        self.id = id
+        self.username = username
+        self.full_name = full_name
+        self.email = email
+        self.phone = phone
+        self.profile_image_key = profile_image_key
+        self.profile_image_renditions = profile_image_renditions
+        self.is_admin = is_admin
+        self.is_seller = is_seller
+        self._is_active = is_active
+        self.is_banned = is_banned
+        self.is_deleted = is_deleted
+        self.can_create_store = can_create_store
+        self.security_version = security_version
+        self.store_id = store_id
+        self._user = None
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    @property
+    def is_active(self):
+        return self._is_active
+
+    def get_id(self):
+        return str(self.id)
+
+    @property
+    def user(self):
+        """The full User row, loaded on first use in the request."""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    @property
+    def profile_image_asset(self):
+        """A transient ImageAsset carrying the cached renditions (for services.image_service.image_url), or None."""
+        if self.profile_image_renditions is None:
+            return None
+        return ImageAsset(source_key=self.profile_image_key, renditions=self.profile_image_renditions)
+
+    def __repr__(self):
+        return f"<Principal {self.username}>"
+
+
+def _get_principal_cache():
+    """Returns the principal cache, creating it from the app config on first use."""
+    global _principal_cache
+    if _principal_cache is None:
+        with _principal_cache_lock:
+            if _principal_cache is None:
+                config = current_app.config
+                _principal_cache = create_cache(
+                    config['PRINCIPAL_CACHE_BACKEND'],
+                    max_entries=config['PRINCIPAL_CACHE_MAX_ENTRIES'],
+                    ttl_seconds=config['PRINCIPAL_CACHE_TTL'],
+                    path=config['PRINCIPAL_CACHE_PATH']
+                )
+    return _principal_cache
+
+
+def _get_account_status():
+    """Returns the shared account status store, opening it from the app config on first use."""
+    global _account_status
+    if _account_status is None:
+        with _account_status_lock:
+            if _account_status is None:
+                _account_status = AccountStatusStore(current_app.config['ACCOUNT_STATUS_PATH'])
+    return _account_status
+
+
+def _cache_key(user_id):
+    return f"principal:{user_id}"
+
+
+def load_principal(user_id):
+    """
+    Returns the Principal of a user, from the cache or with one narrow query.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        Principal: The principal, or None if the user does not exist.
+    """
+    cache = _get_principal_cache()
+    fields = cache.get(_cache_key(user_id))
+    if fields is None:
+        store_id = select(Store.id).where(Store.owner_id == User.id).order_by(Store.id).limit(1).scalar_subquery()
+        renditions = select(ImageAsset.renditions).where(ImageAsset.source_key == User.profile_image_key).scalar_subquery()
+        row = db.session.execute(select(
+            User.id, User.username, User.full_name, User.email, User.phone, User.profile_image_key,
+            renditions.label('profile_image_renditions'), User.is_admin, User.is_seller, User.is_active,
+            User.is_banned, User.is_deleted, User.can_create_store, User.security_version, store_id.label('store_id')
+        ).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        fields = dict(row._mapping)
+        cache.set(_cache_key(user_id), fields)
+    return Principal(**fields)
+
+
+def invalidate_principal(user_id):
+    """
+    Drops the cached principal of a user; call it after committing a change to its role
+    flags, status, security version, profile or store. With the 'memory' backend other workers still serve
+    their copy until it expires (PRINCIPAL_CACHE_TTL); session checks do not depend on it
+    (see `record_account_status`).
+    """
+    _get_principal_cache().delete(_cache_key(user_id))
+
+
+def record_account_status(user, deleted=False):
+    """
+    Publishes a user's committed security version and ban status (or its deletion) to
+    every worker; call it after committing a session revocation, a ban or unban, or the
+    deletion of the account.
+    """
+    _get_account_status().set(user.id, user.security_version or 0, user.is_banned, deleted or user.is_deleted)
+
+
+def session_is_current(principal):
+    """
+    Whether the current session was created since the user's sessions were last revoked
+    and the account is neither banned nor deleted. The shared account status, when one was
+    recorded, takes precedence over the possibly older cached principal.
+    """
+    status = _get_account_status().get(principal.id)
+    if status is None:
+        status = (principal.security_version, principal.is_banned, principal.is_deleted)
+    security_version, is_banned, is_deleted = status
+    if is_banned or is_deleted:
+        return False
+    # Sessions created before security versions existed carry none; users start at 0
+    return session.get('security_version', 0) == max(security_version, principal.security_version)
+
+
+def revoke_sessions(user):
+    """
+    Invalidates every existing session of a user. The change is committed by the caller,
+    who then calls `invalidate_principal` and `record_account_status`; a session that must
+    survive (e.g. the one that changed the password) stores the new `user.security_version` again.
+    """
+    user.security_version = (user.security_version or 0) + 1
+
+
+def get_principal_cache_stats():
+    """Returns hit/miss metrics of the principal cache."""
+    return _get_principal_cache().stats()
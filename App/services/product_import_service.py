@@ -0,0 +1,144 @@
+# App/services/product_import_service.py
+"""Handles bulk product imports for sellers.
+
+Rows are read one at a time from a CSV or NDJSON stream, validated with the same
+rules as product_service.add_product_to_store, and inserted in batches with one
+multi-row INSERT and one commit per batch. Only the current batch is held in memory,
+so large catalogs import with flat memory use.
+"""
+import csv
+import io
+import json
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from application.extensions import db
+from DataBase.models import Product, Category
+from services.product_service import validate_new_product, refresh_product_indexes
+
+IMPORT_BATCH_SIZE = 1000
+# At most this many row errors are reported back; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# How text values from CSV cells are converted before validation
+_CSV_FIELD_TYPES = {'price': float, 'stock_quantity': int, 'category_id': int}
+
+
+def _coerce_csv_row(row):
+    """Converts the numeric CSV cells of a row and drops empty cells."""
+    product_data = {}
+    for field, value in row.items():
+        if field is None:
+            raise ValueError("Row has more cells than the header.")
+        value = value.strip() if isinstance(value, str) else value
+        if value in (None, ''):
+            continue
+        if field in _CSV_FIELD_TYPES:
+            try:
+                value = _CSV_FIELD_TYPES[field](value)
+            except ValueError:
+                raise ValueError(f"Invalid value for {field}: {value!r}")
+        product_data[field] = value
+    return product_data
+
+
+def iter_csv_rows(stream):
+    """
+    Yields (row_number, product_data) pairs from a UTF-8 CSV byte stream with a header row.
+    Rows that cannot be parsed yield the ValueError in place of the product data.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row_number, row in enumerate(reader, 1):
+        try:
+            yield row_number, _coerce_csv_row(row)
+        except ValueError as e:
+            yield row_number, e
+
+
+def iter_ndjson_rows(stream):
+    """
+    Yields (row_number, product_data) pairs from a UTF-8 NDJSON byte stream, one JSON
+    object per line; blank lines are skipped. Lines that cannot be parsed yield the
+    ValueError in place of the product data.
+    """
+    row_number = 0
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            product_data = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {str(e)}")
+            continue
+        if not isinstance(product_data, dict):
+            yield row_number, ValueError("Each line must be a JSON object.")
+            continue
+        yield row_number, product_data
+
+
+def _insert_batch(batch):
+    """Inserts a batch of product rows in one transaction and refreshes the indexes for them."""
+    product_ids = db.session.scalars(insert(Product).returning(Product.id), batch).all()
+    db.session.commit()
+    products = (
+        Product.query.options(joinedload(Product.category))
+        .filter(Product.id.in_(product_ids))
+        .all()
+    )
+    refresh_product_indexes(products)
+    db.session.expunge_all() # Keep the identity map from growing across batches
+    return len(product_ids)
+
+
+def import_products(store_id, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports products into a store from an iterable of rows.
+
+    Valid rows are inserted in batches of `batch_size`, each batch in its own
+    transaction; invalid rows are skipped and reported. A batch that has been
+    committed stays imported even if a later batch fails.
+
+    Args:
+        store_id (int): The ID of the store to add the products to.
+        rows (iterable): (row_number, product_data) pairs, as yielded by iter_csv_rows
+                         or iter_ndjson_rows. product_data may be a ValueError for
+                         rows that could not be parsed.
+        batch_size (int): Number of products inserted per transaction.
+
+    Returns:
+        dict: {"inserted": int, "failed": int, "errors": [{"row": int, "error": str}, ...],
+               "errors_truncated": bool}. At most MAX_REPORTED_ERRORS errors are listed.
+    """
+    category_ids = set(db.session.scalars(db.select(Category.id)))
+    inserted = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    for row_number, product_data in rows:
+        try:
+            if isinstance(product_data, ValueError):
+                raise product_data
+            values = validate_new_product(product_data)
+            if values['category_id'] is not None and values['category_id'] not in category_ids:
+                raise ValueError(f"Category not found: {values['category_id']}")
+        except ValueError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": str(e)})
+            continue
+
+        batch.append({**values, "store_id": store_id})
+        if len(batch) >= batch_size:
+            inserted += _insert_batch(batch)
+            batch = []
+
+    if batch:
+        inserted += _insert_batch(batch)
+
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
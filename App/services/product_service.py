@@ -1,66 +1,370 @@
 # App/services/product_service.py
 """Handles business logic related to product management."""
+import base64
+import json
+import math
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import joinedload
 from DataBase.models import Product, ProductCondition # Import ProductCondition
 from application.extensions import db
+from services import search_service, fuzzy_search_service, facet_service
+from services.cart_service import bump_cart_versions_for_products
+from utils.cache import create_cache
+from utils.serializers import Serializer, Field, isoformat
 
-def get_all_products():
-    """Retrieves a list of all products. Currently a placeholder."""
-    # TODO: Implement logic to fetch products from the database.
-    # Consider pagination, filtering, and sorting.
-    # For now, returning an empty list as a placeholder.
-    return []
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+# Cache misses are loaded from the database in chunks of this many ids
+CACHE_LOAD_CHUNK_SIZE = 500
+# Upper bound on the number of changes accepted by one bulk update
+MAX_BULK_CHANGES = 5000
 
-def get_products_by_store_id(store_id):
+_product_cache = None
+_product_cache_lock = threading.Lock()
+
+# Sort options for the public catalog: name -> (sort column, descending?).
+# Every sort is paired with Product.id as a tie-breaker so the keyset cursor is unique.
+CATALOG_SORTS = {
+    'newest': (Product.created_at, True),
+    'oldest': (Product.created_at, False),
+    'price_asc': (Product.price, False),
+    'price_desc': (Product.price, True),
+}
+
+def _is_number(value):
+    """A finite int or float; NaN and infinities (e.g. from float('nan') in a CSV cell) are not numbers here."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+# Fields accepted by bulk_update_products: field -> (validity check, error message)
+BULK_UPDATE_FIELDS = {
+    'price': (lambda value: _is_number(value) and value > 0, "Product price must be a number greater than 0."),
+    'stock_quantity': (lambda value: isinstance(value, int) and not isinstance(value, bool) and value >= 0,
+                       "Stock quantity must be an integer greater than or equal to 0."),
+    'discount': (lambda value: _is_number(value) and value >= 0, "Discount must be a number greater than or equal to 0."),
+    'in_stock': (lambda value: isinstance(value, bool), "in_stock must be a boolean."),
+}
+
+
+PRODUCT_SERIALIZER = Serializer(Product, {
+    "id": None,
+    "store_id": None,
+    "name": None,
+    "description": None,
+    "price": None,
+    "image_url": None,
+    "in_stock": None,
+    "stock_quantity": None,
+    "condition": None,
+    "category_id": None,
+    "discount": None,
+    "discount_starts_at": Field(convert=isoformat),
+    "discount_ends_at": Field(convert=isoformat),
+    "rating": None,
+    "number_of_user_rating": None,
+    "number_of_sales": None,
+    "is_verified": None,
+    "is_active": None,
+    "is_banned": None,
+    "created_at": Field(convert=isoformat),
+    "updated_at": Field(convert=isoformat),
+})
+# Serializes a Product object into the full product dictionary
+_serialize_product = PRODUCT_SERIALIZER.compile()
+# Fields needed to decide whether a scheduled discount currently applies
+DISCOUNT_SCHEDULE_FIELDS = ("discount_starts_at", "discount_ends_at")
+
+
+def parse_product_fields(raw):
+    """
+    Parses a `?fields=` sparse fieldset for product payloads.
+
+    Returns:
+        tuple or None: The requested fields, or None for every field.
+
+    Raises:
+        ValueError: If a field is unknown.
+    """
+    return PRODUCT_SERIALIZER.parse_fields(raw)
+
+
+def _get_product_cache():
+    """Returns the product payload cache, creating it from the app config on first use."""
+    global _product_cache
+    if _product_cache is None:
+        with _product_cache_lock:
+            if _product_cache is None:
+                config = current_app.config
+                _product_cache = create_cache(
+                    config['PRODUCT_CACHE_BACKEND'],
+                    max_entries=config['PRODUCT_CACHE_MAX_ENTRIES'],
+                    ttl_seconds=config['PRODUCT_CACHE_TTL'],
+                    path=config['PRODUCT_CACHE_PATH']
+                )
+    return _product_cache
+
+
+def _cache_key(product_id):
+    return f"product:{product_id}"
+
+
+def get_products_by_ids(product_ids, fields=None):
+    """
+    Returns the serialized products for `product_ids`, in the same order.
+
+    Read-through: payloads are served from the product cache, and only the misses are
+    loaded from the database (in one query per chunk). Full payloads are written back
+    to the cache, unless invalidated while they were loaded; when a sparse fieldset is
+    requested, misses are loaded with only the columns it needs and are not cached.
+    Ids that do not exist are skipped.
+
+    Args:
+        product_ids (list): The product IDs to fetch.
+        fields (tuple, optional): Sparse fieldset from parse_product_fields; None for every field.
+
+    Returns:
+        list: A list of product dictionaries.
+    """
+    cache = _get_product_cache()
+    cached = cache.get_many([_cache_key(product_id) for product_id in product_ids])
+    # Read before loading, so payloads invalidated while they load are not cached
+    generation = cache.generation() if fields is None and len(cached) < len(product_ids) else None
+    payloads = {}
+    missing = []
+    for product_id in product_ids:
+        payload = cached.get(_cache_key(product_id))
+        if payload is None:
+            missing.append(product_id)
+        else:
+            payloads[product_id] = payload
+
+    load_fields = fields
+    if fields is not None and "discount" in fields:
+        load_fields = tuple(dict.fromkeys(fields + DISCOUNT_SCHEDULE_FIELDS))
+    serialize = PRODUCT_SERIALIZER.compile(load_fields)
+    for start in range(0, len(missing), CACHE_LOAD_CHUNK_SIZE):
+        chunk = missing[start:start + CACHE_LOAD_CHUNK_SIZE]
+        query = Product.query.filter(Product.id.in_(chunk))
+        if fields is not None:
+            query = query.options(PRODUCT_SERIALIZER.load_options(load_fields))
+        loaded = {product.id: serialize(product) for product in query}
+        if fields is None:
+            cache.set_many({_cache_key(product_id): payload for product_id, payload in loaded.items()}, generation)
+        payloads.update(loaded)
+
+    now = datetime.utcnow().isoformat()
+    return [
+        Serializer.project(_with_current_discount(payloads[product_id], now), fields)
+        for product_id in product_ids if product_id in payloads
+    ]
+
+
+def _with_current_discount(payload, now):
+    """
+    Zeroes the discount of a payload whose discount schedule does not cover `now`.
+    Applied on every read rather than cached, so a scheduled sale starts and ends on time.
+    `now` and the schedule are naive-UTC ISO strings, which compare correctly as text.
+    """
+    starts_at = payload.get("discount_starts_at")
+    ends_at = payload.get("discount_ends_at")
+    if (starts_at and now < starts_at) or (ends_at and now >= ends_at):
+        return {**payload, "discount": 0.0}
+    return payload
+
+
+def get_product(product_id, fields=None):
+    """Returns the serialized product with the given ID (read through the cache), or None."""
+    products = get_products_by_ids([product_id], fields)
+    return products[0] if products else None
+
+
+def get_catalog_product(product_id, fields=None):
+    """Returns the serialized product if it is visible in the public catalog (active, not banned), else None."""
+    lookup_fields = fields and tuple(dict.fromkeys(fields + ("is_active", "is_banned")))
+    product = get_product(product_id, lookup_fields)
+    if not product or not product["is_active"] or product["is_banned"]:
+        return None
+    return Serializer.project(product, fields)
+
+
+def invalidate_products(product_ids):
+    """Drops cached payloads; called whenever products change outside this module (e.g. stock on order placement)."""
+    _get_product_cache().delete_many([_cache_key(product_id) for product_id in product_ids])
+
+
+def get_product_cache_stats():
+    """Returns hit/miss/eviction statistics of the product cache."""
+    return _get_product_cache().stats()
+
+
+def refresh_product_indexes(products):
+    """Invalidates the cached payloads of created or updated products and pushes them into the search and facet indexes."""
+    invalidate_products([product.id for product in products])
+    fuzzy_search_service.index_products(products)
+    facet_service.index_products(products)
+    # Last: the FTS5 backend commits, which expires the products and would make the
+    # in-memory indexes above reload every one of them
+    search_service.index_products(products)
+
+
+def refresh_product_indexes_by_ids(product_ids):
+    """Loads products in chunks and refreshes their cache entries and index entries."""
+    for start in range(0, len(product_ids), CACHE_LOAD_CHUNK_SIZE):
+        chunk = product_ids[start:start + CACHE_LOAD_CHUNK_SIZE]
+        refresh_product_indexes(
+            Product.query.options(joinedload(Product.category)).filter(Product.id.in_(chunk)).all()
+        )
+
+def _drop_from_indexes(product_id):
+    """Removes a deleted product from the cache and the search and facet indexes."""
+    invalidate_products([product_id])
+    search_service.remove_product(product_id)
+    fuzzy_search_service.remove_product(product_id)
+    facet_service.remove_product(product_id)
+
+
+def _encode_cursor(sort, value, product_id):
+    """Encodes the (sort key, id) position of the last product on a page as an opaque cursor."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, product_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, sort):
+    """
+    Decodes a cursor produced by _encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different sort order.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, product_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if cursor_sort != sort or not isinstance(product_id, int):
+            raise ValueError
+        column, _ = CATALOG_SORTS[sort]
+        if column is Product.created_at:
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, (int, float)):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    return value, product_id
+
+
+def _apply_catalog_filters(query, filters):
+    """
+    Applies the public catalog filters to a Product query.
+
+    Raises:
+        ValueError: If a filter value is invalid.
+    """
+    if filters.get('category_id') is not None:
+        query = query.filter(Product.category_id == filters['category_id'])
+    if filters.get('store_id') is not None:
+        query = query.filter(Product.store_id == filters['store_id'])
+    if filters.get('condition') is not None:
+        valid_conditions = [ProductCondition.NEW, ProductCondition.USED, ProductCondition.REFURBISHED]
+        if filters['condition'] not in valid_conditions:
+            raise ValueError(f"Invalid product condition. Must be one of: {', '.join(valid_conditions)}")
+        query = query.filter(Product.condition == filters['condition'])
+    if filters.get('min_price') is not None:
+        query = query.filter(Product.price >= filters['min_price'])
+    if filters.get('max_price') is not None:
+        query = query.filter(Product.price <= filters['max_price'])
+    if filters.get('in_stock') is not None:
+        query = query.filter(Product.in_stock == filters['in_stock'])
+    return query
+
+
+def get_all_products(filters=None, sort='newest', cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+    """
+    Retrieves one page of the public product catalog using keyset (cursor) pagination.
+
+    Instead of OFFSET, each page continues strictly after the (sort key, id) of the
+    last row of the previous page, so fetching page N is a single index range scan
+    on the composite indexes declared on Product and costs the same as page 1.
+    The page query only selects (id, sort key); the payloads come from the product cache.
+
+    Args:
+        filters (dict, optional): Any of 'category_id', 'store_id', 'condition',
+                                  'min_price', 'max_price' and 'in_stock'.
+        sort (str): One of CATALOG_SORTS ('newest', 'oldest', 'price_asc', 'price_desc').
+        cursor (str, optional): The 'next_cursor' returned with the previous page.
+        limit (int): Page size, capped at MAX_PAGE_SIZE.
+        fields (tuple, optional): Sparse fieldset from parse_product_fields; None for every field.
+
+    Returns:
+        dict: {"items": [...], "next_cursor": str or None, "sort": str, "limit": int}.
+              'next_cursor' is None on the last page.
+
+    Raises:
+        ValueError: If the sort option, a filter, the limit or the cursor is invalid.
+    """
+    if sort not in CATALOG_SORTS:
+        raise ValueError(f"Invalid sort option. Must be one of: {', '.join(CATALOG_SORTS)}")
+    if not isinstance(limit, int) or limit <= 0:
+        raise ValueError("Limit must be a positive integer.")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    column, descending = CATALOG_SORTS[sort]
+    query = db.session.query(Product.id, column).filter(Product.is_active.is_(True), Product.is_banned.is_(False))
+    query = _apply_catalog_filters(query, filters or {})
+
+    if cursor:
+        last_value, last_id = _decode_cursor(cursor, sort)
+        if descending:
+            query = query.filter(or_(column < last_value, and_(column == last_value, Product.id < last_id)))
+        else:
+            query = query.filter(or_(column > last_value, and_(column == last_value, Product.id > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), Product.id.desc())
+    else:
+        query = query.order_by(column.asc(), Product.id.asc())
+
+    # Fetch one extra row to know whether another page exists without a COUNT(*)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": get_products_by_ids([row[0] for row in rows], fields),
+        "next_cursor": _encode_cursor(sort, rows[-1][1], rows[-1][0]) if has_more else None,
+        "sort": sort,
+        "limit": limit
+    }
+
+def get_products_by_store_id(store_id, fields=None):
     """
     Retrieves all products belonging to a specific store.
 
     Args:
         store_id (int): The ID of the store.
+        fields (tuple, optional): Sparse fieldset from parse_product_fields; None for every field.
 
     Returns:
         list: A list of dictionaries, where each dictionary represents a product.
               Returns an empty list if no products are found for the store.
     """
-    products = Product.query.filter_by(store_id=store_id).all()
-    if not products:
-        return []
-
-    products_data = []
-    for product in products:
-        products_data.append({
-            "id": product.id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "image_url": product.image_url, # Assuming this is a string URL
-            "in_stock": product.in_stock,
-            "stock_quantity": product.stock_quantity,
-            "condition": product.condition,
-            "category_id": product.category_id,
-            "discount": product.discount,
-            "rating": product.rating,
-            "number_of_user_rating": product.number_of_user_rating,
-            "number_of_sales": product.number_of_sales,
-            "is_verified": product.is_verified,
-            "is_active": product.is_active,
-            "is_banned": product.is_banned,
-            "created_at": product.created_at.isoformat() if product.created_at else None,
-            "updated_at": product.updated_at.isoformat() if product.updated_at else None
-        })
-    return products_data
+    product_ids = [row.id for row in db.session.query(Product.id).filter_by(store_id=store_id).order_by(Product.id)]
+    return get_products_by_ids(product_ids, fields)
 
-def add_product_to_store(store_id, product_data):
+def validate_new_product(product_data):
     """
-    Adds a new product to a specific store.
+    Validates the details of a product to be created.
 
     Args:
-        store_id (int): The ID of the store to add the product to.
         product_data (dict): A dictionary containing the product details.
                              Expected keys: 'name', 'price', 'stock_quantity', 'condition'.
-                             Optional keys: 'description', 'category_id', 'image_url'.
+                             Optional keys: 'description', 'category_id', 'image_url',
+                             'available_colors', 'available_sizes'.
 
     Returns:
-        dict: A dictionary representation of the newly created product.
+        dict: The Product column values to insert (without 'store_id').
 
     Raises:
         ValueError: If required fields are missing, data types are incorrect,
@@ -78,7 +382,9 @@ def add_product_to_store(store_id, product_data):
 
     if not isinstance(name, str) or not name.strip():
         raise ValueError("Product name must be a non-empty string.")
-    if not isinstance(price, (int, float)) or price <= 0:
+    if len(name) > Product.name.type.length:
+        raise ValueError(f"Product name must be at most {Product.name.type.length} characters.")
+    if not _is_number(price) or price <= 0:
         raise ValueError("Product price must be a number greater than 0.")
     if not isinstance(stock_quantity, int) or stock_quantity < 0:
         raise ValueError("Stock quantity must be an integer greater than or equal to 0.")
@@ -87,49 +393,59 @@ def add_product_to_store(store_id, product_data):
     if condition not in valid_conditions:
         raise ValueError(f"Invalid product condition. Must be one of: {', '.join(valid_conditions)}")
 
-    # Optional fields
-    description = product_data.get('description')
-    category_id = product_data.get('category_id') # FK check skipped as per instructions
-    image_url = product_data.get('image_url')
-
-    new_product = Product(
-        store_id=store_id,
-        name=name,
-        price=price,
-        stock_quantity=stock_quantity,
-        condition=condition,
-        description=description,
-        category_id=category_id,
-        image_url=image_url,
-        # Default values for other fields like is_active, is_verified, etc.,
-        # will be handled by the model's defaults or can be set here if needed.
-    )
+    # Optional fields are checked too, so a bad value fails here rather than in the INSERT
+    category_id = product_data.get('category_id')
+    if category_id is not None and (not isinstance(category_id, int) or isinstance(category_id, bool)):
+        raise ValueError("Category ID must be an integer.")
+    for field in ('description', 'image_url', 'available_colors', 'available_sizes'):
+        value = product_data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string.")
+        max_length = getattr(Product, field).type.length
+        if len(value) > max_length:
+            raise ValueError(f"{field} must be at most {max_length} characters.")
+
+    return {
+        "name": name,
+        "price": price,
+        "stock_quantity": stock_quantity,
+        "condition": condition,
+        # Optional fields
+        "description": product_data.get('description'),
+        "category_id": category_id, # FK check skipped as per instructions
+        "image_url": product_data.get('image_url'),
+        "available_colors": product_data.get('available_colors'),
+        "available_sizes": product_data.get('available_sizes'),
+    }
+
+def add_product_to_store(store_id, product_data):
+    """
+    Adds a new product to a specific store.
+
+    Args:
+        store_id (int): The ID of the store to add the product to.
+        product_data (dict): A dictionary containing the product details;
+                             see validate_new_product for the accepted keys.
+
+    Returns:
+        dict: A dictionary representation of the newly created product.
+
+    Raises:
+        ValueError: If required fields are missing, data types are incorrect,
+                    or values are out of valid range (e.g., price <= 0).
+    """
+    # Default values for other fields like is_active, is_verified, etc.,
+    # will be handled by the model's defaults.
+    new_product = Product(store_id=store_id, **validate_new_product(product_data))
 
     db.session.add(new_product)
     db.session.commit()
+    refresh_product_indexes([new_product])
 
     # Return a dictionary representation of the new product
-    return {
-        "id": new_product.id,
-        "store_id": new_product.store_id,
-        "name": new_product.name,
-        "description": new_product.description,
-        "price": new_product.price,
-        "image_url": new_product.image_url,
-        "in_stock": new_product.in_stock, # Should be True by default or based on stock_quantity
-        "stock_quantity": new_product.stock_quantity,
-        "condition": new_product.condition,
-        "category_id": new_product.category_id,
-        "discount": new_product.discount,
-        "rating": new_product.rating,
-        "number_of_user_rating": new_product.number_of_user_rating,
-        "number_of_sales": new_product.number_of_sales,
-        "is_verified": new_product.is_verified,
-        "is_active": new_product.is_active,
-        "is_banned": new_product.is_banned,
-        "created_at": new_product.created_at.isoformat() if new_product.created_at else None,
-        "updated_at": new_product.updated_at.isoformat() if new_product.updated_at else None
-    }
+    return _serialize_product(new_product)
 
 def update_product_in_store(product_id, store_id, update_data):
     """
@@ -160,7 +476,7 @@ def update_product_in_store(product_id, store_id, update_data):
                 raise ValueError("Product name must be a non-empty string.")
             product.name = value
         elif key == 'price':
-            if not isinstance(value, (int, float)) or value <= 0:
+            if not _is_number(value) or value <= 0:
                 raise ValueError("Product price must be a number greater than 0.")
             product.price = value
         elif key == 'stock_quantity':
@@ -172,36 +488,102 @@ def update_product_in_store(product_id, store_id, update_data):
             if value not in valid_conditions:
                 raise ValueError(f"Invalid product condition. Must be one of: {', '.join(valid_conditions)}")
             product.condition = value
-        elif key in ['description', 'category_id', 'image_url', 'in_stock', 'discount', 'is_active']:
+        elif key in ['description', 'category_id', 'image_url', 'available_colors', 'available_sizes',
+                     'in_stock', 'discount', 'is_active']:
             # Assuming 'is_active' and 'in_stock' are booleans, 'category_id' and 'discount' are numbers.
             # More specific validation can be added here if needed.
             setattr(product, key, value)
         # Other fields like 'id', 'store_id', 'rating', 'number_of_user_rating', 'number_of_sales',
         # 'is_verified', 'is_banned', 'created_at', 'updated_at' are generally not updated directly by user.
 
+    bump_cart_versions_for_products([product_id])
     db.session.commit()
+    refresh_product_indexes([product])
 
-    return {
-        "id": product.id,
-        "store_id": product.store_id,
-        "name": product.name,
-        "description": product.description,
-        "price": product.price,
-        "image_url": product.image_url,
-        "in_stock": product.in_stock,
-        "stock_quantity": product.stock_quantity,
-        "condition": product.condition,
-        "category_id": product.category_id,
-        "discount": product.discount,
-        "rating": product.rating,
-        "number_of_user_rating": product.number_of_user_rating,
-        "number_of_sales": product.number_of_sales,
-        "is_verified": product.is_verified,
-        "is_active": product.is_active,
-        "is_banned": product.is_banned,
-        "created_at": product.created_at.isoformat() if product.created_at else None,
-        "updated_at": product.updated_at.isoformat() if product.updated_at else None
-    }
+    return _serialize_product(product)
+
+def _validate_bulk_changes(changes):
+    """Checks the shape and values of every change; returns (rows by product id, errors)."""
+    rows = {}
+    errors = []
+    seen_ids = set()
+    for position, change in enumerate(changes):
+        if not isinstance(change, dict):
+            errors.append({"index": position, "error": "Each change must be an object."})
+            continue
+        product_id = change.get('id')
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            errors.append({"index": position, "error": "Each change must have an integer id."})
+            continue
+        if product_id in seen_ids:
+            errors.append({"index": position, "id": product_id, "error": "Duplicate product id."})
+            continue
+        seen_ids.add(product_id)
+        fields = {key: value for key, value in change.items() if key != 'id'}
+        unknown = set(fields) - set(BULK_UPDATE_FIELDS)
+        if unknown:
+            errors.append({"index": position, "id": product_id,
+                           "error": f"Unsupported fields: {', '.join(sorted(unknown))}"})
+            continue
+        if not fields:
+            errors.append({"index": position, "id": product_id, "error": "No fields to update."})
+            continue
+        invalid = [BULK_UPDATE_FIELDS[key][1] for key, value in fields.items() if not BULK_UPDATE_FIELDS[key][0](value)]
+        if invalid:
+            errors.append({"index": position, "id": product_id, "error": invalid[0]})
+            continue
+        rows[product_id] = {"position": position, **fields}
+    return rows, errors
+
+def bulk_update_products(store_id, changes):
+    """
+    Updates the price, stock quantity, discount and/or stock status of many products of a store at once.
+
+    Every change is validated and every product's ownership is checked (with a single query)
+    before anything is written. If any change is invalid, nothing is updated. Otherwise all
+    changes are applied as batched UPDATEs by primary key in one transaction.
+
+    Args:
+        store_id (int): The ID of the store (for authorization).
+        changes (list): Dictionaries of the form {"id": int, "price": ..., "stock_quantity": ...,
+                        "discount": ..., "in_stock": ...}; every key besides "id" is optional.
+
+    Returns:
+        dict: {"updated": int, "errors": [{"index": int, "id": int, "error": str}, ...]}.
+              "updated" is 0 whenever "errors" is not empty.
+
+    Raises:
+        ValueError: If `changes` is not a non-empty list or holds more than MAX_BULK_CHANGES entries.
+    """
+    if not isinstance(changes, list) or not changes:
+        raise ValueError("Changes must be a non-empty list.")
+    if len(changes) > MAX_BULK_CHANGES:
+        raise ValueError(f"At most {MAX_BULK_CHANGES} changes can be applied at once.")
+
+    rows, errors = _validate_bulk_changes(changes)
+
+    owners = dict(db.session.query(Product.id, Product.store_id).filter(Product.id.in_(list(rows))).all()) if rows else {}
+    for product_id, row in rows.items():
+        if product_id not in owners:
+            errors.append({"index": row["position"], "id": product_id, "error": "Product not found"})
+        elif owners[product_id] != store_id:
+            errors.append({"index": row["position"], "id": product_id,
+                           "error": "You are not authorized to update this product"})
+    if errors:
+        errors.sort(key=lambda error: error["index"])
+        return {"updated": 0, "errors": errors}
+
+    # ORM bulk UPDATE by primary key: rows with the same set of keys are sent as one executemany
+    db.session.execute(
+        update(Product),
+        [{"id": product_id, **{key: value for key, value in row.items() if key != "position"}}
+         for product_id, row in rows.items()]
+    )
+    bump_cart_versions_for_products(rows)
+    db.session.commit()
+
+    refresh_product_indexes_by_ids(list(rows))
+    return {"updated": len(rows), "errors": []}
 
 def delete_product_from_store(product_id, store_id):
     """
@@ -222,5 +604,7 @@ def delete_product_from_store(product_id, store_id):
     if product.store_id != store_id:
         raise PermissionError("You are not authorized to delete this product")
 
+    bump_cart_versions_for_products([product_id]) # Before its cart lines are deleted with it
     db.session.delete(product)
     db.session.commit()
+    _drop_from_indexes(product_id)
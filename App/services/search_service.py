@@ -0,0 +1,310 @@
+# App/services/search_service.py
+"""Handles full-text product search.
+
+Products are indexed on name, description, available colors and category name.
+On SQLite the index is an FTS5 virtual table ranked with its built-in bm25(), created and
+initially loaded by a migration (b5e1f7c2a804); on other databases, or if the table does
+not exist, an in-process inverted index with the same BM25 ranking is used. The product
+service keeps either index up to date as products are added, updated or deleted.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from heapq import nlargest
+from sqlalchemy import text
+from application.extensions import db
+from DataBase.models import Product, Category, SearchQuery
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Upper bound on how many vocabulary terms a trailing prefix may expand to
+MAX_PREFIX_EXPANSION = 50
+
+FTS_TABLE = 'product_fts'
+# Relative bm25() weight of each indexed column, in FTS_COLUMNS order
+FTS_COLUMNS = ('name', 'description', 'available_colors', 'category')
+FTS_WEIGHTS = (10.0, 1.0, 2.0, 4.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def tokenize(value):
+    """Splits text into lowercase word tokens."""
+    if not value:
+        return []
+    return _TOKEN_RE.findall(value.lower())
+
+
+def _is_searchable(product):
+    """Only products visible in the public catalog are indexed."""
+    return bool(product.is_active) and not product.is_banned
+
+
+def _document_fields(product):
+    """Returns the indexed text of a product, in FTS_COLUMNS order."""
+    return (
+        product.name or '',
+        product.description or '',
+        product.available_colors or '',
+        product.category.name if product.category else '',
+    )
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index with Okapi BM25 ranking.
+
+    Postings map each term to {product_id: weighted term frequency}; column weights
+    are folded into the term frequency so a match in the name counts more than one
+    in the description. A sorted copy of the vocabulary answers prefix lookups with
+    a binary search. All public methods are thread-safe.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, weights=FTS_WEIGHTS):
+        self._weights = weights
+        self._postings = defaultdict(dict)
+        self._vocabulary = []
+        self._doc_terms = {}
+        self._doc_len = {}
+        self._total_len = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add(self, doc_id, fields):
+        """Indexes (or re-indexes) a document given its field texts."""
+        term_freqs = defaultdict(float)
+        for weight, value in zip(self._weights, fields):
+            for token in tokenize(value):
+                term_freqs[token] += weight
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, freq in term_freqs.items():
+                if term not in self._postings:
+                    insort(self._vocabulary, term)
+                self._postings[term][doc_id] = freq
+            self._doc_terms[doc_id] = tuple(term_freqs)
+            length = sum(term_freqs.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+
+    def remove(self, doc_id):
+        """Removes a document from the index; a no-op if it is not indexed."""
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        self._total_len -= self._doc_len.pop(doc_id)
+
+    def search(self, query, limit):
+        """
+        Returns up to `limit` (doc_id, score) pairs, best first. Every query term must
+        match (AND semantics); the last term also matches as a prefix to support
+        search-as-you-type.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs
+            term_postings = [self._postings.get(term, {}) for term in terms[:-1]]
+            term_postings.append(self._prefix_postings(terms[-1]))
+            if not all(term_postings):
+                return []
+            # Walk the shortest posting list first so the candidate set starts small
+            term_postings.sort(key=len)
+            candidates = set(term_postings[0])
+            for postings in term_postings[1:]:
+                candidates.intersection_update(postings)
+                if not candidates:
+                    return []
+
+            k1, b, doc_len = self.k1, self.b, self._doc_len
+            norms = {doc_id: k1 * (1 - b + b * doc_len[doc_id] / avg_len) for doc_id in candidates}
+            scores = dict.fromkeys(candidates, 0.0)
+            for postings in term_postings:
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5)) * (k1 + 1)
+                for doc_id, norm in norms.items():
+                    freq = postings[doc_id]
+                    scores[doc_id] += idf * freq / (freq + norm)
+        return nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def _prefix_postings(self, prefix):
+        """Merges the postings of every indexed term starting with `prefix`."""
+        exact = self._postings.get(prefix)
+        if len(prefix) < 3:
+            # Short prefixes would match a large part of the vocabulary; only match exactly
+            return exact or {}
+        merged = dict(exact or {})
+        start = bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(prefix):
+                break
+            if term != prefix:
+                for doc_id, freq in self._postings[term].items():
+                    if freq > merged.get(doc_id, 0.0):
+                        merged[doc_id] = freq
+        return merged
+
+
+class _FTS5Backend:
+    """Search backend storing the index in the SQLite FTS5 virtual table FTS_TABLE (rowid = product id)."""
+
+    def index(self, products):
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": product.id} for product in products])
+        documents = [
+            {"id": product.id, **dict(zip(FTS_COLUMNS, _document_fields(product)))}
+            for product in products if _is_searchable(product)
+        ]
+        if documents:
+            db.session.execute(
+                text(f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+                     f"VALUES (:id, {', '.join(':' + column for column in FTS_COLUMNS)})"),
+                documents
+            )
+        db.session.commit()
+
+    def remove(self, product_id):
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": product_id})
+        db.session.commit()
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Quote every token so user input can never be parsed as FTS5 query syntax;
+        # the last token is a prefix query to support search-as-you-type.
+        match = ' '.join(f'"{term}"' for term in terms[:-1])
+        match = f'{match} "{terms[-1]}"*'.strip()
+        rows = db.session.execute(
+            text(f"SELECT rowid, bm25({FTS_TABLE}, {', '.join(map(str, FTS_WEIGHTS))}) AS rank "
+                 f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match ORDER BY rank LIMIT :limit"),
+            {"match": match, "limit": limit}
+        ).all()
+        # bm25() is lower-is-better; flip the sign so higher scores mean better matches
+        return [(row.rowid, -row.rank) for row in rows]
+
+
+class _InMemoryBackend:
+    """Search backend holding an InvertedIndex in this process, loaded from the database on first use."""
+
+    def __init__(self):
+        self._index = InvertedIndex()
+        query = (
+            db.session.query(Product.id, Product.name, Product.description, Product.available_colors, Category.name)
+            .outerjoin(Category, Category.id == Product.category_id)
+            .filter(Product.is_active.is_(True), Product.is_banned.is_(False))
+            .execution_options(yield_per=5000)
+        )
+        for product_id, name, description, colors, category in query:
+            self._index.add(product_id, (name or '', description or '', colors or '', category or ''))
+
+    def index(self, products):
+        for product in products:
+            if _is_searchable(product):
+                self._index.add(product.id, _document_fields(product))
+            else:
+                self._index.remove(product.id)
+
+    def remove(self, product_id):
+        self._index.remove(product_id)
+
+    def search(self, query, limit):
+        return self._index.search(query, limit)
+
+
+def _fts_table_exists():
+    """Checks whether the connected database is SQLite with the FTS_TABLE created by the migrations."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).first() is not None
+
+
+def _get_backend():
+    """Returns the search backend, creating (and for the in-memory one, loading) it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _FTS5Backend() if _fts_table_exists() else _InMemoryBackend()
+    return _backend
+
+
+def index_products(products):
+    """
+    Adds or refreshes products in the search index, in one transaction. Products that
+    are inactive or banned are removed instead, so search only ever returns
+    catalog-visible products. Called by the product service after products are
+    created or updated.
+    """
+    if products:
+        _get_backend().index(products)
+
+
+def remove_product(product_id):
+    """Removes a product from the search index. Called by the product service after a delete."""
+    _get_backend().remove(product_id)
+
+
+def search_products(query, limit=DEFAULT_SEARCH_LIMIT, user_id=None, fields=None):
+    """
+    Searches the catalog for products matching every word of `query`, best match first.
+
+    Args:
+        query (str): The user's search text.
+        limit (int): Maximum number of results, capped at MAX_SEARCH_LIMIT.
+        user_id (int, optional): When given, the search is recorded as a SearchQuery.
+        fields (tuple, optional): Sparse fieldset for the product dictionaries; None for every field.
+
+    Returns:
+        dict: {"query": str, "items": [...]} where each item is a product dictionary
+              with an added "score" (higher is more relevant).
+
+    Raises:
+        ValueError: If the query is empty or the limit is invalid.
+    """
+    from services.product_service import get_products_by_ids # Imported here to avoid a circular import
+
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("Search query must be a non-empty string.")
+    if not isinstance(limit, int) or limit <= 0:
+        raise ValueError("Limit must be a positive integer.")
+    query = query.strip()[:255] # SearchQuery.query is a String(255)
+    limit = min(limit, MAX_SEARCH_LIMIT)
+
+    ranked = _get_backend().search(query, limit)
+
+    scores = dict(ranked)
+    items = [
+        {**product, "score": round(scores[product["id"]], 4)}
+        for product in get_products_by_ids([doc_id for doc_id, _ in ranked], fields)
+    ]
+
+    if user_id is not None:
+        db.session.add(SearchQuery(user_id=user_id, query=query, result_count=len(items)))
+        db.session.commit()
+
+    return {"query": query, "items": items}
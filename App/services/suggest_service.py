@@ -0,0 +1,180 @@
+# App/services/suggest_service.py
+"""Handles search-as-you-type suggestions.
+
+Suggestions come from product names, category names and the most frequent past
+searches (SearchQuery) that found products, each weighted by popularity. They are held in an immutable
+sorted-array snapshot: a prefix lookup is a binary search, and the top completions
+for every 1-3 character prefix are precomputed since those ranges are the widest.
+The snapshot is rebuilt periodically on a background thread and swapped in
+atomically, so requests never wait for a rebuild.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from heapq import nlargest
+from flask import current_app
+from sqlalchemy import func
+from application.extensions import db
+from DataBase.models import Product, Category, SearchQuery
+
+DEFAULT_SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+# Prefixes up to this length get their completions precomputed at build time
+PRECOMPUTED_PREFIX_LENGTH = 3
+# How many past distinct search queries are considered
+SEARCH_HISTORY_TERMS = 10000
+# Relative weight of one past search compared to one product sale / listing
+SEARCH_QUERY_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.0
+
+_snapshot = None
+_rebuild_lock = threading.Lock()
+_rebuilding = False
+
+
+class SuggestionIndex:
+    """
+    Immutable prefix index over weighted terms.
+
+    `terms` is sorted and lowercased; `texts` and `weights` are parallel arrays holding
+    the display text and popularity of each term.
+    """
+
+    def __init__(self, weighted_terms, max_terms):
+        # Keep only the most popular terms so memory stays bounded
+        top = nlargest(max_terms, weighted_terms.items(), key=lambda item: item[1][1])
+        top.sort(key=lambda item: item[0])
+        self.terms = [term for term, _ in top]
+        self.texts = [text for _, (text, _) in top]
+        self.weights = [weight for _, (_, weight) in top]
+        self.built_at = time.monotonic()
+
+        buckets = defaultdict(list)
+        for position, term in enumerate(self.terms):
+            for length in range(1, min(len(term), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                buckets[term[:length]].append(position)
+        self._precomputed = {
+            prefix: [self._entry(position) for position in nlargest(MAX_SUGGEST_LIMIT, positions, key=self.weights.__getitem__)]
+            for prefix, positions in buckets.items()
+        }
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _entry(self, position):
+        return {"text": self.texts[position], "weight": self.weights[position]}
+
+    def complete(self, prefix, limit):
+        """Returns up to `limit` completions of `prefix`, most popular first."""
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self._precomputed.get(prefix, [])[:limit]
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + '\uffff', start)
+        positions = nlargest(limit, range(start, end), key=self.weights.__getitem__)
+        return [self._entry(position) for position in positions]
+
+
+def _normalize(value):
+    return ' '.join(value.lower().split())
+
+
+def build_index():
+    """
+    Builds a SuggestionIndex from the database.
+
+    Product names are weighted by listing count plus units sold, categories by
+    their number of products, and past searches by how often they were made. Only
+    searches that found products are used, so frequent typos are never suggested.
+    """
+    weighted = {}
+
+    def add(value, weight):
+        term = _normalize(value or '')
+        if not term:
+            return
+        text, current = weighted.get(term, (value.strip(), 0.0))
+        weighted[term] = (text, current + weight)
+
+    product_rows = (
+        db.session.query(Product.name, func.count(Product.id), func.coalesce(func.sum(Product.number_of_sales), 0))
+        .filter(Product.is_active.is_(True), Product.is_banned.is_(False))
+        .group_by(Product.name)
+        .execution_options(yield_per=5000)
+    )
+    for name, listings, sales in product_rows:
+        add(name, listings + sales)
+
+    category_rows = (
+        db.session.query(Category.name, func.count(Product.id))
+        .outerjoin(Product, Product.category_id == Category.id)
+        .group_by(Category.id, Category.name)
+    )
+    for name, products in category_rows:
+        add(name, CATEGORY_WEIGHT * max(products, 1))
+
+    query_text = func.lower(SearchQuery.query)
+    search_rows = (
+        db.session.query(query_text, func.count(SearchQuery.id).label('searches'))
+        .filter(SearchQuery.result_count > 0)
+        .group_by(query_text)
+        .order_by(func.count(SearchQuery.id).desc())
+        .limit(SEARCH_HISTORY_TERMS)
+    )
+    for query, searches in search_rows:
+        add(query, SEARCH_QUERY_WEIGHT * searches)
+
+    return SuggestionIndex(weighted, current_app.config['SUGGEST_MAX_TERMS'])
+
+
+def _rebuild_in_background(app):
+    """Rebuilds the suggestion index in a worker thread and swaps it in when done."""
+    global _rebuilding
+
+    def run():
+        global _snapshot, _rebuilding
+        try:
+            with app.app_context():
+                _snapshot = build_index()
+        except Exception as e:
+            print(f"Error rebuilding suggestion index: {str(e)}") # Log for server
+        finally:
+            _rebuilding = False
+
+    with _rebuild_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+    threading.Thread(target=run, name='suggest-index-rebuild', daemon=True).start()
+
+
+def get_suggestions(prefix, limit=DEFAULT_SUGGEST_LIMIT):
+    """
+    Returns popular completions for a partially typed search.
+
+    Never blocks on the database: answers come from the current in-memory snapshot,
+    and a rebuild is started in the background when the snapshot is missing or older
+    than SUGGEST_REBUILD_SECONDS. Until the first build finishes, no suggestions are returned.
+
+    Args:
+        prefix (str): What the user has typed so far.
+        limit (int): Maximum number of suggestions, capped at MAX_SUGGEST_LIMIT.
+
+    Returns:
+        dict: {"query": str, "suggestions": [{"text": str, "weight": float}, ...]}.
+
+    Raises:
+        ValueError: If the limit is invalid.
+    """
+    if not isinstance(limit, int) or limit <= 0:
+        raise ValueError("Limit must be a positive integer.")
+    limit = min(limit, MAX_SUGGEST_LIMIT)
+
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.built_at > current_app.config['SUGGEST_REBUILD_SECONDS']:
+        _rebuild_in_background(current_app._get_current_object())
+
+    prefix = _normalize(prefix or '')
+    if not prefix or snapshot is None:
+        return {"query": prefix, "suggestions": []}
+    return {"query": prefix, "suggestions": snapshot.complete(prefix, limit)}
@@ -0,0 +1,68 @@
+# App/tests/test_cart_queries.py
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from application.extensions import db
+from DataBase.models import Cart, Category, Product, Store, User
+from services.cart_service import get_cart
+
+
+@contextmanager
+def count_queries():
+    """Counts the SQL statements executed on the app's engine inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _cart_with_lines(count):
+    seller = User(full_name='Seller', username='seller', email='seller@example.com', password='x', is_seller=True)
+    buyer = User(full_name='Buyer', username='buyer', email='buyer@example.com', password='x')
+    db.session.add_all([seller, buyer])
+    db.session.flush()
+    store = Store(name='Shop', storeUsername='shop', location='Mogadishu', owner_id=seller.id)
+    category = Category(name='Phones')
+    db.session.add_all([store, category])
+    db.session.flush()
+    products = [
+        Product(name=f'Phone {i}', price=10 + i, condition='New', stock_quantity=5,
+                category_id=category.id, store_id=store.id)
+        for i in range(count)
+    ]
+    db.session.add_all(products)
+    db.session.flush()
+    db.session.add_all(Cart(user_id=buyer.id, product_id=product.id, quantity=1) for product in products)
+    db.session.commit()
+    return buyer.id
+
+
+def test_get_cart_query_count_does_not_grow_with_lines(app):
+    user_id = _cart_with_lines(100)
+    db.session.expire_all()
+
+    with count_queries() as statements:
+        cart = get_cart(user_id)
+
+    assert len(cart['items']) == 100
+    # One read of the cart version and one joined read of the lines
+    assert len(statements) == 2, statements
+
+
+def test_get_cart_unchanged_is_a_single_query(app):
+    user_id = _cart_with_lines(100)
+    version = get_cart(user_id)['cart_version']
+    db.session.expire_all()
+
+    with count_queries() as statements:
+        cart = get_cart(user_id, since_version=version)
+
+    assert cart['unchanged'] is True
+    assert len(statements) == 1, statements
@@ -0,0 +1,55 @@
+"""Account status shared by the worker processes of a machine, for session checks.
+
+A local SQLite file maps a user id to the (security_version, is_banned, is_deleted) the
+user had when their sessions were last revoked, their ban changed or their account was
+deleted. Only users with such an event have a row, so the table stays small, and a
+lookup is one primary-key read of a file in the page cache rather than a database query.
+Rows are written after the change is committed, so they never run ahead of the database.
+"""
+import os
+import sqlite3
+import threading
+
+
+class AccountStatusStore:
+    """user_id -> (security_version, is_banned, is_deleted), shared by every process that opens the same path."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS account_status ("
+            "user_id INTEGER PRIMARY KEY, security_version INTEGER NOT NULL, "
+            "is_banned INTEGER NOT NULL, is_deleted INTEGER NOT NULL)"
+        )
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers in other processes proceed during writes."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM account_status").fetchone()[0]
+
+    def get(self, user_id):
+        """Returns (security_version, is_banned, is_deleted) of a user, or None if none was recorded."""
+        row = self._connection().execute(
+            "SELECT security_version, is_banned, is_deleted FROM account_status WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return (row[0], bool(row[1]), bool(row[2])) if row else None
+
+    def set(self, user_id, security_version, is_banned, is_deleted):
+        """Records a user's committed status; the security version never moves back."""
+        self._connection().execute(
+            "INSERT INTO account_status (user_id, security_version, is_banned, is_deleted) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET "
+            "security_version = MAX(security_version, excluded.security_version), "
+            "is_banned = excluded.is_banned, is_deleted = excluded.is_deleted",
+            (user_id, security_version, int(bool(is_banned)), int(bool(is_deleted)))
+        )
@@ -0,0 +1,195 @@
+"""Content-addressed storage for uploaded files (profile images, store logos and banners).
+
+A blob is stored once under the SHA-256 of its bytes, so identical uploads share one
+file and a key never changes meaning. Keys look like "<sha256 hex>.<ext>", the
+extension being detected from the file's signature so the blob can be served with
+the right content type. Files live in two levels of shard directories
+(ab/cd/abcd....jpg) and are written to a temporary file first, then renamed into
+place, so a reader never sees a partial blob.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from flask import current_app, url_for
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+# File signatures (magic bytes) of the formats accepted for images
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bin": "application/octet-stream",
+}
+_CHUNK_SIZE = 1024 * 1024
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def detect_extension(head):
+    """Returns the file extension matching the leading bytes of a file, 'bin' if unknown."""
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return "bin"
+
+
+def blob_key(data):
+    """The key `data` (bytes) is stored under."""
+    return f"{hashlib.sha256(data).hexdigest()}.{detect_extension(data[:16])}"
+
+
+def is_valid_key(key):
+    return isinstance(key, str) and bool(_KEY_RE.match(key))
+
+
+def content_type(key):
+    """The MIME type of the blob stored under `key`."""
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], CONTENT_TYPES["bin"])
+
+
+def media_url(key):
+    """The URL the blob stored under `key` is served from, or None when there is no blob."""
+    if not key:
+        return None
+    return url_for("media.get_media", key=key)
+
+
+class BlobStore:
+    """
+    A directory of immutable, deduplicated blobs.
+
+    Args:
+        root (str): Directory holding the blobs; created if missing.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path(self, key):
+        """
+        Absolute path of the blob stored under `key`.
+
+        Raises:
+            ValueError: If `key` is not a well-formed blob key.
+        """
+        if not is_valid_key(key):
+            raise ValueError("Invalid blob key.")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def exists(self, key):
+        return is_valid_key(key) and os.path.exists(self.path(key))
+
+    def put(self, data):
+        """Stores `data` (bytes) and returns its key; storing the same bytes twice is a no-op."""
+        key = blob_key(data)
+        if not os.path.exists(self.path(key)):
+            self._write(key, lambda handle: handle.write(data))
+        return key
+
+    def put_file(self, source):
+        """
+        Stores the contents of a readable binary file object and returns its key.
+        The file is copied in chunks while it is hashed, so it is never held in memory whole.
+        """
+        key, tmp_path = self.stage_file(source)
+        self.commit_staged(key, tmp_path)
+        return key
+
+    def stage_file(self, source):
+        """
+        Copies a readable binary file object to a temporary file inside the store, hashing it
+        on the way, without storing it yet. The caller must pass the result to `commit_staged`
+        (to store it) or `discard_staged`.
+
+        Returns:
+            tuple: (key the file would be stored under, path of the temporary file)
+        """
+        hasher = hashlib.sha256()
+        head = b""
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                while True:
+                    chunk = source.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    hasher.update(chunk)
+                    handle.write(chunk)
+        except BaseException:
+            self.discard_staged(tmp_path)
+            raise
+        return f"{hasher.hexdigest()}.{detect_extension(head)}", tmp_path
+
+    def commit_staged(self, key, tmp_path):
+        """Stores a file staged with `stage_file` under its key."""
+        try:
+            self._move_into_place(tmp_path, key)
+        except BaseException:
+            self.discard_staged(tmp_path)
+            raise
+
+    def discard_staged(self, tmp_path):
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    def _write(self, key, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                write(handle)
+            self._move_into_place(tmp_path, key)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _move_into_place(self, tmp_path, key):
+        target = self.path(key)
+        if os.path.exists(target):
+            # Already stored by an earlier (or concurrent) upload of the same bytes
+            os.unlink(tmp_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+
+    def read(self, key):
+        """Returns the bytes of a blob, or None if it does not exist."""
+        try:
+            with open(self.path(key), "rb") as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        """Removes a blob; a no-op if it does not exist. Callers must make sure no row still references it."""
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+def get_blob_store():
+    """Returns the application's blob store, rooted at the BLOB_STORE_PATH setting."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobStore(current_app.config["BLOB_STORE_PATH"])
+    return _store
@@ -0,0 +1,340 @@
+"""Small key/value caches with TTL expiry, bounded size and hit/miss statistics.
+
+LRUCache lives in the current process. SQLiteCache keeps entries in a local SQLite
+file so every worker process on the machine shares them; it exposes the same methods.
+
+Read-through callers guard against caching stale data: they read `generation()` before
+loading from the database and pass it to `set_many`, which skips every key deleted
+since then, so a load racing with an invalidation never re-caches the old value.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Keys per SQL statement, below SQLite's limit on bound parameters
+SQLITE_CHUNK_SIZE = 500
+# Deleted keys remembered for write guards; writes with an older generation are skipped
+MAX_TOMBSTONES = 10000
+TOMBSTONE_SECONDS = 300
+
+
+class _CacheStats:
+    """Hit/miss/eviction counters shared by the cache backends."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self, size, max_entries, backend):
+        lookups = self.hits + self.misses
+        return {
+            "backend": backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": size,
+            "max_entries": max_entries,
+        }
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache. Entries expire `ttl_seconds` after being set,
+    and the least recently used entry is evicted once `max_entries` is reached.
+    `on_evict(mapping)`, if given, receives the {key: value} entries evicted for size
+    (e.g. to spill them to a SQLiteCache); it is called outside the cache's lock.
+    Deletes record the generation of each deleted key (at most MAX_TOMBSTONES; writes
+    older than a forgotten one are skipped altogether).
+    """
+
+    def __init__(self, max_entries, ttl_seconds, on_evict=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._stats = _CacheStats()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._tombstones = OrderedDict()
+        self._tombstone_floor = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Returns {key: value} for the keys that are cached and not expired."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+                    self._stats.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    self._stats.misses += 1
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def generation(self):
+        """The current invalidation generation, to pass to `set_many` by read-through loads."""
+        with self._lock:
+            return self._generation
+
+    def set_many(self, mapping, generation=None):
+        """Caches the entries; with `generation`, skips the keys deleted since it was read."""
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds
+        evicted = {}
+        with self._lock:
+            if generation is not None and generation < self._tombstone_floor:
+                return
+            for key, value in mapping.items():
+                if generation is not None and self._tombstones.get(key, 0) > generation:
+                    continue
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                key, (entry_expires_at, value) = self._entries.popitem(last=False)
+                self._stats.evictions += 1
+                if entry_expires_at > now:
+                    evicted[key] = value
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                self._tombstones[key] = self._generation
+                self._tombstones.move_to_end(key)
+            while len(self._tombstones) > MAX_TOMBSTONES:
+                _, forgotten = self._tombstones.popitem(last=False)
+                self._tombstone_floor = max(self._tombstone_floor, forgotten)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tombstones.clear()
+            self._tombstone_floor = self._generation
+
+    def stats(self):
+        with self._lock:
+            return self._stats.as_dict(len(self._entries), self.max_entries, 'memory')
+
+
+class SQLiteCache:
+    """
+    Cache stored in a local SQLite file, shared by every process that opens the same path.
+
+    Values must be JSON-serializable. Expired entries are ignored on read and purged,
+    together with the least recently used entries beyond `max_entries`, every
+    `prune_every` writes. Hit/miss statistics are counted per process. The generation
+    and the deleted keys' tombstones (kept TOMBSTONE_SECONDS) are stored in the file too,
+    so an invalidation in one process guards the writes of all of them.
+    """
+
+    def __init__(self, path, max_entries, ttl_seconds, prune_every=500):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+        self._writes = 0
+        self._stats = _CacheStats()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed_at ON cache_entry (accessed_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_tombstone ("
+                "key TEXT PRIMARY KEY, generation INTEGER NOT NULL, deleted_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_generation ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL, floor INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO cache_generation (id, value, floor) VALUES (1, 0, 0)")
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers in other processes proceed during writes."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        keys = [str(key) for key in keys]
+        if not keys:
+            return {}
+        now = time.time()
+        conn = self._connection()
+        found = {}
+        for chunk in _chunks(keys):
+            rows = conn.execute(
+                f"SELECT key, value FROM cache_entry WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, now)
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        for chunk in _chunks(list(found)):
+            conn.execute(f"UPDATE cache_entry SET accessed_at = ? WHERE key IN ({','.join('?' * len(chunk))})", (now, *chunk))
+        with self._lock:
+            self._stats.hits += len(found)
+            self._stats.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def generation(self):
+        """The current invalidation generation, to pass to `set_many` by read-through loads."""
+        return self._connection().execute("SELECT value FROM cache_generation WHERE id = 1").fetchone()[0]
+
+    def set_many(self, mapping, generation=None):
+        """Caches the entries; with `generation`, skips the keys deleted since it was read."""
+        if not mapping:
+            return
+        now = time.time()
+        conn = self._connection()
+        rows = [(str(key), json.dumps(value), now + self.ttl_seconds, now) for key, value in mapping.items()]
+        if generation is None:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)", rows
+            )
+        else:
+            # The check and the write are one statement, so a concurrent delete is either seen or runs after it
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires_at, accessed_at) SELECT ?1, ?2, ?3, ?4 "
+                "WHERE (SELECT floor FROM cache_generation WHERE id = 1) <= ?5 "
+                "AND NOT EXISTS (SELECT 1 FROM cache_tombstone WHERE key = ?1 AND generation > ?5)",
+                [(*row, generation) for row in rows]
+            )
+        with self._lock:
+            self._writes += len(mapping)
+            prune = self._writes >= self.prune_every
+            if prune:
+                self._writes = 0
+        if prune:
+            self._prune(conn, now)
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (now,))
+        evicted = conn.execute(
+            "DELETE FROM cache_entry WHERE key IN ("
+            "SELECT key FROM cache_entry ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        with self._lock:
+            self._stats.evictions += max(evicted, 0)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE cache_generation SET floor = MAX(floor, COALESCE("
+                "(SELECT MAX(generation) FROM cache_tombstone WHERE deleted_at <= ?), 0)) WHERE id = 1",
+                (now - TOMBSTONE_SECONDS,)
+            )
+            conn.execute("DELETE FROM cache_tombstone WHERE deleted_at <= ?", (now - TOMBSTONE_SECONDS,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        keys = [str(key) for key in keys]
+        if not keys:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE cache_generation SET value = value + 1 WHERE id = 1")
+            generation = conn.execute("SELECT value FROM cache_generation WHERE id = 1").fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_tombstone (key, generation, deleted_at) VALUES (?, ?, ?)",
+                [(key, generation, now) for key in keys]
+            )
+            for chunk in _chunks(keys):
+                conn.execute(f"DELETE FROM cache_entry WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE cache_generation SET value = value + 1, floor = value + 1 WHERE id = 1")
+            conn.execute("DELETE FROM cache_tombstone")
+            conn.execute("DELETE FROM cache_entry")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self):
+        size = len(self)
+        with self._lock:
+            return self._stats.as_dict(size, self.max_entries, 'sqlite')
+
+
+def _chunks(keys):
+    """Splits keys into lists of at most SQLITE_CHUNK_SIZE."""
+    return [keys[start:start + SQLITE_CHUNK_SIZE] for start in range(0, len(keys), SQLITE_CHUNK_SIZE)]
+
+
+def create_cache(backend, max_entries, ttl_seconds, path=None):
+    """
+    Creates a cache for the configured backend name.
+
+    Args:
+        backend (str): 'memory' for a per-process LRUCache or 'sqlite' for a SQLiteCache shared across workers.
+        max_entries (int): Size bound of the cache.
+        ttl_seconds (float): Lifetime of an entry.
+        path (str, optional): Database file of the 'sqlite' backend.
+
+    Raises:
+        ValueError: If the backend name is unknown or 'sqlite' is used without a path.
+    """
+    if backend == 'memory':
+        return LRUCache(max_entries, ttl_seconds)
+    if backend == 'sqlite':
+        if not path:
+            raise ValueError("The sqlite cache backend requires a path.")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteCache(path, max_entries, ttl_seconds)
+    raise ValueError(f"Unknown cache backend: {backend}")
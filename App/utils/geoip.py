@@ -0,0 +1,214 @@
+"""Offline IP geolocation (country and city) from a local IP-range database.
+
+The database is a binary file of sorted, non-overlapping IP ranges, each pointing to a
+(country, city) location. It is memory-mapped, so it is shared between worker processes
+and only the pages a lookup touches are read, and a lookup is a binary search over the
+ranges of the address family. Resolved addresses are kept in an LRU cache in front of it.
+
+The file is produced from a CSV of IP ranges (by default laid out like the free DB-IP
+"IP to City Lite" export: start, end, continent, country, region, city, ...):
+
+    python -m utils.geoip dbip-city-lite.csv instance/geoip.bin
+
+File layout (big-endian):
+    header:     magic (8 bytes), IPv4 range count, IPv6 range count, location count (uint32 each)
+    IPv4:       start, end, location index (uint32 each) per range, sorted by start
+    IPv6:       start, end (16 bytes each), location index (uint32) per range, sorted by start
+    locations:  location count + 1 string offsets (uint32), then the UTF-8 "country<TAB>city" strings
+"""
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import sys
+import threading
+from flask import current_app
+from utils.cache import LRUCache
+
+MAGIC = b"TKNGEO01"
+_HEADER = struct.Struct(">8sIII")
+_IPV4_RANGE = struct.Struct(">III")
+_IPV6_RANGE = struct.Struct(">16s16sI")
+_OFFSET = struct.Struct(">I")
+_NOT_FOUND = ()  # Cached for addresses outside every range, as None means a cache miss
+
+_geoip = None
+_geoip_lock = threading.Lock()
+
+
+class GeoIPDatabase:
+    """
+    Read-only view of a GeoIP database file.
+
+    Args:
+        path (str): The database file, see the module docstring.
+        cache_entries (int): Maximum number of resolved addresses kept in the LRU cache.
+        cache_ttl (int): Seconds a resolved address is kept.
+
+    Raises:
+        ValueError: If the file is not a GeoIP database.
+    """
+
+    def __init__(self, path, cache_entries=10000, cache_ttl=86400):
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._data) < _HEADER.size:
+            raise ValueError(f"Not a GeoIP database: {path}")
+        magic, self._ipv4_count, self._ipv6_count, self._location_count = _HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a GeoIP database: {path}")
+        self._ipv4_offset = _HEADER.size
+        self._ipv6_offset = self._ipv4_offset + self._ipv4_count * _IPV4_RANGE.size
+        self._locations_offset = self._ipv6_offset + self._ipv6_count * _IPV6_RANGE.size
+        self._strings_offset = self._locations_offset + (self._location_count + 1) * _OFFSET.size
+        self._cache = LRUCache(cache_entries, cache_ttl)
+
+    def _search(self, value, offset, count, record):
+        """Location index of the range containing `value`, or None."""
+        low, high = 0, count
+        # Find the last range starting at or before `value`
+        while low < high:
+            middle = (low + high) // 2
+            if record.unpack_from(self._data, offset + middle * record.size)[0] <= value:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        start, end, location = record.unpack_from(self._data, offset + (low - 1) * record.size)
+        return location if value <= end else None
+
+    def _location(self, index):
+        start, end = struct.unpack_from(">II", self._data, self._locations_offset + index * _OFFSET.size)
+        country, city = self._data[self._strings_offset + start:self._strings_offset + end].decode("utf-8").split("\t")
+        return {"country": country or None, "city": city or None}
+
+    def lookup(self, ip):
+        """
+        Resolves an IP address.
+
+        Args:
+            ip (str): An IPv4 or IPv6 address.
+
+        Returns:
+            dict: {"country": str, "city": str} (either may be None), or None if the
+                  address is invalid or in no range of the database.
+        """
+        location = self._cache.get(ip)
+        if location is None:
+            location = self._resolve(ip) or _NOT_FOUND
+            self._cache.set(ip, location)
+        return location or None
+
+    def _resolve(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if address.version == 4:
+            index = self._search(int(address), self._ipv4_offset, self._ipv4_count, _IPV4_RANGE)
+        else:
+            index = self._search(address.packed, self._ipv6_offset, self._ipv6_count, _IPV6_RANGE)
+        return self._location(index) if index is not None else None
+
+    def stats(self):
+        """Range counts of the database and hit/miss metrics of its cache."""
+        return {
+            "ipv4_ranges": self._ipv4_count,
+            "ipv6_ranges": self._ipv6_count,
+            "locations": self._location_count,
+            "cache": self._cache.stats(),
+        }
+
+
+def build_database(ranges, output_path):
+    """
+    Writes a GeoIP database file.
+
+    Args:
+        ranges (iterable): (start IP, end IP, country, city) tuples; ranges of the same
+                           address family must not overlap.
+        output_path (str): The file to write; it is replaced atomically.
+
+    Returns:
+        tuple: (number of IPv4 ranges, number of IPv6 ranges)
+
+    Raises:
+        ValueError: If an address is invalid, a range is reversed or ranges overlap.
+    """
+    locations = {}
+    ipv4, ipv6 = [], []
+    for start, end, country, city in ranges:
+        start, end = ipaddress.ip_address(start.strip()), ipaddress.ip_address(end.strip())
+        if start.version != end.version or start > end:
+            raise ValueError(f"Invalid range: {start} - {end}")
+        key = ((country or "").strip().replace("\t", " "), (city or "").strip().replace("\t", " "))
+        location = locations.setdefault(key, len(locations))
+        (ipv4 if start.version == 4 else ipv6).append((start, end, location))
+
+    for family in (ipv4, ipv6):
+        family.sort()
+        for previous, current in zip(family, family[1:]):
+            if current[0] <= previous[1]:
+                raise ValueError(f"Overlapping ranges: {previous[0]} - {previous[1]} and {current[0]} - {current[1]}")
+
+    strings = [f"{country}\t{city}".encode("utf-8") for country, city in locations]
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, len(ipv4), len(ipv6), len(locations)))
+        for start, end, location in ipv4:
+            file.write(_IPV4_RANGE.pack(int(start), int(end), location))
+        for start, end, location in ipv6:
+            file.write(_IPV6_RANGE.pack(start.packed, end.packed, location))
+        offset = 0
+        for string in strings:
+            file.write(_OFFSET.pack(offset))
+            offset += len(string)
+        file.write(_OFFSET.pack(offset))
+        for string in strings:
+            file.write(string)
+    os.replace(tmp_path, output_path)
+    return len(ipv4), len(ipv6)
+
+
+def build_database_from_csv(csv_path, output_path, country_column=3, city_column=5):
+    """Builds a GeoIP database from a CSV of IP ranges (start and end IP in the first two columns)."""
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        rows = (
+            (row[0], row[1], row[country_column], row[city_column])
+            for row in csv.reader(file) if row and not row[0].startswith("#")
+        )
+        return build_database(rows, output_path)
+
+
+def get_geoip():
+    """
+    Returns the application's GeoIP database, opening GEOIP_DATABASE_PATH on first use,
+    or None if the file does not exist.
+    """
+    global _geoip
+    if _geoip is None:
+        with _geoip_lock:
+            if _geoip is None:
+                config = current_app.config
+                path = config['GEOIP_DATABASE_PATH']
+                if not os.path.exists(path):
+                    return None
+                _geoip = GeoIPDatabase(path, config['GEOIP_CACHE_MAX_ENTRIES'], config['GEOIP_CACHE_TTL'])
+    return _geoip
+
+
+def lookup_ip(ip):
+    """Resolves an IP address with the application's GeoIP database; see GeoIPDatabase.lookup."""
+    geoip = get_geoip()
+    return geoip.lookup(ip) if geoip is not None else None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python -m utils.geoip <ranges.csv> <output.bin>")
+    ipv4_count, ipv6_count = build_database_from_csv(sys.argv[1], sys.argv[2])
+    print(f"Wrote {ipv4_count} IPv4 and {ipv6_count} IPv6 ranges to {sys.argv[2]}")
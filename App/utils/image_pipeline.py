@@ -0,0 +1,192 @@
+"""Image processing pipeline producing the renditions stored for every uploaded image.
+
+Decoding and resizing are CPU-bound, so they run in a pool of worker processes instead
+of on the thread serving the request. Each upload is decoded once and turned into a
+fixed set of renditions (the RENDITIONS sizes, each encoded in every one of FORMATS).
+JPEGs are decoded with Image.draft(), which lets the decoder downscale by 1/2, 1/4 or
+1/8 while decompressing, and each smaller rendition is reduced from the previous one
+rather than from the original.
+
+Before rendering, `fingerprint` computes a perceptual hash (dHash) and the average color
+of an upload from a heavily reduced decode, so near-identical images can be matched to
+an existing asset (see services.image_service) without being processed again.
+"""
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from PIL import Image, ImageOps, ImageStat
+
+# Rendition name -> bounding box, largest first so each one is derived from the previous
+RENDITIONS = (
+    ("full", (1600, 1600)),
+    ("card", (480, 480)),
+    ("thumb", (160, 160)),
+)
+# Format name -> (Pillow format, encoder options)
+FORMATS = {
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+}
+MAX_PIXELS = 40_000_000  # Larger images are rejected before they are decoded
+FINGERPRINT_SIZE = (64, 64)  # Fingerprints are computed from an image reduced to fit in this box
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def fit_size(size, box):
+    """The size of an image of `size` scaled down (never up) to fit in `box`."""
+    scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _encode(image, format_name):
+    pillow_format, options = FORMATS[format_name]
+    if pillow_format == "JPEG" and image.mode != "RGB":
+        # JPEG has no alpha channel: flatten transparent areas onto white
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    output = io.BytesIO()
+    image.save(output, format=pillow_format, **options)
+    return output.getvalue()
+
+
+def _decode(source, box):
+    """
+    Opens an image upright (EXIF orientation applied) in RGB or RGBA mode, decoding only
+    as many pixels as an image fitting in `box` needs (JPEG only, other formats decode fully).
+
+    Returns:
+        tuple: (image, (width, height) of the original image)
+    """
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        size = image.size
+        if size[0] * size[1] > MAX_PIXELS:
+            raise ValueError("Image is too large.")
+        image.draft("RGB", fit_size(size, box))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        return image.convert("RGBA" if has_alpha else "RGB"), size
+    except ValueError:
+        raise
+    except Exception:
+        raise ValueError("Unsupported or corrupt image file.")
+
+
+def dhash(image):
+    """
+    64-bit difference hash of an image: one bit per pair of horizontally adjacent pixels
+    of a 9x8 grayscale version, set where the left pixel is brighter. Resizing, re-encoding
+    and small edits change few bits, so similar images have hashes a small Hamming distance apart.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.Resampling.BOX).getdata())
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+
+def fingerprint(source):
+    """
+    Computes what is needed to recognize near-identical images. Runs in a worker process
+    and is much cheaper than `render`, JPEGs being decoded at 1/8 scale where possible.
+
+    Returns:
+        dict: {"width": int, "height": int, "dhash": int (64 bits), "average_color": int (0xRRGGBB)},
+              width and height being those of the original image.
+
+    Raises:
+        ValueError: If `source` is not a supported image or is too large.
+    """
+    image, (width, height) = _decode(source, FINGERPRINT_SIZE)
+    image = image.convert("RGB")
+    image.thumbnail(FINGERPRINT_SIZE, Image.Resampling.BOX, reducing_gap=2.0)
+    red, green, blue = (round(channel) for channel in ImageStat.Stat(image).mean)
+    return {"width": width, "height": height, "dhash": dhash(image), "average_color": (red << 16) | (green << 8) | blue}
+
+
+def render(source):
+    """
+    Decodes an image and encodes all its renditions. Runs in a worker process.
+
+    Args:
+        source (bytes or str): The uploaded image file, or the path of a file holding it
+                               (so large uploads are never copied to the worker).
+
+    Returns:
+        dict: {"width": int, "height": int, "renditions": {name: {format: bytes}}},
+              width and height being those of the original image.
+
+    Raises:
+        ValueError: If `source` is not a supported image or is too large.
+    """
+    # Only decode as many pixels as the largest rendition needs
+    image, (width, height) = _decode(source, RENDITIONS[0][1])
+    renditions = {}
+    for name, box in RENDITIONS:
+        image = image.copy()
+        # reducing_gap makes thumbnail() shrink by an integer factor with reduce() before resampling
+        image.thumbnail(box, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        renditions[name] = {format_name: _encode(image, format_name) for format_name in FORMATS}
+    return {"width": width, "height": height, "renditions": renditions}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Workers are spawned, not forked, so they never inherit the web worker's threads or connections
+                _executor = ProcessPoolExecutor(
+                    max_workers=current_app.config["IMAGE_WORKERS"],
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+def _run(function, source):
+    """Runs `function(source)` in the worker pool and waits for the result."""
+    global _executor
+    executor = _get_executor()
+    try:
+        return executor.submit(function, source).result(timeout=current_app.config["IMAGE_PROCESSING_TIMEOUT"])
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for using too much memory); start a new pool for the next upload
+        with _executor_lock:
+            if _executor is executor:
+                _executor = None
+        raise
+
+
+def fingerprint_image(source):
+    """
+    Fingerprints an uploaded image (bytes or a file path, see `render`) in the worker pool.
+
+    Returns:
+        dict: See `fingerprint`.
+
+    Raises:
+        ValueError: If `source` is not a supported image or is too large.
+        TimeoutError: If processing takes longer than the IMAGE_PROCESSING_TIMEOUT setting.
+    """
+    return _run(fingerprint, source)
+
+
+def process_image(source):
+    """
+    Renders an uploaded image (bytes or a file path, see `render`) in the worker pool and waits for the result.
+
+    Returns:
+        dict: See `render`.
+
+    Raises:
+        ValueError: If `source` is not a supported image or is too large.
+        TimeoutError: If processing takes longer than the IMAGE_PROCESSING_TIMEOUT setting.
+    """
+    return _run(render, source)
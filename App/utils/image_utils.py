@@ -1,35 +1,20 @@
 import base64
-from io import BytesIO
-from PIL import Image
 
-def save_image(image_data):
+
+def decode_image_data(image_data):
     """
-    Save image data from base64 string and return the binary data
+    Decodes an image sent as a base64 string or a data URL and returns its bytes.
+    Resizing and re-encoding are done by the image pipeline (see services.image_service).
+
+    Raises:
+        ValueError: If `image_data` is not a base64-encoded string.
     """
+    if not isinstance(image_data, str):
+        raise ValueError("Image must be a base64-encoded string")
+    # Remove the data URL prefix if present
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[-1]
     try:
-        # Remove the data URL prefix if present
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-            
-        # Decode base64 string to binary
-        image_binary = base64.b64decode(image_data)
-        
-        # Open image using PIL
-        image = Image.open(BytesIO(image_binary))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-            
-        # Resize image if too large (optional)
-        max_size = (800, 800)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save to BytesIO
-        output = BytesIO()
-        image.save(output, format='JPEG', quality=85)
-        
-        return output.getvalue()
-        
+        return base64.b64decode(image_data)
     except Exception as e:
-        raise Exception(f"Error processing image: {str(e)}") 
\ No newline at end of file
+        raise ValueError(f"Invalid base64 image data: {e}")
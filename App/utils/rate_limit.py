@@ -0,0 +1,282 @@
+"""Sliding-window rate limiting, usable as a decorator on any route.
+
+A RateLimit allows `limit` requests per `window_seconds` for each key (client IP,
+submitted username, ...). Requests are counted per fixed window, and the sliding window
+is estimated by weighing the previous window's count by how much of it the sliding
+window still covers:
+
+    estimate = previous * (1 - elapsed fraction of the current window) + current
+
+so a check reads and writes one small record per key (O(1)), however many clients there
+are. Records live in a backend: MemoryRateLimitBackend keeps them in the current process
+and expires idle keys with a timing wheel; SQLiteRateLimitBackend keeps them in a local
+SQLite file shared by every worker process on the machine (RATE_LIMIT_BACKEND setting).
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _evaluate(state, limit, window_seconds, now):
+    """
+    Applies one request to the counters of a key.
+
+    Args:
+        state (tuple): (window index, count in that window, count in the window before), or None.
+
+    Returns:
+        tuple: (new state, whether the request is allowed, seconds to wait when it is not).
+               Rejected requests are not counted.
+    """
+    window = int(now // window_seconds)
+    elapsed = (now % window_seconds) / window_seconds
+    current = previous = 0
+    if state is not None:
+        if state[0] == window:
+            current, previous = state[1], state[2]
+        elif state[0] == window - 1:
+            previous = state[1]
+    if previous * (1 - elapsed) + current < limit:
+        return (window, current + 1, previous), True, 0
+
+    if current < limit:
+        # The previous window's weight decays during this window
+        wait = (1 - (limit - current) / previous - elapsed) * window_seconds
+    else:
+        # Only once this window has become the previous one
+        wait = (1 - elapsed + 1 - limit / current) * window_seconds
+    return (window, current, previous), False, max(1, math.ceil(wait))
+
+
+def _expires_at(state, window_seconds):
+    """A record is useless once its window is neither the current nor the previous one."""
+    return (state[0] + 2) * window_seconds
+
+
+class MemoryRateLimitBackend:
+    """
+    Counters kept in the current process. Idle keys are dropped by a timing wheel: each
+    key sits in the slot of the second it expires in, and every check sweeps the slots of
+    the seconds that have passed since the last one, so expiry never scans all keys.
+    """
+
+    def __init__(self, wheel_size=3600):
+        self._states = {}
+        self._expiry = {}
+        self._wheel = [set() for _ in range(wheel_size)]
+        self._swept_until = int(time.time())
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def _schedule(self, key, expires_at):
+        second = math.ceil(expires_at)
+        previous_second = self._expiry.get(key)
+        if previous_second == second:
+            return
+        if previous_second is not None:
+            self._wheel[previous_second % len(self._wheel)].discard(key)
+        self._expiry[key] = second
+        self._wheel[second % len(self._wheel)].add(key)
+
+    def _sweep(self, now):
+        now_second = int(now)
+        # Visiting one full turn is enough: every slot is then checked once
+        for second in range(max(self._swept_until + 1, now_second - len(self._wheel) + 1), now_second + 1):
+            slot = self._wheel[second % len(self._wheel)]
+            # Keys due in a later turn of the wheel stay in their slot
+            for key in [key for key in slot if self._expiry[key] <= now_second]:
+                slot.discard(key)
+                del self._expiry[key]
+                del self._states[key]
+        self._swept_until = max(self._swept_until, now_second)
+
+    def hit(self, key, limit, window_seconds):
+        """Counts a request for `key`; returns (allowed, retry_after seconds)."""
+        with self._lock:
+            now = time.time()
+            self._sweep(now)
+            state, allowed, retry_after = _evaluate(self._states.get(key), limit, window_seconds, now)
+            self._states[key] = state
+            self._schedule(key, _expires_at(state, window_seconds))
+            return allowed, retry_after
+
+    def reset(self, key):
+        """Forgets the requests counted for `key`."""
+        with self._lock:
+            second = self._expiry.pop(key, None)
+            if second is not None:
+                self._wheel[second % len(self._wheel)].discard(key)
+                del self._states[key]
+
+
+class SQLiteRateLimitBackend:
+    """
+    Counters kept in a local SQLite file, shared by every process that opens the same path.
+    Each check is one read and one write of the key's row inside an IMMEDIATE transaction,
+    so concurrent workers never lose a count. Expired rows are purged every `prune_every` checks.
+    """
+
+    def __init__(self, path, prune_every=1000):
+        self.path = path
+        self.prune_every = prune_every
+        self._checks = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "key TEXT PRIMARY KEY, window_index INTEGER NOT NULL, current_count INTEGER NOT NULL, "
+            "previous_count INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_expires_at ON rate_limit (expires_at)")
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers in other processes proceed during writes."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+
+    def hit(self, key, limit, window_seconds):
+        """Counts a request for `key`; returns (allowed, retry_after seconds)."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT window_index, current_count, previous_count FROM rate_limit WHERE key = ?", (key,)
+            ).fetchone()
+            state, allowed, retry_after = _evaluate(row, limit, window_seconds, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit (key, window_index, current_count, previous_count, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, *state, _expires_at(state, window_seconds))
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._checks += 1
+            prune = self._checks >= self.prune_every
+            if prune:
+                self._checks = 0
+        if prune:
+            conn.execute("DELETE FROM rate_limit WHERE expires_at <= ?", (now,))
+        return allowed, retry_after
+
+    def reset(self, key):
+        """Forgets the requests counted for `key`."""
+        self._connection().execute("DELETE FROM rate_limit WHERE key = ?", (key,))
+
+
+def create_rate_limit_backend(backend, path=None):
+    """
+    Creates a rate limit backend for the configured backend name.
+
+    Args:
+        backend (str): 'memory' for per-process counters or 'sqlite' for counters shared across workers.
+        path (str, optional): Database file of the 'sqlite' backend.
+
+    Raises:
+        ValueError: If the backend name is unknown or 'sqlite' is used without a path.
+    """
+    if backend == 'memory':
+        return MemoryRateLimitBackend()
+    if backend == 'sqlite':
+        if not path:
+            raise ValueError("The sqlite rate limit backend requires a path.")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteRateLimitBackend(path)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+def get_rate_limit_backend():
+    """Returns the application's rate limit backend, creating it from the app config on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = current_app.config
+                _backend = create_rate_limit_backend(config['RATE_LIMIT_BACKEND'], config['RATE_LIMIT_PATH'])
+    return _backend
+
+
+def client_ip():
+    """Key function limiting per client IP address."""
+    return request.remote_addr
+
+
+def json_field(name):
+    """Returns a key function limiting per value of a JSON body field (trimmed, case-insensitive)."""
+    def key_func():
+        data = request.get_json(silent=True)
+        value = data.get(name) if isinstance(data, dict) else None
+        return value.strip().lower() if isinstance(value, str) and value.strip() else None
+    return key_func
+
+
+class RateLimit:
+    """
+    Allows `limit` requests per `window_seconds` for each key returned by `key_func`.
+
+    Args:
+        name (str): Namespace of the limit's counters, e.g. "login-ip".
+        limit (int): Requests allowed per window.
+        window_seconds (int): Length of the sliding window.
+        key_func (callable): Returns the key of the current request, or None to not limit it.
+        message (str): Message of the 429 response.
+    """
+
+    def __init__(self, name, limit, window_seconds, key_func, message="Too many requests. Please try again later."):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.key_func = key_func
+        self.message = message
+
+    def hit(self):
+        """Counts the current request; returns (allowed, retry_after seconds)."""
+        key = self.key_func()
+        if key is None:
+            return True, 0
+        return get_rate_limit_backend().hit(f"{self.name}:{key}", self.limit, self.window_seconds)
+
+    def reset(self, key):
+        """Forgets the requests counted for `key` (e.g. after a successful login)."""
+        get_rate_limit_backend().reset(f"{self.name}:{key}")
+
+
+def rate_limit(*limits):
+    """
+    Decorator applying RateLimits to a route, in order. A request over any of them gets
+    a 429 response with a Retry-After header and the handler is not called.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            for limit in limits:
+                allowed, retry_after = limit.hit()
+                if not allowed:
+                    response = jsonify({"message": limit.message, "retry_after": retry_after})
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response, 429
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,152 @@
+"""Declarative, compiled serializers turning model objects into JSON-ready dictionaries.
+
+A Serializer lists the fields of a payload once. For every field set that is requested
+(all fields, or a sparse `?fields=id,name,price` selection) it compiles a function
+that only touches those fields, and it can produce the matching `load_only` option so
+the SQL query only selects the columns those fields read. Clients choose the sparse
+field sets, so only the MAX_COMPILED_FIELD_SETS most recently used ones stay compiled.
+"""
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+# Sparse field sets kept compiled per serializer (least recently used ones are dropped)
+MAX_COMPILED_FIELD_SETS = 256
+
+
+def isoformat(value):
+    """Converts a datetime to an ISO 8601 string; None stays None."""
+    return value.isoformat() if value is not None else None
+
+
+class Field:
+    """
+    One field of a payload.
+
+    Args:
+        source (str, optional): Attribute read from the object; defaults to the field name.
+        convert (callable, optional): Applied to the attribute value, e.g. `isoformat`.
+        getter (callable, optional): Computes the value from the whole object instead of
+                                     reading `source`; `columns` should then list what it reads.
+        columns (tuple, optional): Column attributes the field reads, for `load_only`.
+                                   Defaults to (source,) for plain fields and () for getters.
+    """
+
+    def __init__(self, source=None, convert=None, getter=None, columns=None):
+        self.source = source
+        self.convert = convert
+        self.getter = getter
+        self.columns = columns
+
+    def bind(self, name):
+        """Returns (accessor, columns) for the field registered under `name`."""
+        source = self.source or name
+        if self.getter is not None:
+            return self.getter, tuple(self.columns or ())
+        columns = tuple(self.columns) if self.columns is not None else (source,)
+        convert = self.convert
+        if convert is None:
+            return attrgetter(source), columns
+        return (lambda obj: convert(getattr(obj, source))), columns
+
+
+class Serializer:
+    """
+    Serializes instances of `model` into dictionaries with the declared fields.
+
+    Args:
+        model: The SQLAlchemy model class.
+        fields (dict): Field name -> Field (or None for a plain attribute of the same name),
+                       in payload order.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self._accessors = {}
+        self._columns = {}
+        for name, field in fields.items():
+            self._accessors[name], self._columns[name] = (field or Field()).bind(name)
+        self.field_names = tuple(self._accessors)
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self._serialize_all = self._build(self.field_names)
+
+    def parse_fields(self, raw):
+        """
+        Parses a comma-separated `?fields=` value into a field set.
+
+        The "id" field, when the serializer has one, is always included so results can
+        still be matched to their rows.
+
+        Returns:
+            tuple: The requested field names in payload order, or None (all fields) when `raw` is empty.
+
+        Raises:
+            ValueError: If a field name is unknown.
+        """
+        if not raw:
+            return None
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        if not requested:
+            return None
+        unknown = requested.difference(self.field_names)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. "
+                             f"Available fields: {', '.join(self.field_names)}")
+        requested.add('id')
+        return tuple(name for name in self.field_names if name in requested)
+
+    def _build(self, fields):
+        accessors = tuple((name, self._accessors[name]) for name in fields)
+
+        def serialize(obj):
+            return {name: accessor(obj) for name, accessor in accessors}
+
+        return serialize
+
+    def compile(self, fields=None):
+        """Returns a function serializing one object to the given field set (None: all fields)."""
+        if fields is None:
+            return self._serialize_all
+        fields = tuple(fields)
+        if fields == self.field_names:
+            return self._serialize_all
+        with self._lock:
+            serialize = self._compiled.get(fields)
+            if serialize is not None:
+                self._compiled.move_to_end(fields)
+                return serialize
+        serialize = self._build(fields)
+        with self._lock:
+            serialize = self._compiled.setdefault(fields, serialize)
+            self._compiled.move_to_end(fields)
+            while len(self._compiled) > MAX_COMPILED_FIELD_SETS:
+                self._compiled.popitem(last=False)
+        return serialize
+
+    def serialize(self, obj, fields=None):
+        return self.compile(fields)(obj)
+
+    def serialize_many(self, objects, fields=None):
+        serialize = self.compile(fields)
+        return [serialize(obj) for obj in objects]
+
+    def columns(self, fields=None):
+        """Names of the columns read by the given field set."""
+        fields = self.field_names if fields is None else fields
+        return {column for name in fields for column in self._columns[name]}
+
+    def load_options(self, fields=None):
+        """A `load_only` option restricting the SELECT to the columns the field set reads."""
+        primary_key = [column.key for column in inspect(self.model).primary_key]
+        columns = sorted(self.columns(fields).union(primary_key))
+        return load_only(*(getattr(self.model, column) for column in columns))
+
+    @staticmethod
+    def project(payload, fields):
+        """Narrows an already-serialized payload (e.g. from a cache) to a field set."""
+        if fields is None:
+            return payload
+        return {name: payload[name] for name in fields if name in payload}
@@ -25,9 +25,9 @@ const getProfileImageUrl = (user) => {
   try {
     console.log('Profile image data:', user.profile_image?.substring(0, 100) + '...');
     if (user.profile_image) {
-      // Check if it's already a data URL
-      if (user.profile_image.startsWith('data:image')) {
-        console.log('Image is already a data URL');
+      // Check if it's already a data URL or the URL the image is served from
+      if (user.profile_image.startsWith('data:image') || user.profile_image.startsWith('/')) {
+        console.log('Image is already a URL');
         return user.profile_image;
       }
       // If it's just base64 data, add the data URL prefix
@@ -15,8 +15,8 @@ const getProfileImageUrl = (user) => {
   
   try {
     if (user.profile_image) {
-      // Check if it's already a data URL
-      if (user.profile_image.startsWith('data:image')) {
+      // Check if it's already a data URL or the URL the image is served from
+      if (user.profile_image.startsWith('data:image') || user.profile_image.startsWith('/')) {
         return user.profile_image;
       }
       // If it's just base64 data, add the data URL prefix
@@ -343,8 +343,8 @@ const Settings = ({ isOpen, onClose, currentUser, onUpdateProfile, onCreateStore
 
     try {
       if (user.profile_image) {
-        // Check if the image data is already a data URL (e.g., from a previous upload)
-        if (user.profile_image.startsWith('data:image')) {
+        // Check if the image is already a data URL or the URL the image is served from
+        if (user.profile_image.startsWith('data:image') || user.profile_image.startsWith('/')) {
           return user.profile_image;
         }
         // Assume it's a base64 string and prepend the data URL prefix